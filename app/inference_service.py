@@ -1,4 +1,34 @@
-from src.phase4_5_inference import infer_phase4_sql
+from src.phase4_5_inference import infer_phase4_sql_batch
+from src.pipeline import get_pipeline
+from src.schema_registry import CompiledSchema, get_registry, schema_id_for
+from src.aligner_runtime import get_aligner
 
-def generate_sql_from_nl(schema_json, question):
-    return infer_phase4_sql(schema_json, question)
+def register_schema(schema_json):
+    return get_registry().register(schema_json, aligner=get_aligner())
+
+def resolve_schema(schema_json=None, schema_id=None):
+    if schema_id is not None:
+        compiled = get_registry().lookup(schema_id)
+        if compiled is not None:
+            return compiled
+        if schema_json is None:
+            raise ValueError(f"❌ Unknown schema id: {schema_id}")
+        # Fallback: the inline schema the client sent along with the id
+        if schema_id_for(schema_json) != schema_id:
+            raise ValueError(f"❌ db_schema does not match schema id {schema_id}")
+        return get_registry().get(register_schema(schema_json))
+    if schema_json is None:
+        raise ValueError("❌ Either db_schema or schema_id is required")
+    return CompiledSchema(schema_json)
+
+def generate_sql_from_nl(schema_json, question, schema_id=None):
+    """{"generated_sql": ..., "timings_ms": {...}}"""
+    if schema_id is None and schema_json is not None:
+        # Compiled inside the pipeline so it shows up in the timings
+        return get_pipeline().run(question, schema_json=schema_json)
+    schema = resolve_schema(schema_json, schema_id)
+    return get_pipeline().run(question, schema=schema)
+
+def generate_sql_batch(schema_json, questions, schema_id=None):
+    schema = resolve_schema(schema_json, schema_id)
+    return infer_phase4_sql_batch(schema.schema_json, questions, schema=schema)
@@ -1,10 +1,37 @@
+import logging
+import threading
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
+from app.model_loader import get_model_runtime
 from app.routes import router
+from src.aligner_runtime import get_runtime
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up(name: str, runtime):
+    try:
+        runtime.warm_up()
+    except Exception:
+        logger.exception(f"❌ {name} warm-up failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load once per worker, off the startup path: /ready reports when done.
+    # One thread each, so a slow or failing MiniLM does not hold the model back.
+    for name, runtime in (("aligner", get_runtime()), ("model", get_model_runtime())):
+        threading.Thread(
+            target=warm_up, args=(name, runtime), name=f"warm-up-{name}", daemon=True
+        ).start()
+    yield
+
 
-app = FastAPI(title="4LA-CGT NL to SQL")
+app = FastAPI(title="4LA-CGT NL to SQL", lifespan=lifespan)
 
 # Include API routes
 app.include_router(router)
@@ -1,12 +1,162 @@
-import torch
-from models.sql_transformer import SQLTransformer
+"""
+Model Loader
+============
+Process-wide owner of the SQLTransformer used for neural decoding.
 
-MODEL_PATH = "notebooks/checkpoints/phase4_5_best.pt"
+The rule-based /generate path never touches the model, so nothing is
+loaded at import. torch and the checkpoint are only pulled in when
+neural decoding is enabled, either by the background warm-up at
+startup or lazily on first use.
+"""
 
-def load_model():
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from src.checkpoints import quantized_path, serving_checkpoint_path
+
+# Opt-in neural decoding; "1" = load the model. Also implied by the
+# variant below.
+NEURAL_ENV = "NL2SQL_NEURAL"
+
+# Opt-in int8 model (built by `python -m models.quantized`), looked up
+# next to the float checkpoint; "1" = enabled
+QUANTIZED_ENV = "NL2SQL_QUANTIZED"
+
+logger = logging.getLogger(__name__)
+
+def _enabled(env: str) -> bool:
+    return os.environ.get(env, "").lower() in ("1", "true", "yes")
+
+def use_quantized() -> bool:
+    return _enabled(QUANTIZED_ENV)
+
+def use_model() -> bool:
+    return _enabled(NEURAL_ENV) or use_quantized()
+
+def model_path() -> str:
+    """
+    Checkpoint to serve, resolved when loading: $NL2SQL_MODEL_PATH, the
+    notebooks' checkpoint or the trainer's (see src.checkpoints).
+    """
+    path = serving_checkpoint_path()
+    if use_quantized():
+        return quantized_path(path)
+    return path
+
+def load_model(path: Optional[str] = None):
+    path = path or model_path()
+    if use_quantized():
+        from models.quantized import load_quantized
+        return load_quantized(path)
+
+    import torch
+    from models.sql_transformer import SQLTransformer
+
+    # Raw state dicts and training checkpoints ({"model_state_dict": ...})
+    state = torch.load(path, map_location="cpu")
     model = SQLTransformer()
-    model.load_state_dict(torch.load(MODEL_PATH, map_location="cpu"))
+    model.load_state_dict(state.get("model_state_dict", state))
     model.eval()
     return model
 
-model = load_model()
+
+class ModelRuntime:
+    """
+    Lazily loads the model once per process. Same contract as
+    AlignerRuntime: get() is safe to call concurrently and only the
+    first caller loads. A failed load is recorded in `error` and is
+    retried on the next get().
+    """
+
+    def __init__(self):
+        self.path: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+        self._model = None
+        self._lock = threading.Lock()
+
+    # ==================================================
+    # Access
+    # ==================================================
+    @property
+    def enabled(self) -> bool:
+        return use_model()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def ready(self) -> bool:
+        return self.loaded or not self.enabled
+
+    def get(self):
+        model = self._model
+        if model is not None:
+            return model
+
+        if not self.enabled:
+            raise ValueError(
+                f"❌ Neural decoding is disabled; set {NEURAL_ENV}=1 to load the model"
+            )
+
+        with self._lock:
+            if self._model is None:
+                path = model_path()
+                start = time.perf_counter()
+                try:
+                    self._model = load_model(path)
+                except Exception as e:
+                    self.error = f"{type(e).__name__}: {e}"
+                    raise
+                self.error = None
+                self.path = path
+                self.load_seconds = time.perf_counter() - start
+                logger.info(
+                    f"Loaded model '{path}' "
+                    f"in {self.load_seconds:.2f}s"
+                )
+            return self._model
+
+    def warm_up(self) -> dict:
+        """Loads the model if neural decoding is enabled; no-op otherwise."""
+        if self.enabled:
+            self.get()
+        return self.status()
+
+    # ==================================================
+    # Reporting
+    # ==================================================
+    def status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "path": self.path or (model_path() if self.enabled else None),
+            "loaded": self.loaded,
+            "load_seconds": self.load_seconds,
+            "error": self.error
+        }
+
+
+# ============================================================
+# Process-wide singleton
+# ============================================================
+_runtime = ModelRuntime()
+
+
+def get_model_runtime() -> ModelRuntime:
+    return _runtime
+
+
+def get_model():
+    return _runtime.get()
+
+
+def __getattr__(name):
+    # `from app.model_loader import model` keeps working, loading on access
+    if name == "model":
+        return get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
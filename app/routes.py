@@ -1,20 +1,29 @@
-from fastapi import APIRouter
-from app.schemas import SQLRequest
-from app.inference_service import generate_sql_from_nl
+from fastapi import APIRouter, Response
+from app.model_loader import get_model_runtime
+from app.schemas import SQLRequest, SchemaRequest, BatchSQLRequest
+from app.inference_service import (
+    generate_sql_from_nl,
+    generate_sql_batch,
+    register_schema
+)
+from src.aligner_runtime import get_runtime
+from src.schema_registry import get_registry
 
 router = APIRouter()
 
 @router.post("/generate")
 def generate_sql(request: SQLRequest):
     try:
-        sql = generate_sql_from_nl(
+        result = generate_sql_from_nl(
             request.db_schema,
-            request.question
+            request.question,
+            schema_id=request.schema_id
         )
 
         return {
             "success": True,
-            "generated_sql": sql
+            "generated_sql": result["generated_sql"],
+            "timings_ms": result["timings_ms"]
         }
 
     except Exception as e:
@@ -22,3 +31,67 @@ def generate_sql(request: SQLRequest):
             "success": False,
             "error": str(e)
         }
+
+
+@router.post("/generate_batch")
+def generate_sql_batch_route(request: BatchSQLRequest):
+    try:
+        results = generate_sql_batch(
+            request.db_schema,
+            request.questions,
+            schema_id=request.schema_id
+        )
+
+        return {
+            "success": True,
+            "results": results
+        }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
+@router.post("/schemas")
+def create_schema(request: SchemaRequest):
+    try:
+        schema_id = register_schema(request.db_schema)
+
+        return {
+            "success": True,
+            "schema_id": schema_id
+        }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
+@router.get("/health")
+def health():
+    return {
+        "status": "ok",
+        "aligner": get_runtime().status(),
+        "model": get_model_runtime().status(),
+        "schemas": get_registry().status()
+    }
+
+
+@router.get("/ready")
+def ready(response: Response):
+    # 503 until MiniLM (and the model, when neural decoding is on) is loaded
+    aligner = get_runtime()
+    model = get_model_runtime()
+    is_ready = aligner.loaded and model.ready
+    if not is_ready:
+        response.status_code = 503
+
+    return {
+        "ready": is_ready,
+        "aligner": aligner.status(),
+        "model": model.status()
+    }
@@ -1,6 +1,17 @@
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 class SQLRequest(BaseModel):
-    db_schema: Dict[str, Any]
+    # An inline schema, the id returned by POST /schemas, or both (the
+    # schema is then the fallback for a worker that does not know the id)
+    db_schema: Optional[Dict[str, Any]] = None
+    schema_id: Optional[str] = None
     question: str
+
+class SchemaRequest(BaseModel):
+    db_schema: Dict[str, Any]
+
+class BatchSQLRequest(BaseModel):
+    db_schema: Optional[Dict[str, Any]] = None
+    schema_id: Optional[str] = None
+    questions: List[str]
@@ -0,0 +1,104 @@
+"""
+Benchmark: SQLTransformer.generate (one prompt at a time) vs generate_batch
+==========================================================================
+Random prompts of mixed length, decoded greedily under the default
+grammar. Reports skeletons per second for each and whether the batched
+decode reproduces the per-prompt tokens; with --skip-forced also the
+share of forward passes saved by forced-token skipping.
+
+Run from the project root:
+    python -m benchmarks.batched_generate
+    python -m benchmarks.batched_generate --skip-forced
+    python -m benchmarks.batched_generate --checkpoint notebooks/checkpoints/phase4_5_best.pt
+"""
+
+import argparse
+import time
+
+import torch
+
+from models.sql_transformer import SQLTransformer
+from src.vocab import PAD, TOKEN2ID, VOCAB_SIZE
+
+
+def make_prompts(n: int, min_len: int, max_len: int, gen: torch.Generator):
+    lengths = torch.randint(min_len, max_len + 1, (n,), generator=gen).tolist()
+    return [torch.randint(4, VOCAB_SIZE, (L,), generator=gen).tolist() for L in lengths]
+
+
+def pad_batch(prompts):
+    T = max(len(p) for p in prompts)
+    input_ids = torch.full((len(prompts), T), TOKEN2ID[PAD], dtype=torch.long)
+    attention_mask = torch.zeros_like(input_ids)
+    for i, p in enumerate(prompts):
+        input_ids[i, :len(p)] = torch.tensor(p)
+        attention_mask[i, :len(p)] = 1
+    return input_ids, attention_mask
+
+
+def run(n_prompts: int, batch_sizes, max_len: int, use_cache: bool, skip_forced: bool, checkpoint: str, seed: int):
+    gen = torch.Generator().manual_seed(seed)
+    torch.manual_seed(seed)
+
+    model = SQLTransformer()
+    if checkpoint:
+        state = torch.load(checkpoint, map_location="cpu")
+        model.load_state_dict(state.get("model_state_dict", state))
+    model.eval()
+
+    prompts = make_prompts(n_prompts, 4, 24, gen)
+    intents = [{"where": i % 2 == 0, "having": i % 3 == 0} for i in range(n_prompts)]
+
+    start = time.perf_counter()
+    reference = [
+        model.generate(
+            torch.tensor([p]), torch.ones(1, len(p), dtype=torch.long), None, None,
+            max_len=max_len, intent_signals=it, use_cache=use_cache, skip_forced=skip_forced
+        )
+        for p, it in zip(prompts, intents)
+    ]
+    seq_s = time.perf_counter() - start
+
+    if skip_forced:
+        stats = [
+            model.generate(
+                torch.tensor([p]), torch.ones(1, len(p), dtype=torch.long), None, None,
+                max_len=max_len, intent_signals=it, skip_forced=True, return_stats=True
+            )[1]
+            for p, it in zip(prompts, intents)
+        ]
+        saved = sum(s["forward_passes_saved"] for s in stats)
+        total = saved + sum(s["forward_passes"] for s in stats)
+        print(f"forced-token skipping saved {saved}/{total} forward passes ({saved / total:.1%})")
+
+    print(f"{'batch':>6} | {'skeletons/s':>11} | {'speedup':>7} | {'agree':>6}")
+    print(f"{1:>6} | {n_prompts / seq_s:>11.1f} | {1.0:>6.1f}x | {'-':>6}")
+
+    for bs in batch_sizes:
+        outputs = []
+        start = time.perf_counter()
+        for i in range(0, n_prompts, bs):
+            input_ids, attention_mask = pad_batch(prompts[i:i + bs])
+            outputs.extend(model.generate_batch(
+                input_ids, attention_mask,
+                max_len=max_len, intent_signals=intents[i:i + bs],
+                use_cache=use_cache, skip_forced=skip_forced
+            ))
+        batch_s = time.perf_counter() - start
+
+        agree = sum(a == b for a, b in zip(outputs, reference)) / n_prompts
+        print(f"{bs:>6} | {n_prompts / batch_s:>11.1f} | {seq_s / batch_s:>6.1f}x | {agree:>6.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prompts", type=int, default=256)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--max-len", type=int, default=40)
+    parser.add_argument("--use-cache", action="store_true")
+    parser.add_argument("--skip-forced", action="store_true")
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run(args.prompts, args.batch_sizes, args.max_len, args.use_cache, args.skip_forced, args.checkpoint, args.seed)
@@ -0,0 +1,115 @@
+"""
+Benchmark: greedy vs grammar-constrained beam search
+====================================================
+Decodes the skeleton of every question in data/sql_ast/phase4.5_join.json
+from <START> (the way the phase-4.5 model is trained), with WHERE/HAVING
+intent taken from NLParser, at several beam widths. Reports latency,
+exact skeleton match against the dataset (bounded by how many of its
+skeletons the grammar can produce) and the mean model score
+(sum of grammar-masked log-probabilities) of the returned skeleton.
+
+The dataset writes the join keyword as <JOIN_TYPE> (bound in
+schema_bindings); it is compared as JOIN, the token the model emits.
+
+Run from the project root:
+    python -m benchmarks.beam_search --checkpoint notebooks/checkpoints/phase4_5_best.pt
+    python -m benchmarks.beam_search --widths 1 2 4 8 --limit 500 --use-cache
+"""
+
+import argparse
+import json
+import time
+
+import torch
+
+from models.sql_transformer import SQLTransformer
+from src.grammar import get_grammar, intent_index
+from src.nl_parser import NLParser
+from src.vocab import JOIN, START, TOKEN2ID, UNK
+
+DATA_PATH = "data/sql_ast/phase4.5_join.json"
+
+
+def reference_ids(tokens):
+    tokens = [JOIN if t == "<JOIN_TYPE>" else t for t in tokens[1:]]
+    return [TOKEN2ID.get(t, TOKEN2ID[UNK]) for t in tokens]
+
+
+def reachable(ids, signals):
+    # Whether the grammar can produce this skeleton at all (bounds "exact")
+    grammar = get_grammar()
+    state = grammar.start
+    for t in ids:
+        if t not in grammar.allowed(state, intent_index(signals)):
+            return False
+        state = grammar.step(state, t)
+    return True
+
+
+def load_model(checkpoint):
+    model = SQLTransformer()
+    if checkpoint:
+        state = torch.load(checkpoint, map_location="cpu")
+        model.load_state_dict(state.get("model_state_dict", state))
+    return model.eval()
+
+
+def run(widths, limit: int, max_len: int, use_cache: bool, checkpoint: str, seed: int):
+    torch.manual_seed(seed)
+    model = load_model(checkpoint)
+
+    with open(DATA_PATH) as f:
+        data = json.load(f)[:limit]
+
+    intents = NLParser().parse_many([s["nl_query"] for s in data])
+    references = [reference_ids(s["input_tokens"]) for s in data]
+    prompt = torch.tensor([[TOKEN2ID[START]]])
+    mask = torch.ones_like(prompt)
+
+    n_reachable = sum(reachable(r, s) for r, s in zip(references, intents))
+    print(f"{len(data)} questions from {DATA_PATH}, {n_reachable} reachable under the grammar")
+    print(
+        f"{'width':>5} | {'ms/query':>8} | {'exact':>6} | "
+        f"{'mean score':>10} | {'= greedy':>8}"
+    )
+
+    greedy = None
+    for width in widths:
+        outputs, scores = [], []
+        start = time.perf_counter()
+        for signals in intents:
+            beams = model.beam_search(
+                prompt, mask,
+                num_beams=width, max_len=max_len,
+                intent_signals=signals, use_cache=use_cache,
+                return_beams=True
+            )
+            scores.append(beams[0][0])
+            outputs.append(beams[0][1])
+        ms = (time.perf_counter() - start) * 1000 / len(data)
+
+        if greedy is None:
+            greedy = [
+                model.generate(prompt, mask, None, None, max_len=max_len, intent_signals=s, use_cache=use_cache)
+                for s in intents
+            ]
+
+        exact = sum(o == r for o, r in zip(outputs, references)) / len(data)
+        same = sum(o == g for o, g in zip(outputs, greedy)) / len(data)
+        print(
+            f"{width:>5} | {ms:>8.2f} | {exact:>6.1%} | "
+            f"{sum(scores) / len(scores):>10.3f} | {same:>8.1%}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--widths", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--limit", type=int, default=2000)
+    parser.add_argument("--max-len", type=int, default=40)
+    parser.add_argument("--use-cache", action="store_true")
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run(args.widths, args.limit, args.max_len, args.use_cache, args.checkpoint, args.seed)
@@ -0,0 +1,113 @@
+"""
+Benchmark: worker cold start, state-dict checkpoint vs exported artifact
+========================================================================
+Each load path runs in a fresh Python process (what an autoscaled worker
+pays), several times; reports the median of:
+
+    torch      import torch
+    module     importing the loader module (models.sql_transformer / models.exported)
+    load       building the model and loading weights
+    decode     the first greedy decode from <START> (includes grammar setup)
+    process    wall time of the whole process, interpreter start included
+
+and checks both paths decode the same skeleton.
+
+Run from the project root:
+    python -m benchmarks.cold_start --checkpoint notebooks/checkpoints/phase4_5_best.pt
+    python -m benchmarks.cold_start --checkpoint ... --exported notebooks/checkpoints/phase4_5_best.ts --runs 9
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import torch
+t1 = time.perf_counter()
+
+mode, path = sys.argv[1], sys.argv[2]
+if mode == "state_dict":
+    from models.sql_transformer import SQLTransformer
+    t2 = time.perf_counter()
+    state = torch.load(path, map_location="cpu")
+    model = SQLTransformer()
+    model.load_state_dict(state.get("model_state_dict", state))
+    model.eval()
+else:
+    from models.exported import load_exported
+    t2 = time.perf_counter()
+    model = load_exported(path)
+t3 = time.perf_counter()
+
+from src.vocab import START, TOKEN2ID
+prompt = torch.tensor([[TOKEN2ID[START]]])
+tokens = model.generate(prompt, torch.ones_like(prompt), None, None, max_len=40)
+t4 = time.perf_counter()
+
+print(json.dumps({
+    "torch": t1 - t0, "module": t2 - t1, "load": t3 - t2, "decode": t4 - t3, "tokens": tokens
+}))
+"""
+
+PHASES = ("torch", "module", "load", "decode")
+
+
+def cold_run(mode: str, path: str) -> dict:
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", CHILD, mode, path],
+        capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    result["process"] = time.perf_counter() - start
+    return result
+
+
+def run(checkpoint: str, exported: str, runs: int):
+    import torch
+    from models.exported import export_model
+    from models.sql_transformer import SQLTransformer
+
+    tmp = None
+    if checkpoint is None:
+        # No trained weights: a random model, saved both ways
+        tmp = tempfile.mkdtemp()
+        model = SQLTransformer().eval()
+        checkpoint = os.path.join(tmp, "random.pt")
+        torch.save(model.state_dict(), checkpoint)
+    if exported is None:
+        model = SQLTransformer()
+        state = torch.load(checkpoint, map_location="cpu")
+        model.load_state_dict(state.get("model_state_dict", state))
+        exported = export_model(model.eval(), os.path.join(tmp or tempfile.mkdtemp(), "model.ts"))
+
+    results = {
+        "state_dict": [cold_run("state_dict", checkpoint) for _ in range(runs)],
+        "exported": [cold_run("exported", exported) for _ in range(runs)],
+    }
+
+    print(f"median of {runs} cold starts, ms")
+    print(f"{'path':<11} | " + " | ".join(f"{p:>7}" for p in PHASES + ("process",)))
+    for mode, rs in results.items():
+        cells = [statistics.median(r[p] for r in rs) * 1000 for p in PHASES + ("process",)]
+        print(f"{mode:<11} | " + " | ".join(f"{c:>7.0f}" for c in cells))
+
+    same = results["state_dict"][0]["tokens"] == results["exported"][0]["tokens"]
+    print(f"same skeleton: {same}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checkpoint", default=None, help="state-dict checkpoint (default: random weights)")
+    parser.add_argument("--exported", default=None, help="TorchScript artifact (default: export --checkpoint)")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    run(args.checkpoint, args.exported, args.runs)
@@ -0,0 +1,94 @@
+"""
+Benchmark: TrigramIndex vs difflib.get_close_matches
+=====================================================
+Synthetic "table.column" schemas of 1k / 10k / 100k columns, queried
+with misspelled column names (the case the fuzzy fallback exists for).
+
+Run from the project root:
+    python -m benchmarks.fuzzy_match
+"""
+
+import argparse
+import difflib
+import random
+import string
+import time
+
+from src.trigram_index import TrigramIndex
+
+WORDS = [
+    "customer", "order", "product", "invoice", "payment", "employee",
+    "department", "salary", "region", "store", "supplier", "shipment",
+    "account", "balance", "status", "created", "updated", "amount",
+    "price", "quantity", "discount", "name", "first", "last", "email",
+    "phone", "city", "country", "code", "date", "total", "type"
+]
+
+
+def make_schema(n_columns: int, rng: random.Random):
+    columns = set()
+    while len(columns) < n_columns:
+        table = "_".join(rng.sample(WORDS, 2)) + f"_{rng.randint(0, 999)}"
+        for _ in range(rng.randint(5, 40)):
+            col = "_".join(rng.sample(WORDS, rng.randint(1, 3)))
+            columns.add(f"{table}.{col}")
+    return sorted(columns)[:n_columns]
+
+
+def misspell(text: str, rng: random.Random) -> str:
+    chars = list(text)
+    for _ in range(rng.randint(1, 2)):
+        i = rng.randrange(len(chars))
+        op = rng.choice(["drop", "swap", "replace"])
+        if op == "drop" and len(chars) > 3:
+            del chars[i]
+        elif op == "swap" and i + 1 < len(chars):
+            chars[i], chars[i + 1] = chars[i + 1], chars[i]
+        else:
+            chars[i] = rng.choice(string.ascii_lowercase)
+    return "".join(chars)
+
+
+def run(sizes, n_queries: int, cutoff: float, seed: int):
+    rng = random.Random(seed)
+    print(
+        f"{'columns':>8} | {'build ms':>9} | {'difflib ms/q':>12} | "
+        f"{'trigram ms/q':>12} | {'speedup':>7} | {'agree':>6}"
+    )
+
+    for n in sizes:
+        columns = make_schema(n, rng)
+        queries = [misspell(rng.choice(columns), rng) for _ in range(n_queries)]
+
+        start = time.perf_counter()
+        index = TrigramIndex(columns)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        expected = [
+            (difflib.get_close_matches(q, columns, n=1, cutoff=cutoff) or [None])[0]
+            for q in queries
+        ]
+        difflib_ms = (time.perf_counter() - start) * 1000 / n_queries
+
+        start = time.perf_counter()
+        got = [index.match(q, cutoff) for q in queries]
+        trigram_ms = (time.perf_counter() - start) * 1000 / n_queries
+
+        agree = sum(e == g for e, g in zip(expected, got)) / n_queries
+        print(
+            f"{n:>8} | {build_ms:>9.1f} | {difflib_ms:>12.3f} | "
+            f"{trigram_ms:>12.3f} | {difflib_ms / trigram_ms:>6.1f}x | "
+            f"{agree:>6.1%}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--cutoff", type=float, default=0.6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run(args.sizes, args.queries, args.cutoff, args.seed)
@@ -0,0 +1,82 @@
+"""
+Benchmark: float32 vs dynamic int8 SQLTransformer on CPU
+========================================================
+Weight size, full forward latency at several batch sizes, and greedy
+decoding from <START> (with and without the KV cache), for a float
+checkpoint and its int8 counterpart (models.quantized). Reports whether
+both decode the same skeletons.
+
+Run from the project root:
+    python -m benchmarks.quantized_inference --checkpoint notebooks/checkpoints/phase4_5_best.pt
+    python -m benchmarks.quantized_inference --quantized notebooks/checkpoints/phase4_5_best.int8.pt --threads 1
+"""
+
+import argparse
+import time
+
+import torch
+
+from models.quantized import load_float_model, load_quantized, quantize_model, state_dict_bytes
+from models.sql_transformer import SQLTransformer
+from src.vocab import START, TOKEN2ID, VOCAB_SIZE
+
+INTENTS = [{"where": w, "having": h} for w in (False, True) for h in (False, True)]
+
+
+def timed(fn, repeats: int) -> float:
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeats
+
+
+@torch.no_grad()
+def run(checkpoint: str, quantized: str, batch_sizes, seq_len: int, repeats: int, max_len: int, seed: int):
+    torch.manual_seed(seed)
+    float_model = load_float_model(checkpoint) if checkpoint else SQLTransformer().eval()
+    quant_model = load_quantized(quantized) if quantized else quantize_model(float_model)
+    models = {"float32": float_model, "int8": quant_model}
+
+    print(f"weights: float32 {state_dict_bytes(float_model) / 2**20:.2f} MiB | int8 {state_dict_bytes(quant_model) / 2**20:.2f} MiB")
+    print(f"{'forward':<22} | {'float32 ms':>10} | {'int8 ms':>8} | {'speedup':>7}")
+    for bs in batch_sizes:
+        ids = torch.randint(4, VOCAB_SIZE, (bs, seq_len))
+        mask = torch.ones_like(ids)
+        ms = {name: timed(lambda m=m: m(ids, mask), repeats) for name, m in models.items()}
+        print(f"{f'batch {bs} × {seq_len} tokens':<22} | {ms['float32']:>10.2f} | {ms['int8']:>8.2f} | {ms['float32'] / ms['int8']:>6.2f}x")
+
+    prompt = torch.tensor([[TOKEN2ID[START]]])
+    prompt_mask = torch.ones_like(prompt)
+    for use_cache in (False, True):
+        outputs, ms = {}, {}
+        for name, m in models.items():
+            decode = lambda m=m: [
+                m.generate(prompt, prompt_mask, None, None, max_len=max_len, intent_signals=it, use_cache=use_cache)
+                for it in INTENTS
+            ]
+            ms[name] = timed(decode, max(1, repeats // 10)) / len(INTENTS)
+            outputs[name] = decode()
+        label = f"generate{' (cache)' if use_cache else ''}"
+        same = sum(a == b for a, b in zip(outputs["float32"], outputs["int8"]))
+        print(
+            f"{label:<22} | {ms['float32']:>10.2f} | {ms['int8']:>8.2f} | {ms['float32'] / ms['int8']:>6.2f}x"
+            f" | same skeleton {same}/{len(INTENTS)}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checkpoint", default=None, help="float checkpoint (default: random weights)")
+    parser.add_argument("--quantized", default=None, help="int8 artifact (default: quantize --checkpoint in memory)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--seq-len", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--max-len", type=int, default=40)
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads (e.g. 1 per worker)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    run(args.checkpoint, args.quantized, args.batch_sizes, args.seq_len, args.repeats, args.max_len, args.seed)
@@ -0,0 +1,207 @@
+"""
+Dynamic int8 SQLTransformer
+===========================
+CPU inference variant of a trained checkpoint: the feed-forward Linears
+of every encoder layer (linear1 / linear2) and fc_out are replaced by
+torch's dynamically quantized int8 Linears (weights stored as int8,
+activations quantized per call). Attention projections stay float:
+nn.MultiheadAttention keeps its packed in_proj as a raw tensor and its
+out_proj is excluded from dynamic quantization by torch.
+
+Quantized models run the encoder layer by layer (SQLTransformer
+._forward_layers) since the fused nn.TransformerEncoder path needs float
+weights; generate / generate_batch / beam_search and the KV cache work
+unchanged.
+
+The quantized model is saved as its own artifact next to the float
+checkpoint, with the config needed to rebuild it and the token agreement
+measured against the float model on the phase corpora:
+
+    python -m models.quantized   # default: the served checkpoint (src.checkpoints)
+    # → notebooks/checkpoints/phase4_5_best.int8.pt
+
+    model = load_quantized("notebooks/checkpoints/phase4_5_best.int8.pt")
+"""
+
+import argparse
+import copy
+import glob
+import io
+import os
+from typing import Dict, List, Optional
+
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+
+from models.sql_transformer import SQLTransformer
+from src.checkpoints import quantized_path, serving_checkpoint_path
+from src.grammar import get_grammar
+from src.training_data import IGNORE_INDEX, PhaseDataset, collate_fn, load_phase
+from src.vocab import ID2TOKEN, START, TOKEN2ID
+
+ARTIFACT_FORMAT = "sql_transformer.dynamic_int8"
+ARTIFACT_VERSION = 1
+
+
+# ============================================================
+# Build
+# ============================================================
+def model_config(model: SQLTransformer) -> dict:
+    """Constructor arguments that rebuild `model`'s architecture."""
+    layer = model.encoder.layers[0]
+    return {
+        "vocab_size": model.fc_out.out_features,
+        "d_model": model.embedding.embedding_dim,
+        "nhead": layer.self_attn.num_heads,
+        "num_layers": len(model.encoder.layers),
+        "dim_ff": layer.linear1.out_features,
+        "pad_token": ID2TOKEN[model.pad_id],
+    }
+
+
+def quantize_model(model: SQLTransformer) -> SQLTransformer:
+    """int8 copy of a float model (the original is left untouched)."""
+    model = copy.deepcopy(model).cpu().eval()
+    targets = {"fc_out"} | {
+        f"encoder.layers.{i}.{name}"
+        for i in range(len(model.encoder.layers))
+        for name in ("linear1", "linear2")
+    }
+    quantized = torch.ao.quantization.quantize_dynamic(model, targets, dtype=torch.qint8)
+    quantized.quantized = True
+    return quantized
+
+
+def load_float_model(checkpoint: str) -> SQLTransformer:
+    state = torch.load(checkpoint, map_location="cpu")
+    model = SQLTransformer()
+    model.load_state_dict(state.get("model_state_dict", state))
+    return model.eval()
+
+
+# ============================================================
+# Artifact
+# ============================================================
+def save_quantized(model: SQLTransformer, path: str, config: dict, **meta):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    torch.save({
+        "format": ARTIFACT_FORMAT,
+        "version": ARTIFACT_VERSION,
+        "config": config,
+        "state_dict": model.state_dict(),
+        "torch_version": torch.__version__,
+        **meta
+    }, path)
+
+
+def load_quantized(path: str) -> SQLTransformer:
+    artifact = torch.load(path, map_location="cpu", weights_only=False)
+    if artifact.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"❌ {path} is not a quantized SQLTransformer artifact")
+    if artifact.get("version") != ARTIFACT_VERSION:
+        raise ValueError(f"❌ {path} has artifact version {artifact.get('version')}, expected {ARTIFACT_VERSION}")
+
+    # Same module structure first, then the int8 weights
+    model = quantize_model(SQLTransformer(**artifact["config"]))
+    model.load_state_dict(artifact["state_dict"])
+    return model.eval()
+
+
+def state_dict_bytes(model: nn.Module) -> int:
+    buf = io.BytesIO()
+    torch.save(model.state_dict(), buf)
+    return buf.getbuffer().nbytes
+
+
+# ============================================================
+# Validation
+# ============================================================
+@torch.no_grad()
+def corpus_agreement(float_model, quant_model, path: str, batch_size: int = 64, limit: Optional[int] = None) -> dict:
+    """
+    Teacher-forced agreement on one phase corpus: share of positions
+    where both models pick the same grammar-allowed next token.
+    """
+    grammar = get_grammar()
+    masks = grammar.mask_tensor(float_model.fc_out.out_features)
+    data = load_phase(path)[:limit]
+    loader = DataLoader(PhaseDataset(data, grammar), batch_size=batch_size, collate_fn=collate_fn)
+
+    agree = total = 0
+    for batch in loader:
+        allowed = masks[batch["mask_states"], 0]
+        real = (batch["attention_mask"] == 1) & (batch["labels"] != IGNORE_INDEX)
+
+        picks = []
+        for model in (float_model, quant_model):
+            logits = model(batch["input_ids"], batch["attention_mask"])
+            picks.append(logits.masked_fill(~allowed, float("-inf")).argmax(dim=-1))
+
+        agree += int(((picks[0] == picks[1]) & real).sum())
+        total += int(real.sum())
+    return {"positions": total, "agreement": agree / total if total else 1.0}
+
+
+@torch.no_grad()
+def decode_agreement(float_model, quant_model, max_len: int = 40) -> dict:
+    """Greedy skeletons from <START> under every WHERE / HAVING intent."""
+    prompt = torch.tensor([[TOKEN2ID[START]]])
+    mask = torch.ones_like(prompt)
+    intents = [{"where": w, "having": h} for w in (False, True) for h in (False, True)]
+
+    same = sum(
+        float_model.generate(prompt, mask, None, None, max_len=max_len, intent_signals=it)
+        == quant_model.generate(prompt, mask, None, None, max_len=max_len, intent_signals=it)
+        for it in intents
+    )
+    return {"prompts": len(intents), "agreement": same / len(intents)}
+
+
+def validate(float_model, quant_model, paths: Optional[List[str]] = None, limit: Optional[int] = None, verbose: bool = True) -> Dict:
+    """Token agreement per phase corpus (data/sql_ast/*.json) and overall."""
+    paths = paths or sorted(glob.glob("data/sql_ast/*.json"))
+    report = {"corpora": {}}
+    agree = total = 0
+
+    for path in paths:
+        result = corpus_agreement(float_model, quant_model, path, limit=limit)
+        report["corpora"][os.path.basename(path)] = result
+        agree += result["agreement"] * result["positions"]
+        total += result["positions"]
+        if verbose:
+            print(f"  {os.path.basename(path):<28} {result['agreement']:>7.2%} of {result['positions']:,} positions")
+
+    report["agreement"] = agree / total if total else 1.0
+    report["decode"] = decode_agreement(float_model, quant_model)
+    if verbose:
+        print(f"  {'overall':<28} {report['agreement']:>7.2%}")
+        print(f"  {'greedy decode from <START>':<28} {report['decode']['agreement']:>7.2%} of {report['decode']['prompts']} intents")
+    return report
+
+
+# ============================================================
+# CLI
+# ============================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and validate a dynamic int8 SQLTransformer")
+    parser.add_argument("--checkpoint", default=serving_checkpoint_path())
+    parser.add_argument("--out", default=None, help="artifact path (default: <checkpoint>.int8.pt)")
+    parser.add_argument("--limit", type=int, default=None, help="samples per corpus to validate on")
+    parser.add_argument("--min-agreement", type=float, default=0.99, help="refuse to save below this token agreement")
+    args = parser.parse_args()
+
+    float_model = load_float_model(args.checkpoint)
+    quant_model = quantize_model(float_model)
+
+    print(f"🔍 Token agreement, {args.checkpoint} float32 vs int8:")
+    report = validate(float_model, quant_model, limit=args.limit)
+    if report["agreement"] < args.min_agreement:
+        raise SystemExit(f"❌ Agreement {report['agreement']:.2%} is below --min-agreement {args.min_agreement:.2%}; not saved")
+
+    out = args.out or quantized_path(args.checkpoint)
+    save_quantized(quant_model, out, model_config(float_model), source=args.checkpoint, validation=report)
+    print(
+        f"✅ Saved {out} "
+        f"(weights {state_dict_bytes(float_model) / 2**20:.2f} → {state_dict_bytes(quant_model) / 2**20:.2f} MiB)"
+    )
@@ -2,8 +2,9 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
-from src.utils import get_allowed_tokens
-from src.vocab import PAD, END, START, TOKEN2ID, ID2TOKEN, VOCAB_SIZE
+from src.utils import DecoderStateTracker, get_allowed_tokens
+from src.grammar import get_grammar, intent_index
+from src.vocab import PAD, END, START, UNK, TOKEN2ID, ID2TOKEN, VOCAB_SIZE
 
 
 '''class SQLTransformer(nn.Module):
@@ -190,6 +191,7 @@ class SQLTransformer(nn.Module):
         super().__init__()
         self.pad_id = TOKEN2ID[pad_token]
         self.end_id = TOKEN2ID[END]
+        self.vocab_size = vocab_size
 
         self.embedding = nn.Embedding(vocab_size, d_model, padding_idx=self.pad_id)
         self.pos_embedding = nn.Embedding(512, d_model)
@@ -204,22 +206,151 @@ class SQLTransformer(nn.Module):
         self.encoder = nn.TransformerEncoder(encoder_layer, num_layers=num_layers)
         self.fc_out = nn.Linear(d_model, vocab_size)
 
-    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor = None):
+        # Set by models.quantized: int8 Linears can't take the fused encoder path
+        self.quantized = False
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor = None, causal: bool = False, position_ids: torch.Tensor = None):
         B, T = input_ids.size()
         device = input_ids.device
-        pos_ids = torch.arange(T, device=device).unsqueeze(0).expand(B, T)
+        pos_ids = position_ids if position_ids is not None else torch.arange(T, device=device).unsqueeze(0).expand(B, T)
         x = self.embedding(input_ids) + self.pos_embedding(pos_ids)
-        
+
+        if self.quantized:
+            return self._forward_layers(x, attention_mask, causal)
+
         src_key_padding_mask = (attention_mask == 0) if attention_mask is not None else None
-        enc_out = self.encoder(x, src_key_padding_mask=src_key_padding_mask)
+        # causal=True: position t only attends to 0..t (what the KV cache computes)
+        mask = torch.triu(torch.ones(T, T, dtype=torch.bool, device=device), 1) if causal else None
+        enc_out = self.encoder(x, mask=mask, src_key_padding_mask=src_key_padding_mask)
         return self.fc_out(enc_out)
 
+    def _forward_layers(self, x, attention_mask=None, causal=False):
+        """
+        forward() with the layers run one by one through _layer_step
+        instead of nn.TransformerEncoder, whose fused fast path needs the
+        float .weight tensors dynamically quantized Linears don't have.
+        """
+        B, T, _ = x.shape
+        device = x.device
+        key_pad = (
+            attention_mask == 0 if attention_mask is not None
+            else torch.zeros(B, T, dtype=torch.bool, device=device)
+        )
+
+        pos = torch.arange(T, device=device)
+        keep = ~key_pad[:, None, :]
+        if causal:
+            keep = keep & (pos[None, :] <= pos[:, None]).unsqueeze(0)
+        keep = (keep | (pos[None, :] == pos[:, None]).unsqueeze(0)).unsqueeze(1)
+
+        for layer in self.encoder.layers:
+            x, _ = self._layer_step(layer, x, None, keep)
+        if self.encoder.norm is not None:
+            x = self.encoder.norm(x)
+        return self.fc_out(x)
+
+    # ==================================================
+    # Incremental (KV-cached) causal forward
+    # ==================================================
+    def _self_attention(self, layer, x, past_kv, keep):
+        """
+        Multi-head self-attention of the new positions `x` over the cached
+        keys/values plus their own. Same weights and math as
+        layer.self_attn; returns (output, (k, v)) with k/v: (B, H, S, Dh).
+        """
+        attn = layer.self_attn
+        B, T, D = x.shape
+        H = attn.num_heads
+        Dh = D // H
+
+        q, k, v = F.linear(x, attn.in_proj_weight, attn.in_proj_bias).chunk(3, dim=-1)
+        q = q.view(B, T, H, Dh).transpose(1, 2)
+        k = k.view(B, T, H, Dh).transpose(1, 2)
+        v = v.view(B, T, H, Dh).transpose(1, 2)
+
+        if past_kv is not None:
+            k = torch.cat([past_kv[0], k], dim=2)
+            v = torch.cat([past_kv[1], v], dim=2)
+
+        out = F.scaled_dot_product_attention(q, k, v, attn_mask=keep)
+        out = out.transpose(1, 2).reshape(B, T, D)
+        return attn.out_proj(out), (k, v)
+
+    def _layer_step(self, layer, x, past_kv, keep):
+        # Mirrors nn.TransformerEncoderLayer.forward (both norm orders)
+        if layer.norm_first:
+            a, kv = self._self_attention(layer, layer.norm1(x), past_kv, keep)
+            x = x + layer.dropout1(a)
+            h = layer.norm2(x)
+            x = x + layer.dropout2(layer.linear2(layer.dropout(layer.activation(layer.linear1(h)))))
+        else:
+            a, kv = self._self_attention(layer, x, past_kv, keep)
+            x = layer.norm1(x + layer.dropout1(a))
+            x = layer.norm2(x + layer.dropout2(layer.linear2(layer.dropout(layer.activation(layer.linear1(x))))))
+        return x, kv
+
+    def forward_incremental(self, input_ids: torch.Tensor, past=None, attention_mask: torch.Tensor = None, position_ids: torch.Tensor = None):
+        """
+        Causal forward over only the new tokens, reusing cached keys/values.
+
+        input_ids: (B, T) new tokens (the whole prompt on the first call)
+        past: cache returned by the previous call, or None
+        attention_mask: (B, T) for the new tokens, 1 = keep, 0 = pad
+        position_ids: (B, T), defaults to P..P+T-1 (padded batches pass
+            per-row positions, see padded_position_ids)
+
+        Returns (logits (B, T, vocab), past). Equal to
+        forward(full_sequence, causal=True)[:, -T:] up to float rounding.
+        """
+        B, T = input_ids.size()
+        device = input_ids.device
+        P = past["length"] if past is not None else 0
+
+        pos_ids = position_ids if position_ids is not None else torch.arange(P, P + T, device=device).unsqueeze(0).expand(B, T)
+        x = self.embedding(input_ids) + self.pos_embedding(pos_ids)
+
+        new_pad = (
+            attention_mask == 0 if attention_mask is not None
+            else torch.zeros(B, T, dtype=torch.bool, device=device)
+        )
+        key_pad = torch.cat([past["key_padding"], new_pad], dim=1) if past is not None else new_pad
+
+        # keep[b, 0, t, s]: query P+t may look at key s (causal, not padding).
+        # A query always sees itself so fully padded rows stay finite.
+        q_pos = torch.arange(P, P + T, device=device).unsqueeze(1)
+        k_pos = torch.arange(P + T, device=device).unsqueeze(0)
+        keep = (k_pos <= q_pos).unsqueeze(0) & ~key_pad[:, None, :]
+        keep = (keep | (k_pos == q_pos).unsqueeze(0)).unsqueeze(1)
+
+        kv_cache = []
+        for i, layer in enumerate(self.encoder.layers):
+            x, kv = self._layer_step(layer, x, past["kv"][i] if past is not None else None, keep)
+            kv_cache.append(kv)
+
+        if self.encoder.norm is not None:
+            x = self.encoder.norm(x)
+
+        past = {"kv": kv_cache, "key_padding": key_pad, "length": P + T}
+        return self.fc_out(x), past
+
     def apply_grammar_mask(self, logits, tokens_so_far, schema_tables, schema_columns, allowed_token_fn=None, intent_signals=None):
         # 🔥 FIX: Added intent_signals to the signature
-        fn = allowed_token_fn if allowed_token_fn is not None else get_allowed_tokens
-        
+        if allowed_token_fn is None and isinstance(tokens_so_far, DecoderStateTracker):
+            # Tracked history: the precomputed mask, no replay
+            allowed = tokens_so_far.mask(intent_signals, logits.device)
+            if logits.size(0) != allowed.size(0):
+                allowed = F.pad(allowed, (0, max(logits.size(0) - allowed.size(0), 0)))[:logits.size(0)]
+            return logits.masked_fill(~allowed, float("-inf"))
+
+        if allowed_token_fn is None:
+            # Default grammar: replay the history through the automaton
+            grammar = get_grammar()
+            state = grammar.run(TOKEN2ID.get(t, TOKEN2ID[UNK]) for t in tokens_so_far)
+            allowed = grammar.mask(state, intent_index(intent_signals), logits.size(0), logits.device)
+            return logits.masked_fill(~allowed, float("-inf"))
+
         # 🔥 FIX: Pass intent_signals into the allowed_token_fn
-        allowed_ids = fn(
+        allowed_ids = allowed_token_fn(
             tokens_so_far=tokens_so_far,
             schema_tables=schema_tables,
             schema_columns=schema_columns,
@@ -227,9 +358,8 @@ class SQLTransformer(nn.Module):
         )
 
         mask = torch.full_like(logits, float("-inf"))
-        for idx in allowed_ids:
-            if idx < logits.size(0): 
-                mask[idx] = 0.0
+        ids = [idx for idx in allowed_ids if idx < logits.size(0)]
+        mask[ids] = 0.0
         return logits + mask
 
     # @torch.no_grad()
@@ -282,35 +412,396 @@ class SQLTransformer(nn.Module):
     
     # below is of gemini for phase4 join + where
     @torch.no_grad()
-    def generate(self, input_ids, attention_mask, schema_tables, schema_columns, max_len=100, allowed_token_fn=None, intent_signals=None):
-        self.eval()
-        generated_token_ids = []
-        generated_tokens = [START]
-    
-        for _ in range(max_len):
-            logits = self.forward(input_ids, attention_mask)
-            next_logits = logits[0, -1, :] 
-    
-            masked_logits = self.apply_grammar_mask(
-                next_logits,
-                tokens_so_far=generated_tokens,
+    def generate(self, input_ids, attention_mask, schema_tables, schema_columns, max_len=100, allowed_token_fn=None, intent_signals=None, use_cache=False, causal=False, skip_forced=False, return_stats=False, num_beams=1):
+        """
+        Grammar-masked decoding of a single prompt (batch of 1): greedy,
+        or beam search when num_beams > 1 (see beam_search).
+
+        use_cache=True: causal decoding with per-layer key/value caching;
+        each step runs only the newest tokens through the encoder. Same
+        tokens as use_cache=False, causal=True (full causal recompute).
+        The default (bidirectional full recompute) is how the shipped
+        checkpoints were trained and is left as is.
+
+        skip_forced / return_stats (greedy only): see generate_batch.
+        """
+        if num_beams > 1:
+            if skip_forced or return_stats:
+                raise ValueError("❌ skip_forced / return_stats are greedy-only")
+            return self.beam_search(
+                input_ids, attention_mask,
                 schema_tables=schema_tables,
                 schema_columns=schema_columns,
+                num_beams=num_beams,
+                max_len=max_len,
                 allowed_token_fn=allowed_token_fn,
-                intent_signals=intent_signals # 🔥 Pass intent to mask
+                intent_signals=intent_signals,
+                use_cache=use_cache,
+                causal=causal
             )
-    
-            if torch.all(masked_logits == float("-inf")): break
-            
-            next_id = torch.argmax(masked_logits).item()
-            generated_token_ids.append(next_id)
-            generated_tokens.append(ID2TOKEN[next_id])
-    
-            if next_id == self.end_id: break
-    
-            # Standard input update [cite: 52, 53]
-            new_id = torch.tensor([[next_id]], device=input_ids.device)
-            input_ids = torch.cat([input_ids, new_id], dim=1)
-            attention_mask = torch.cat([attention_mask, torch.ones((1, 1), device=input_ids.device)], dim=1)
-    
-        return generated_token_ids
\ No newline at end of file
+
+        out = self.generate_batch(
+            input_ids, attention_mask,
+            schema_tables=schema_tables,
+            schema_columns=schema_columns,
+            max_len=max_len,
+            allowed_token_fn=allowed_token_fn,
+            intent_signals=intent_signals,
+            use_cache=use_cache,
+            causal=causal,
+            skip_forced=skip_forced,
+            return_stats=return_stats
+        )
+        if return_stats:
+            return out[0][0], out[1][0]
+        return out[0]
+
+    @torch.no_grad()
+    def generate_batch(self, input_ids, attention_mask=None, schema_tables=None, schema_columns=None, max_len=100, allowed_token_fn=None, intent_signals=None, use_cache=False, causal=False, skip_forced=False, return_stats=False):
+        """
+        Greedy grammar-masked decoding of B padded prompts at once.
+
+        input_ids / attention_mask: (B, T), left or right padded. Each row
+        keeps the positions it would have on its own, so row b decodes the
+        same tokens as generate() on its unpadded prompt.
+        intent_signals: one dict for every row, or a list of B dicts.
+
+        Rows that emit END, reach max_len or hit a grammar dead-end leave
+        the batch, so later steps only run the rows still decoding. With
+        causal=True and no cache, use right padding (a causal query with
+        only padding before it has nothing to attend to).
+
+        skip_forced=True: when the grammar allows exactly one token
+        (START → SELECT, JOIN → <TABLE> → ON → <COLUMN>, ...) it is
+        appended without asking the model; a run of forced tokens is fed
+        to the encoder together with the next model step. Output is
+        unchanged, the forward passes for forced tokens are saved.
+
+        Returns a list of B token id lists; with return_stats=True also a
+        list of B dicts {"forward_passes", "forced_tokens",
+        "forward_passes_saved"}.
+        """
+        self.eval()
+        B = input_ids.size(0)
+        device = input_ids.device
+        V = self.vocab_size
+
+        if attention_mask is None:
+            attention_mask = torch.ones_like(input_ids)
+        if intent_signals is None or isinstance(intent_signals, dict):
+            intent_signals = [intent_signals] * B
+
+        # Per-row grammar state (automaton) or token history (custom fn)
+        grammar = get_grammar() if allowed_token_fn is None else None
+        if grammar is not None:
+            masks = grammar.mask_tensor(V, device)
+            states = [grammar.start] * B
+            intents = [intent_index(s) for s in intent_signals]
+        else:
+            histories = [DecoderStateTracker([START]) for _ in range(B)]
+
+        def row_allowed(i, r):
+            if grammar is not None:
+                return grammar.allowed(states[i], intents[i])
+            return allowed_token_fn(
+                tokens_so_far=histories[i],
+                schema_tables=schema_tables,
+                schema_columns=schema_columns,
+                intent_signals=intent_signals[r]
+            )
+
+        results = [[] for _ in range(B)]
+        stats = [{"forward_passes": 0, "forced_tokens": 0} for _ in range(B)]
+        dead = [False] * B
+        rows = list(range(B))                      # active row → original row
+        pending = [[] for _ in range(B)]           # emitted, not yet fed to the encoder
+
+        def emit(i, token_id):
+            results[rows[i]].append(token_id)
+            pending[i].append(token_id)
+            if grammar is not None:
+                states[i] = grammar.step(states[i], token_id)
+            else:
+                histories[i].append(ID2TOKEN[token_id])
+
+        def finished(r):
+            return dead[r] or len(results[r]) >= max_len or (results[r] and results[r][-1] == self.end_id)
+
+        prompt = (input_ids, attention_mask.long())
+        fed_ids = fed_mask = past = None
+
+        while rows:
+            # 1️⃣ Forced tokens: no model call needed
+            if skip_forced:
+                for i, r in enumerate(rows):
+                    while not finished(r):
+                        allowed = row_allowed(i, r)
+                        if len(allowed) != 1 or next(iter(allowed)) >= V:
+                            break
+                        emit(i, next(iter(allowed)))
+                        stats[r]["forced_tokens"] += 1
+
+            # 2️⃣ Drop finished rows
+            keep = [i for i, r in enumerate(rows) if not finished(r)]
+            if not keep:
+                break
+            if len(keep) < len(rows):
+                idx = torch.tensor(keep, device=device)
+                rows = [rows[i] for i in keep]
+                pending = [pending[i] for i in keep]
+                if grammar is not None:
+                    states = [states[i] for i in keep]
+                    intents = [intents[i] for i in keep]
+                else:
+                    histories = [histories[i] for i in keep]
+                if prompt is not None:
+                    prompt = (prompt[0][idx], prompt[1][idx])
+                if fed_mask is not None:
+                    fed_mask = fed_mask[idx]
+                if fed_ids is not None:
+                    fed_ids = fed_ids[idx]
+                if past is not None:
+                    past = _select_rows(past, idx)
+
+            # 3️⃣ One forward over everything not fed yet (ragged → padded)
+            n = len(rows)
+            k = max(len(p) for p in pending)
+            new_ids = torch.full((n, k), self.pad_id, dtype=torch.long, device=device)
+            new_mask = torch.zeros((n, k), dtype=torch.long, device=device)
+            for i, p in enumerate(pending):
+                if p:
+                    new_ids[i, :len(p)] = torch.tensor(p, device=device)
+                    new_mask[i, :len(p)] = 1
+            if prompt is not None:
+                new_ids = torch.cat([prompt[0], new_ids], dim=1)
+                new_mask = torch.cat([prompt[1], new_mask], dim=1)
+                prompt = None
+            pending = [[] for _ in rows]
+
+            fed_mask = new_mask if fed_mask is None else torch.cat([fed_mask, new_mask], dim=1)
+            position_ids = padded_position_ids(fed_mask)
+            S = new_ids.size(1)
+            if use_cache:
+                logits, past = self.forward_incremental(
+                    new_ids, past=past, attention_mask=new_mask, position_ids=position_ids[:, -S:]
+                )
+            else:
+                fed_ids = new_ids if fed_ids is None else torch.cat([fed_ids, new_ids], dim=1)
+                logits = self.forward(fed_ids, fed_mask, causal=causal, position_ids=position_ids)[:, -S:]
+            for r in rows:
+                stats[r]["forward_passes"] += 1
+
+            # Each row's prediction sits at its last real new token
+            last = (new_mask * torch.arange(S, device=device)).argmax(dim=1)
+            next_logits = logits[torch.arange(n, device=device), last]
+
+            # 4️⃣ All row masks in one op
+            if grammar is not None:
+                allowed = masks[
+                    torch.tensor(states, device=device),
+                    torch.tensor(intents, device=device)
+                ]
+            else:
+                allowed = torch.zeros(n, V, dtype=torch.bool, device=device)
+                for i, r in enumerate(rows):
+                    allowed[i, [idx for idx in row_allowed(i, r) if idx < V]] = True
+
+            next_ids = next_logits.masked_fill(~allowed, float("-inf")).argmax(dim=-1)
+
+            for i, (alive, next_id) in enumerate(zip(allowed.any(dim=-1).tolist(), next_ids.tolist())):
+                if alive:
+                    emit(i, next_id)
+                else:
+                    dead[rows[i]] = True
+
+        if not return_stats:
+            return results
+        for s in stats:
+            s["forward_passes_saved"] = s["forced_tokens"]
+        return results, stats
+
+    @torch.no_grad()
+    def beam_search(self, input_ids, attention_mask=None, schema_tables=None, schema_columns=None, num_beams=4, max_len=100, allowed_token_fn=None, intent_signals=None, use_cache=False, causal=False, return_beams=False):
+        """
+        Grammar-constrained beam search for a single prompt (batch of 1).
+
+        Beams are scored by summed log-probability under the grammar-masked
+        distribution; every live beam goes through one shared forward call
+        per step and carries its own grammar state. Before each forward:
+        - a beam whose state allows no token ends there (as greedy does)
+        - a beam no better than the best finished one is dropped, since
+          scores only go down
+        so search stops as soon as the best finished beam beats every live
+        one. Beams still live at max_len are ranked with the finished ones.
+
+        num_beams=1 gives the same tokens as greedy generate().
+        Returns the best token id list; with return_beams=True, every
+        (score, token ids) candidate, best first.
+        """
+        if input_ids.size(0) != 1:
+            raise ValueError("❌ beam_search decodes one prompt at a time")
+
+        self.eval()
+        device = input_ids.device
+        V = self.vocab_size
+        T = input_ids.size(1)
+
+        if attention_mask is None:
+            attention_mask = torch.ones_like(input_ids)
+        attention_mask = attention_mask.long()
+
+        grammar = get_grammar() if allowed_token_fn is None else None
+        if grammar is not None:
+            masks = grammar.mask_tensor(V, device)
+            intent = intent_index(intent_signals)
+
+        def allowed_mask(states):
+            if grammar is not None:
+                return masks[torch.tensor(states, device=device), intent]
+            allowed = torch.zeros(len(states), V, dtype=torch.bool, device=device)
+            for i, history in enumerate(states):
+                ids = allowed_token_fn(
+                    tokens_so_far=history,
+                    schema_tables=schema_tables,
+                    schema_columns=schema_columns,
+                    intent_signals=intent_signals
+                )
+                allowed[i, [idx for idx in ids if idx < V]] = True
+            return allowed
+
+        def advance(state, token_id):
+            if grammar is not None:
+                return grammar.step(state, token_id)
+            child = state.copy()
+            child.append(ID2TOKEN[token_id])
+            return child
+
+        prompt_pos = padded_position_ids(attention_mask)
+        prompt_last = int((attention_mask[0] * torch.arange(T, device=device)).argmax())
+        first_pos = int(prompt_pos[0, -1]) + 1
+
+        # Live beams as parallel lists; parents index rows of the KV cache
+        scores, seqs = [0.0], [[]]
+        states = [grammar.start if grammar is not None else DecoderStateTracker([START])]
+        parents = [0]
+        finished = []
+
+        if use_cache:
+            prompt_logits, past = self.forward_incremental(
+                input_ids, attention_mask=attention_mask, position_ids=prompt_pos
+            )
+
+        for step in range(max_len):
+            # 1️⃣ Prune before the forward pass
+            allowed = allowed_mask(states)
+            alive = allowed.any(dim=-1).tolist()
+            finished.extend((scores[i], seqs[i]) for i in range(len(seqs)) if not alive[i])
+            best = max((score for score, _ in finished), default=float("-inf"))
+
+            keep = [i for i in range(len(seqs)) if alive[i] and scores[i] > best]
+            if not keep:
+                break
+            scores = [scores[i] for i in keep]
+            seqs = [seqs[i] for i in keep]
+            states = [states[i] for i in keep]
+            parents = [parents[i] for i in keep]
+            allowed = allowed[torch.tensor(keep, device=device)]
+            L = len(keep)
+
+            # 2️⃣ One forward for all live beams
+            if step == 0:
+                if use_cache:
+                    logits = prompt_logits[:, prompt_last]
+                else:
+                    logits = self.forward(input_ids, attention_mask, causal=causal, position_ids=prompt_pos)[:, prompt_last]
+            elif use_cache:
+                past = _select_rows(past, torch.tensor(parents, device=device))
+                new_ids = torch.tensor([[seq[-1]] for seq in seqs], device=device)
+                position_ids = torch.full((L, 1), first_pos + step - 1, dtype=torch.long, device=device)
+                logits, past = self.forward_incremental(new_ids, past=past, position_ids=position_ids)
+                logits = logits[:, -1]
+            else:
+                generated = torch.tensor(seqs, device=device)
+                ids = torch.cat([input_ids.expand(L, -1), generated], dim=1)
+                mask = torch.cat([attention_mask.expand(L, -1), torch.ones_like(generated)], dim=1)
+                logits = self.forward(ids, mask, causal=causal, position_ids=padded_position_ids(mask))[:, -1]
+
+            # 3️⃣ Best continuations across all beams
+            logp = F.log_softmax(logits.masked_fill(~allowed, float("-inf")), dim=-1)
+            total = torch.tensor(scores, device=device).unsqueeze(1) + logp
+            top_scores, top_idx = total.view(-1).topk(min(2 * num_beams, total.numel()))
+
+            new_scores, new_seqs, new_states, new_parents = [], [], [], []
+            for score, flat in zip(top_scores.tolist(), top_idx.tolist()):
+                if score == float("-inf") or len(new_seqs) == num_beams:
+                    break
+                b, token_id = divmod(flat, V)
+                if token_id == self.end_id:
+                    finished.append((score, seqs[b] + [token_id]))
+                    continue
+                new_scores.append(score)
+                new_seqs.append(seqs[b] + [token_id])
+                new_states.append(advance(states[b], token_id))
+                new_parents.append(b)
+
+            scores, seqs, states, parents = new_scores, new_seqs, new_states, new_parents
+            if not seqs:
+                break
+        else:
+            finished.extend(zip(scores, seqs))
+
+        finished.sort(key=lambda c: -c[0])
+        if return_beams:
+            return finished
+        return finished[0][1] if finished else []
+
+
+# ==================================================
+# Padded batches
+# ==================================================
+def padded_position_ids(attention_mask):
+    """
+    (B, T) positions counting only real tokens: left or right padding
+    leaves every row at the positions it has unpadded. Pads get 0 or
+    their row's last position; they are masked out as keys anyway.
+    """
+    return (attention_mask.long().cumsum(dim=1) - 1).clamp(min=0)
+
+
+def _select_rows(past, idx):
+    # Keep the KV cache rows in idx (batch is dim 0 everywhere)
+    return {
+        "kv": [(k[idx], v[idx]) for k, v in past["kv"]],
+        "key_padding": past["key_padding"][idx],
+        "length": past["length"],
+    }
+
+
+# ==================================================
+# Cached vs. full-recompute check
+# ==================================================
+def verify_incremental_decoding(model, input_ids, attention_mask, schema_tables, schema_columns, max_len=100, allowed_token_fn=None, intent_signals=None):
+    """
+    Decodes the same prompt with the KV cache and with full causal
+    recompute and compares them token for token. The legacy
+    bidirectional decode is reported alongside: it only agrees with the
+    cached decoder for checkpoints trained with causal=True.
+    """
+    kwargs = dict(
+        schema_tables=schema_tables,
+        schema_columns=schema_columns,
+        max_len=max_len,
+        allowed_token_fn=allowed_token_fn,
+        intent_signals=intent_signals,
+    )
+    cached = model.generate(input_ids, attention_mask, use_cache=True, **kwargs)
+    reference = model.generate(input_ids, attention_mask, causal=True, **kwargs)
+    legacy = model.generate(input_ids, attention_mask, **kwargs)
+
+    return {
+        "match": cached == reference,
+        "matches_legacy": cached == legacy,
+        "cached": cached,
+        "reference": reference,
+        "legacy": legacy,
+    }
@@ -0,0 +1,127 @@
+"""
+Aligner Runtime
+===============
+Process-wide owner of the SemanticAligner.
+
+Loading all-MiniLM-L6-v2 dominates request latency, so the model is
+loaded once per process (at FastAPI startup, or lazily on first use)
+and the same SemanticAligner instance is shared by every inference
+function and every threadpool worker.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from src.semantic_aligner import SemanticAligner, DEFAULT_MODEL_NAME
+from src.term_cache import DEFAULT_TERM_CACHE_BYTES
+
+# Directory of the persistent column-embedding store; unset = disabled
+EMBEDDING_STORE_ENV = "NL2SQL_EMBEDDING_STORE"
+
+# Memory cap of the user-term embedding LRU, in MB; 0 = disabled
+TERM_CACHE_MB_ENV = "NL2SQL_TERM_CACHE_MB"
+
+logger = logging.getLogger(__name__)
+
+
+class AlignerRuntime:
+    """
+    Lazily builds a single SemanticAligner and records how long it took.
+
+    get() is safe to call concurrently: only the first caller loads the
+    model, the others block on the lock and then reuse the instance.
+    A failed load is recorded in `error` and retried on the next get().
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME):
+        self.model_name = model_name
+        self.load_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+        self._aligner: Optional[SemanticAligner] = None
+        self._lock = threading.Lock()
+
+    # ==================================================
+    # Access
+    # ==================================================
+    @property
+    def loaded(self) -> bool:
+        return self._aligner is not None
+
+    def get(self) -> SemanticAligner:
+        aligner = self._aligner
+        if aligner is not None:
+            return aligner
+
+        with self._lock:
+            if self._aligner is None:
+                start = time.perf_counter()
+                try:
+                    self._aligner = SemanticAligner(
+                        model_name=self.model_name,
+                        store=self._open_store(),
+                        term_cache_bytes=self._term_cache_bytes()
+                    )
+                except Exception as e:
+                    self.error = f"{type(e).__name__}: {e}"
+                    raise
+                self.error = None
+                self.load_seconds = time.perf_counter() - start
+                logger.info(
+                    f"Loaded aligner '{self.model_name}' "
+                    f"in {self.load_seconds:.2f}s"
+                )
+            return self._aligner
+
+    def _open_store(self):
+        root = os.environ.get(EMBEDDING_STORE_ENV)
+        if not root:
+            return None
+
+        from src.embedding_store import EmbeddingStore
+        return EmbeddingStore(root, self.model_name)
+
+    @staticmethod
+    def _term_cache_bytes() -> int:
+        mb = os.environ.get(TERM_CACHE_MB_ENV)
+        if mb is None:
+            return DEFAULT_TERM_CACHE_BYTES
+        return int(float(mb) * 1024 * 1024)
+
+    def warm_up(self) -> dict:
+        self.get()
+        return self.status()
+
+    # ==================================================
+    # Reporting
+    # ==================================================
+    def status(self) -> dict:
+        aligner = self._aligner
+        store = aligner.store if aligner is not None else None
+        term_cache = aligner.term_cache if aligner is not None else None
+        return {
+            "model": self.model_name,
+            "loaded": self.loaded,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+            "stored_columns": len(store) if store is not None else None,
+            "term_cache": term_cache.stats() if term_cache is not None else None,
+            "align_tiers": aligner.tier_stats() if aligner is not None else None
+        }
+
+
+# ============================================================
+# Process-wide singleton
+# ============================================================
+_runtime = AlignerRuntime()
+
+
+def get_runtime() -> AlignerRuntime:
+    return _runtime
+
+
+def get_aligner() -> SemanticAligner:
+    return _runtime.get()
@@ -0,0 +1,57 @@
+"""
+Checkpoint Paths
+================
+Where phase checkpoints live, shared by the trainer (src.train), the
+int8 / TorchScript CLIs (models.quantized, models.exported) and the
+app (app.model_loader).
+
+Deliberately free of torch: the app imports this at startup.
+"""
+
+import os
+
+CHECKPOINT_DIR = "notebooks/checkpoints"
+
+# Phase the app serves
+SERVING_PHASE = "4.5"
+
+# Served by default: where the notebooks save the Phase-4.5 model
+NOTEBOOK_CHECKPOINT = os.path.join(CHECKPOINT_DIR, "phase4_5_best.pt")
+
+# Overrides the served float checkpoint; the int8 artifact is looked
+# up next to it
+MODEL_PATH_ENV = "NL2SQL_MODEL_PATH"
+
+
+def phase_tag(phase: str) -> str:
+    return "phase" + phase.replace(".", "_")
+
+
+def best_checkpoint_path(out_dir: str, phase: str) -> str:
+    tag = phase_tag(phase)
+    return os.path.join(out_dir, tag, f"{tag}_best.pt")
+
+
+def serving_checkpoint_path() -> str:
+    """
+    $NL2SQL_MODEL_PATH, else the notebooks' Phase-4.5 checkpoint. Falls
+    back to the trainer's best Phase-4.5 checkpoint (`python -m
+    src.train --phase 4.5`) only when the notebooks' file is absent.
+    """
+    override = os.environ.get(MODEL_PATH_ENV)
+    if override:
+        return override
+
+    trained = best_checkpoint_path(CHECKPOINT_DIR, SERVING_PHASE)
+    if not os.path.exists(NOTEBOOK_CHECKPOINT) and os.path.exists(trained):
+        return trained
+    return NOTEBOOK_CHECKPOINT
+
+
+def quantized_path(checkpoint: str) -> str:
+    root, ext = os.path.splitext(checkpoint)
+    return f"{root}.int8{ext or '.pt'}"
+
+
+def exported_path(checkpoint: str) -> str:
+    return os.path.splitext(checkpoint)[0] + ".ts"
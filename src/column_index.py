@@ -0,0 +1,198 @@
+"""
+Column Index
+============
+Nearest-column search over normalized schema-column embeddings.
+
+Replaces the full user-terms × schema-columns cos_sim matrix in
+SemanticAligner.align:
+- embeddings are L2-normalized once, stored contiguously, and scored
+  block by block with a single matmul per block
+- rows can be partitioned by table so a search only touches the
+  tables that are in play
+- a column-name → qualified-columns map answers the JOIN ambiguity
+  check ("which tables have a dept_id?") with one dict lookup
+- lazily built TrigramIndexes serve the fuzzy fallback and the
+  lexical tier of the alignment cascade
+
+torch is imported where embeddings are touched, so importing this
+module (and the app) does not load it.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from src.trigram_index import TrigramIndex
+
+DEFAULT_BLOCK_SIZE = 8192
+
+
+class ColumnIndex:
+    def __init__(
+        self,
+        columns: List[str],
+        embeddings,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        normalized: bool = False,
+        trigrams: Optional[TrigramIndex] = None
+    ):
+        """
+        columns: fully-qualified "table.column" strings
+        embeddings: (N, D) tensor, row-aligned with columns
+        normalized: rows are already L2-normalized (rows of another index)
+        trigrams: an existing TrigramIndex over columns to reuse
+        """
+        import torch
+        import torch.nn.functional as F
+
+        self.columns = list(columns)
+        self.block_size = block_size
+
+        embeddings = torch.as_tensor(embeddings).float()
+        if not normalized:
+            embeddings = F.normalize(embeddings, p=2, dim=1)
+        self.embeddings = embeddings.contiguous()
+
+        # "dept_id" → ["employees.dept_id", "departments.dept_id"]
+        self.name_map: Dict[str, List[str]] = {}
+        # "employees" → [row ranges], rows of one table are usually adjacent
+        self.table_ranges: Dict[str, List[Tuple[int, int]]] = {}
+
+        for i, col in enumerate(self.columns):
+            self.name_map.setdefault(col.split(".")[-1], []).append(col)
+
+            table = col.split(".")[0]
+            ranges = self.table_ranges.setdefault(table, [])
+            if ranges and ranges[-1][1] == i:
+                ranges[-1] = (ranges[-1][0], i + 1)
+            else:
+                ranges.append((i, i + 1))
+
+        self._trigrams: Optional[TrigramIndex] = trigrams
+        self._name_trigrams: Optional[TrigramIndex] = None
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    # ==================================================
+    # Lookups
+    # ==================================================
+    def same_name(self, col_name: str) -> List[str]:
+        """Qualified columns whose bare name is col_name, in schema order."""
+        return self.name_map.get(col_name, [])
+
+    @property
+    def trigrams(self) -> TrigramIndex:
+        """Fuzzy-match index over the column strings, built on first use."""
+        if self._trigrams is None:
+            self._trigrams = TrigramIndex(self.columns)
+        return self._trigrams
+
+    @property
+    def name_trigrams(self) -> TrigramIndex:
+        """Fuzzy-match index over the bare column names, built on first use."""
+        if self._name_trigrams is None:
+            self._name_trigrams = TrigramIndex(list(self.name_map))
+        return self._name_trigrams
+
+    # ==================================================
+    # Sub-indexes (rows are reused, never re-normalized)
+    # ==================================================
+    def table_rows(self, tables: List[str]) -> List[int]:
+        """Rows of `tables`, table by table in the given order."""
+        return [
+            i
+            for t in dict.fromkeys(tables)
+            for start, end in self.table_ranges.get(t, [])
+            for i in range(start, end)
+        ]
+
+    def for_tables(self, tables: List[str]) -> "ColumnIndex":
+        """
+        Index over the columns of `tables`, table by table in the given
+        order. A table stored as one row range is sliced, not copied.
+        """
+        import torch
+
+        ranges = [
+            r for t in dict.fromkeys(tables)
+            for r in self.table_ranges.get(t, [])
+        ]
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            rows = self.embeddings[start:end]
+        else:
+            rows = torch.cat(
+                [self.embeddings[s:e] for s, e in ranges]
+                or [self.embeddings[:0]]
+            )
+
+        columns = [c for s, e in ranges for c in self.columns[s:e]]
+        return ColumnIndex(columns, rows, block_size=self.block_size, normalized=True)
+
+    def take(self, rows: List[int]) -> "ColumnIndex":
+        """Index over the given rows of this index, in that order."""
+        return ColumnIndex(
+            [self.columns[i] for i in rows],
+            self.embeddings[rows],
+            block_size=self.block_size,
+            normalized=True
+        )
+
+    # ==================================================
+    # Top-k search
+    # ==================================================
+    def _ranges(self, tables: Optional[List[str]]):
+        if tables is None:
+            n = len(self.columns)
+            return [
+                (s, min(s + self.block_size, n))
+                for s in range(0, n, self.block_size)
+            ]
+
+        ranges = []
+        for t in dict.fromkeys(tables):
+            for start, end in self.table_ranges.get(t, []):
+                for s in range(start, end, self.block_size):
+                    ranges.append((s, min(s + self.block_size, end)))
+        return sorted(ranges)
+
+    def search(self, queries, k: int = 1, tables: Optional[List[str]] = None):
+        """
+        queries: (Q, D) tensor of (unnormalized) term embeddings
+        tables: only score the rows of these tables (None = all rows)
+        Returns (scores, indices), both (Q, min(k, rows searched)), best
+        first; indices are rows of this index. (Q, 0) when no row is
+        searched (empty index or no matching table).
+        Ties keep the lowest column index, like argmax over cos_sim.
+        """
+        import torch
+        import torch.nn.functional as F
+
+        q = F.normalize(torch.as_tensor(queries).float(), p=2, dim=1)
+        q = q.to(self.embeddings.device)
+
+        best_scores = None
+        best_idx = None
+
+        for start, end in self._ranges(tables):
+            scores = q @ self.embeddings[start:end].T
+            if k == 1:
+                s, i = scores.max(dim=1, keepdim=True)
+            else:
+                s, i = scores.topk(min(k, end - start), dim=1)
+            i = i + start
+
+            if best_scores is None:
+                best_scores, best_idx = s, i
+                continue
+
+            # Earlier blocks first so stable sort keeps lower indices on ties
+            s = torch.cat([best_scores, s], dim=1)
+            i = torch.cat([best_idx, i], dim=1)
+            order = torch.sort(s, dim=1, descending=True, stable=True).indices[:, :k]
+            best_scores = s.gather(1, order)
+            best_idx = i.gather(1, order)
+
+        if best_scores is None:
+            empty = torch.empty((q.size(0), 0))
+            return empty, empty.long()
+        return best_scores, best_idx
@@ -0,0 +1,674 @@
+"""
+Corpus Generator
+================
+Streaming, multi-process counterpart of the phase generators in
+data/create_sql_ast_phases.ipynb. Instead of building one list in memory
+and dumping a JSON array, work is cut into units — (phase, table/column
+or join, repeat) — that worker processes expand into samples, and the
+main process streams them to disk as they arrive:
+
+    .jsonl    one sample per line, same fields as data/sql_ast/*.json
+    binary    the memory-mapped training format of src.token_corpus
+              (token ids + grammar states encoded in the workers)
+
+Samples are deduplicated on a 64-bit hash of (nl_query, input_tokens)
+held in a flat numpy hash set (HashDeduplicator), so memory grows by a
+few bytes per distinct sample and never holds the samples themselves.
+
+Unlike the notebooks, every column × operator × template combination is
+enumerated instead of sampled; only <VALUE>s of aggregate/JOIN samples
+are random, drawn from a generator seeded per unit, so --repeats adds
+new values and the output does not depend on --workers.
+
+Any schema in the app's format can be used ({"tables": {...}}, typed or
+plain column lists); JOINs come from an optional "joins" list or else
+from discovered PK–FK pairs (src.schema_parser).
+
+    python -m src.corpus_generator --out data/sql_ast/generated.jsonl
+    python -m src.corpus_generator --schema my_schema.json --repeats 2000 --workers 8 \\
+        --format binary --out data/sql_ast/cache/my_schema
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import time
+from collections import deque
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from src.grammar import get_grammar
+from src.schema_parser import discover_pk_fk_relationships
+from src.token_corpus import TokenCorpusWriter, encode_sample
+
+# ============================================================
+# Default schema (phase-4.5 notebook) and templates
+# ============================================================
+DEFAULT_SCHEMA = {
+    "tables": {
+        "employees": {
+            "numeric": ["emp_id", "salary"],
+            "text": ["first_name", "department", "location"]
+        },
+        "departments": {
+            "numeric": ["dept_id"],
+            "text": ["dept_name", "manager_id"]
+        },
+        "customers": {
+            "numeric": ["id", "age"],
+            "text": ["last_name"]
+        },
+        "orders": {
+            "numeric": ["order_id", "customer_id", "total_amount"],
+            "text": ["order_date"]
+        },
+        "products": {
+            "numeric": ["product_id", "unit_price"],
+            "text": ["product_name", "category"]
+        },
+        "inventory": {
+            "numeric": ["stock_id", "product_id", "quantity"],
+            "text": ["warehouse_location"]
+        }
+    },
+    "joins": [
+        {
+            "left": "employees",
+            "right": "departments",
+            "join_type": "INNER",
+            "foreign_key": "employees.department",
+            "primary_key": "departments.dept_name",
+            "nl_templates": [
+                "employees with their department details",
+                "employees and their departments",
+                "department information for employees"
+            ]
+        },
+        {
+            "left": "customers",
+            "right": "orders",
+            "join_type": "LEFT",
+            "foreign_key": "orders.customer_id",
+            "primary_key": "customers.id",
+            "nl_templates": [
+                "customers and their orders",
+                "orders placed by customers",
+                "customer order details"
+            ]
+        },
+        {
+            "left": "products",
+            "right": "inventory",
+            "join_type": "RIGHT",
+            "foreign_key": "inventory.product_id",
+            "primary_key": "products.product_id",
+            "nl_templates": [
+                "products and their stock",
+                "inventory details for products",
+                "product availability information"
+            ]
+        }
+    ],
+    "text_values": {
+        "department": ["IT", "HR", "Sales"],
+        "location": ["Mumbai", "Delhi"]
+    }
+}
+
+SELECT_TEMPLATES = [
+    "show {column} from {table}",
+    "get {column} from {table}",
+    "list {column} from {table}",
+    "display {column} from {table}"
+]
+
+WHERE_TEMPLATES = [
+    "show {sel_col} from {table} where {where_col} {op} {val}",
+    "get {sel_col} from {table} where {where_col} {op} {val}",
+    "list {sel_col} from {table} where {where_col} {op} {val}"
+]
+
+JOIN_TEMPLATES = [
+    "{left} with their {right} details",
+    "{left} and their {right}",
+    "{right} information for {left}"
+]
+
+NUMERIC_VALUES = [10, 50, 100, 500, 1000]
+NUMERIC_OPS = [">", "<", ">=", "<=", "="]
+
+AGG_RULES = {
+    "numeric": ["SUM", "AVG", "MIN", "MAX", "COUNT"],
+    "text": ["COUNT"],
+    "date": ["MIN", "MAX", "COUNT"]
+}
+JOIN_AGGS = ["SUM", "AVG", "COUNT"]
+
+COLUMN_TYPES = ("numeric", "text", "date")
+
+
+def random_value(rng: random.Random) -> int:
+    return rng.randint(10, 100000)
+
+
+# ============================================================
+# Schema normalization
+# ============================================================
+def normalize_schema(schema_json: dict) -> dict:
+    """
+    App schema JSON → {"tables": {t: {numeric, text, date}}, "joins", "text_values"}.
+    Plain column lists count as text (as in SchemaParser); joins without
+    an explicit list are the discovered PK–FK pairs, as INNER JOINs.
+    """
+    tables = {}
+    for table, meta in schema_json["tables"].items():
+        if isinstance(meta, dict):
+            typed = {t: list(meta.get(t, [])) for t in COLUMN_TYPES}
+            if not any(typed.values()):
+                typed["text"] = list(meta.get("columns", []))
+        else:
+            typed = {"numeric": [], "text": list(meta), "date": []}
+        tables[table] = typed
+
+    if "joins" in schema_json:
+        raw_joins = schema_json["joins"]
+    else:
+        raw_joins = [
+            {
+                "left": rel["left_table"],
+                "right": rel["right_table"],
+                "foreign_key": f"{rel['left_table']}.{rel['left_col']}",
+                "primary_key": f"{rel['right_table']}.{rel['right_col']}"
+            }
+            for rel in discover_pk_fk_relationships(schema_json)
+        ]
+
+    joins = []
+    for j in raw_joins:
+        if j["left"] not in tables or j["right"] not in tables:
+            raise ValueError(f"❌ Join {j['left']} ↔ {j['right']} references an unknown table")
+        foreign_key, primary_key = j.get("on") or (j["foreign_key"], j["primary_key"])
+        joins.append({
+            "left": j["left"],
+            "right": j["right"],
+            "join_type": j.get("join_type", "INNER"),
+            "foreign_key": foreign_key,
+            "primary_key": primary_key,
+            "nl_templates": j.get("nl_templates") or [
+                t.format(left=j["left"], right=j["right"]) for t in JOIN_TEMPLATES
+            ]
+        })
+
+    return {
+        "tables": tables,
+        "joins": joins,
+        "text_values": dict(schema_json.get("text_values", {}))
+    }
+
+
+# ============================================================
+# Phase builders: one unit target → all of its samples
+# ============================================================
+def build_select(schema: dict, target: Tuple[str, str], rng: random.Random) -> Iterator[dict]:
+    table, column = target
+    for tmpl in SELECT_TEMPLATES:
+        yield {
+            "nl_query": tmpl.format(column=column, table=table),
+            "input_tokens": ["<START>", "SELECT", "<COLUMN>", "FROM", "<TABLE>", "<END>"],
+            "schema_bindings": {
+                "<TABLE>": table,
+                "<COLUMN>": f"{table}.{column}"
+            }
+        }
+
+
+def build_where(schema: dict, target: Tuple[str, str], rng: random.Random) -> Iterator[dict]:
+    table, sel_col = target
+    cols = schema["tables"][table]
+
+    conditions = [
+        (where_col, op, val)
+        for where_col in cols["numeric"]
+        for op in NUMERIC_OPS
+        for val in NUMERIC_VALUES
+    ] + [
+        (where_col, "=", val)
+        for where_col in cols["text"]
+        for val in schema["text_values"].get(where_col, [])
+    ]
+
+    for where_col, op, val in conditions:
+        for tmpl in WHERE_TEMPLATES:
+            yield {
+                "nl_query": tmpl.format(sel_col=sel_col, table=table, where_col=where_col, op=op, val=val),
+                "input_tokens": [
+                    "<START>", "SELECT", "<COLUMN>", "FROM", "<TABLE>",
+                    "WHERE", "<COLUMN>", op, "<VALUE>", "<END>"
+                ],
+                "schema_bindings": {
+                    "<TABLE>": table,
+                    "<COLUMN>": [f"{table}.{sel_col}", f"{table}.{where_col}"],
+                    "<VALUE>": val
+                }
+            }
+
+
+def build_aggregate(schema: dict, target: Tuple[str, str], rng: random.Random) -> Iterator[dict]:
+    table, col = target
+    cols = schema["tables"][table]
+    col_type = next(t for t in COLUMN_TYPES if col in cols[t])
+
+    # 1️⃣ Aggregation only
+    for agg in AGG_RULES[col_type]:
+        yield {
+            "nl_query": f"show {agg.lower()} {col} from {table}",
+            "input_tokens": ["<START>", "SELECT", "<AGG>", "<COLUMN>", "FROM", "<TABLE>", "<END>"],
+            "schema_bindings": {
+                "<TABLE>": table,
+                "<AGG>": agg,
+                "<COLUMN>": f"{table}.{col}"
+            }
+        }
+
+    if col_type != "numeric":
+        return
+
+    group_cols = cols["text"] + cols["date"]
+    for agg in AGG_RULES["numeric"]:
+        # 2️⃣ Aggregation + GROUP BY
+        for group_col in group_cols:
+            yield {
+                "nl_query": f"show {agg.lower()} {col} by {group_col} from {table}",
+                "input_tokens": [
+                    "<START>", "SELECT", "<AGG>", "<COLUMN>", "FROM", "<TABLE>",
+                    "GROUP_BY", "<COLUMN>", "<END>"
+                ],
+                "schema_bindings": {
+                    "<TABLE>": table,
+                    "<AGG>": agg,
+                    "<COLUMN>": {
+                        "select": f"{table}.{col}",
+                        "group_by": f"{table}.{group_col}"
+                    }
+                }
+            }
+
+        # 3️⃣ Aggregation + HAVING
+        value = random_value(rng)
+        yield {
+            "nl_query": f"show {agg.lower()} {col} from {table} having {agg.lower()} {col} > {value}",
+            "input_tokens": [
+                "<START>", "SELECT", "<AGG>", "<COLUMN>", "FROM", "<TABLE>",
+                "HAVING", "<AGG>", "<COLUMN>", ">", "<VALUE>", "<END>"
+            ],
+            "schema_bindings": {
+                "<TABLE>": table,
+                "<AGG>": agg,
+                "<COLUMN>": {
+                    "select": f"{table}.{col}",
+                    "having": f"{table}.{col}"
+                },
+                "<VALUE>": value
+            }
+        }
+
+        # 4️⃣ Aggregation + GROUP BY + HAVING
+        for group_col in group_cols:
+            value = random_value(rng)
+            yield {
+                "nl_query": (
+                    f"show {agg.lower()} {col} by {group_col} "
+                    f"from {table} having {agg.lower()} {col} > {value}"
+                ),
+                "input_tokens": [
+                    "<START>", "SELECT", "<AGG>", "<COLUMN>", "FROM", "<TABLE>",
+                    "GROUP_BY", "<COLUMN>",
+                    "HAVING", "<AGG>", "<COLUMN>", ">", "<VALUE>", "<END>"
+                ],
+                "schema_bindings": {
+                    "<TABLE>": table,
+                    "<AGG>": agg,
+                    "<COLUMN>": {
+                        "select": f"{table}.{col}",
+                        "group_by": f"{table}.{group_col}",
+                        "having": f"{table}.{col}"
+                    },
+                    "<VALUE>": value
+                }
+            }
+
+
+def build_join(schema: dict, target: int, rng: random.Random) -> Iterator[dict]:
+    j = schema["joins"][target]
+    left, right = schema["tables"][j["left"]], schema["tables"][j["right"]]
+    join_type = f"{j['join_type']} JOIN"
+    join_tokens = ["<JOIN_TYPE>", "<TABLE>", "ON", "<COLUMN>", "<COLUMN>"]
+
+    for phrase in j["nl_templates"]:
+        # 1️⃣ JOIN only
+        for col in left["text"]:
+            yield {
+                "nl_query": phrase,
+                "input_tokens": ["<START>", "SELECT", "<COLUMN>", "FROM", "<TABLE>"] + join_tokens + ["<END>"],
+                "schema_bindings": {
+                    "<TABLE>": [j["left"], j["right"]],
+                    "<JOIN_TYPE>": join_type,
+                    "<COLUMN>": [f"{j['left']}.{col}", j["foreign_key"], j["primary_key"]]
+                }
+            }
+
+        for agg_col in right["numeric"]:
+            # 2️⃣ JOIN + WHERE
+            value = random_value(rng)
+            yield {
+                "nl_query": f"{phrase} where {agg_col} is greater than {value}",
+                "input_tokens": (
+                    ["<START>", "SELECT", "<COLUMN>", "FROM", "<TABLE>"] + join_tokens
+                    + ["WHERE", "<COLUMN>", ">", "<VALUE>", "<END>"]
+                ),
+                "schema_bindings": {
+                    "<TABLE>": [j["left"], j["right"]],
+                    "<JOIN_TYPE>": join_type,
+                    "<COLUMN>": [j["foreign_key"], j["primary_key"], f"{j['right']}.{agg_col}"],
+                    "<VALUE>": value
+                }
+            }
+
+            for agg in JOIN_AGGS:
+                for group_col in left["text"]:
+                    columns = {
+                        "select": f"{j['right']}.{agg_col}",
+                        "group_by": f"{j['left']}.{group_col}",
+                        "join_left": j["foreign_key"],
+                        "join_right": j["primary_key"]
+                    }
+
+                    # 3️⃣ JOIN + GROUP BY
+                    yield {
+                        "nl_query": f"show {agg.lower()} {agg_col} by {group_col} for {phrase}",
+                        "input_tokens": (
+                            ["<START>", "SELECT", "<AGG>", "<COLUMN>", "FROM", "<TABLE>"] + join_tokens
+                            + ["GROUP_BY", "<COLUMN>", "<END>"]
+                        ),
+                        "schema_bindings": {
+                            "<TABLE>": [j["left"], j["right"]],
+                            "<JOIN_TYPE>": join_type,
+                            "<AGG>": agg,
+                            "<COLUMN>": columns
+                        }
+                    }
+
+                    # 4️⃣ JOIN + GROUP BY + HAVING
+                    value = random_value(rng)
+                    yield {
+                        "nl_query": f"show {group_col} with {agg.lower()} {agg_col} above {value} for {phrase}",
+                        "input_tokens": (
+                            ["<START>", "SELECT", "<AGG>", "<COLUMN>", "FROM", "<TABLE>"] + join_tokens
+                            + ["GROUP_BY", "<COLUMN>", "HAVING", "<AGG>", "<COLUMN>", ">", "<VALUE>", "<END>"]
+                        ),
+                        "schema_bindings": {
+                            "<TABLE>": [j["left"], j["right"]],
+                            "<JOIN_TYPE>": join_type,
+                            "<AGG>": agg,
+                            "<COLUMN>": dict(columns, having=f"{j['right']}.{agg_col}"),
+                            "<VALUE>": value
+                        }
+                    }
+
+
+def _column_targets(schema: dict, types=COLUMN_TYPES) -> List[Tuple[str, str]]:
+    return [
+        (table, col)
+        for table, cols in schema["tables"].items()
+        for t in types
+        for col in cols[t]
+    ]
+
+
+# phase → (unit targets, builder)
+PHASES = {
+    "select": (_column_targets, build_select),
+    "where": (_column_targets, build_where),
+    "aggregate": (_column_targets, build_aggregate),
+    "join": (lambda schema: list(range(len(schema["joins"]))), build_join),
+}
+
+
+# ============================================================
+# Bounded-memory deduplication
+# ============================================================
+def sample_hash(sample: dict) -> int:
+    """64-bit hash of (nl_query, input_tokens); never 0 (the empty slot)."""
+    key = json.dumps([sample["nl_query"], sample["input_tokens"]]).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") or 1
+
+
+class HashDeduplicator:
+    """
+    Set of 64-bit sample hashes in one open-addressing numpy array,
+    kept at most half full: 16–32 bytes per distinct sample, whatever
+    the samples look like. Batches are inserted with vectorized linear
+    probing. Two different samples sharing all 64 hash bits (odds about
+    n² / 2⁶⁵) would drop the second one.
+    """
+
+    def __init__(self, capacity: int = 1 << 20):
+        self.table = np.zeros(1 << max(capacity - 1, 1).bit_length(), dtype=np.uint64)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self) -> int:
+        return self.table.nbytes
+
+    def add(self, hashes) -> np.ndarray:
+        """Insert hashes; returns a bool mask of the ones not seen before."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not hashes.size:
+            return np.zeros(0, dtype=bool)
+        if (self.count + hashes.size) * 2 > self.table.size:
+            self._resize(self.count + hashes.size)
+
+        uniq, first, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+        fresh = self._insert(uniq)
+        # Repeats inside the batch only count once, at their first position
+        return fresh[inverse] & (first[inverse] == np.arange(hashes.size))
+
+    def _resize(self, needed: int):
+        old = self.table[self.table != 0]
+        self.table = np.zeros(1 << (2 * needed - 1).bit_length(), dtype=np.uint64)
+        self.count = 0
+        self._insert(old)
+
+    def _insert(self, keys: np.ndarray) -> np.ndarray:
+        size_mask = self.table.size - 1
+        pos = (keys & np.uint64(size_mask)).astype(np.int64)
+        fresh = np.zeros(keys.size, dtype=bool)
+
+        pending = np.arange(keys.size)
+        while pending.size:
+            slot = self.table[pos[pending]]
+            seen = slot == keys[pending]
+            empty = slot == 0
+
+            # Several keys may probe the same empty slot: the first one
+            # claims it, the rest look again (and move on) next round
+            claim = pending[empty]
+            _, win = np.unique(pos[claim], return_index=True)
+            won = np.zeros(claim.size, dtype=bool)
+            won[win] = True
+            self.table[pos[claim[won]]] = keys[claim[won]]
+            fresh[claim[won]] = True
+
+            occupied = pending[~seen & ~empty]
+            pos[occupied] = (pos[occupied] + 1) & size_mask
+            pending = np.concatenate([occupied, claim[~won]])
+
+        self.count += int(fresh.sum())
+        return fresh
+
+
+# ============================================================
+# Workers
+# ============================================================
+_WORKER: Dict = {}
+
+
+def _init_worker(schema: dict, fmt: str, seed: int):
+    torch.set_num_threads(1)
+    _WORKER.update(
+        schema=schema,
+        fmt=fmt,
+        seed=seed,
+        grammar=get_grammar() if fmt == "binary" else None
+    )
+
+
+def _run_unit(unit: Tuple[str, object, int]):
+    """One unit → (hashes, payloads): JSONL lines or encode_sample tuples."""
+    phase, target, repeat = unit
+    rng = random.Random(f"{_WORKER['seed']}:{phase}:{target}:{repeat}")
+
+    hashes, payloads = [], []
+    for sample in PHASES[phase][1](_WORKER["schema"], target, rng):
+        hashes.append(sample_hash(sample))
+        if _WORKER["fmt"] == "binary":
+            payloads.append(encode_sample(sample, _WORKER["grammar"]))
+        else:
+            payloads.append(json.dumps(sample).encode("utf-8") + b"\n")
+    return np.array(hashes, dtype=np.uint64), payloads
+
+
+def iter_units(schema: dict, phases: List[str], repeats: int) -> Iterator[Tuple[str, object, int]]:
+    """Repeat-major, so any prefix of the output mixes every phase."""
+    targets = {phase: PHASES[phase][0](schema) for phase in phases}
+    for repeat in range(repeats):
+        for phase in phases:
+            for target in targets[phase]:
+                yield phase, target, repeat
+
+
+def _ordered_results(units, workers: int, schema: dict, fmt: str, seed: int, max_inflight: int):
+    # Results come back in unit order (deterministic output), with at
+    # most max_inflight units queued so a slow writer bounds memory
+    if workers <= 1:
+        _init_worker(schema, fmt, seed)
+        yield from map(_run_unit, units)
+        return
+
+    with Pool(workers, initializer=_init_worker, initargs=(schema, fmt, seed)) as pool:
+        inflight = deque()
+        for unit in units:
+            inflight.append(pool.apply_async(_run_unit, (unit,)))
+            if len(inflight) >= max_inflight:
+                yield inflight.popleft().get()
+        while inflight:
+            yield inflight.popleft().get()
+
+
+# ============================================================
+# Generation
+# ============================================================
+def generate(
+    out: str,
+    schema_json: Optional[dict] = None,
+    phases: Optional[List[str]] = None,
+    repeats: int = 1,
+    fmt: str = "jsonl",
+    workers: Optional[int] = None,
+    limit: Optional[int] = None,
+    seed: int = 0,
+    max_inflight: Optional[int] = None,
+    dedup_capacity: int = 1 << 20,
+    log_every: int = 1_000_000
+) -> dict:
+    """
+    Stream a deduplicated synthetic corpus to `out` (a .jsonl path, or a
+    binary prefix with fmt="binary"). Returns counts and timings.
+    """
+    if fmt not in ("jsonl", "binary"):
+        raise ValueError(f"❌ Unknown format: {fmt} (expected jsonl or binary)")
+    phases = phases or list(PHASES)
+    unknown = [p for p in phases if p not in PHASES]
+    if unknown:
+        raise ValueError(f"❌ Unknown phases: {unknown} (expected some of {list(PHASES)})")
+
+    schema = normalize_schema(schema_json or DEFAULT_SCHEMA)
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    dedup = HashDeduplicator(dedup_capacity)
+    stats = {"units": 0, "generated": 0, "written": 0}
+
+    if fmt == "binary":
+        writer = TokenCorpusWriter(out, source=f"src.corpus_generator phases={','.join(phases)}")
+        write = lambda payload: writer.add_encoded(*payload)
+    else:
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        writer = open(out, "wb")
+        write = writer.write
+
+    start = time.perf_counter()
+    next_log = log_every
+    with writer:
+        results = _ordered_results(
+            iter_units(schema, phases, repeats), workers, schema, fmt, seed,
+            max_inflight or 4 * max(workers, 1)
+        )
+        for hashes, payloads in results:
+            stats["units"] += 1
+            stats["generated"] += len(payloads)
+            for payload, new in zip(payloads, dedup.add(hashes)):
+                if new:
+                    write(payload)
+                    stats["written"] += 1
+                    if stats["written"] == limit:
+                        break
+
+            if log_every and stats["written"] >= next_log:
+                print(f"  {stats['written']:,} samples | {stats['written'] / (time.perf_counter() - start):,.0f}/s")
+                next_log += log_every
+            if stats["written"] == limit:
+                results.close()
+                break
+
+    stats["duplicates"] = stats["generated"] - stats["written"]
+    stats["dedup_bytes"] = dedup.nbytes
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+# ============================================================
+# CLI
+# ============================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic NL→SQL skeleton corpus")
+    parser.add_argument("--out", required=True, help=".jsonl path, or a corpus prefix with --format binary")
+    parser.add_argument("--format", default="jsonl", choices=["jsonl", "binary"])
+    parser.add_argument("--schema", default=None, help="schema JSON (default: the phase-4.5 notebook schema)")
+    parser.add_argument("--phases", nargs="+", default=list(PHASES), choices=list(PHASES))
+    parser.add_argument("--repeats", type=int, default=1, help="passes over every unit; each draws new values")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many distinct samples")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    schema_json = None
+    if args.schema:
+        with open(args.schema) as f:
+            schema_json = json.load(f)
+
+    stats = generate(
+        args.out, schema_json, args.phases, args.repeats, args.format,
+        args.workers, args.limit, args.seed
+    )
+    print(
+        f"✅ {stats['written']:,} samples → {args.out} "
+        f"({stats['duplicates']:,} duplicates dropped, {stats['units']:,} units, "
+        f"{stats['seconds']:.1f}s, dedup table {stats['dedup_bytes'] / 2**20:.0f} MiB)"
+    )
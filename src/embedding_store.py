@@ -0,0 +1,190 @@
+"""
+Embedding Store
+===============
+Persistent, memory-mapped cache of column embeddings.
+
+Rows are keyed by (model name, column string). Each model gets its own
+directory:
+
+    <root>/<model_name>/
+        meta.json      {"dim": 384, "dtype": "float32"}
+        vectors.bin    flat row-major array, dim values per row
+        keys.jsonl     one JSON-encoded column string per row
+        .lock          advisory lock for cross-process appends
+
+vectors.bin is opened with numpy.memmap, so every uvicorn worker on a
+host shares the same page-cache pages instead of holding its own copy.
+New columns are appended; keys.jsonl is written after the vectors and
+acts as the commit record, so a crash mid-append never exposes a
+half-written row. A key line left without its newline by such a crash is
+cut off on open and before the next append.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process locking only
+    fcntl = None
+
+
+class EmbeddingStore:
+    def __init__(self, root: str, model_name: str, dtype: str = "float32"):
+        self.model_name = model_name
+        self.dir = os.path.join(root, model_name.replace("/", "__"))
+        os.makedirs(self.dir, exist_ok=True)
+
+        self._meta_path = os.path.join(self.dir, "meta.json")
+        self._vectors_path = os.path.join(self.dir, "vectors.bin")
+        self._keys_path = os.path.join(self.dir, "keys.jsonl")
+        self._lock_path = os.path.join(self.dir, ".lock")
+
+        self.dim: Optional[int] = None
+        self.dtype = np.dtype(dtype)
+        self._load_meta()
+
+        self._index: Dict[str, int] = {}
+        self._keys_offset = 0
+        self._vectors = None
+        self._lock = threading.Lock()
+
+        with self._lock:
+            handle = self._flock(exclusive=True)
+            try:
+                self._read_new_rows()
+                self._drop_partial_keys()
+            finally:
+                self._unlock(handle)
+
+    def _load_meta(self):
+        # dim/dtype are fixed by whichever process wrote the first row
+        if self.dim is None and os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+            self.dim = meta["dim"]
+            self.dtype = np.dtype(meta["dtype"])
+
+    # ==================================================
+    # Locking helpers
+    # ==================================================
+    def _flock(self, exclusive: bool):
+        handle = open(self._lock_path, "a")
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return handle
+
+    @staticmethod
+    def _unlock(handle):
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+        handle.close()
+
+    # ==================================================
+    # Load rows appended by this or any other process
+    # ==================================================
+    def _refresh(self):
+        if not os.path.exists(self._keys_path):
+            return
+        if os.path.getsize(self._keys_path) == self._keys_offset:
+            return
+
+        handle = self._flock(exclusive=False)
+        try:
+            self._read_new_rows()
+        finally:
+            self._unlock(handle)
+
+    def _read_new_rows(self):
+        # Caller must hold the file lock (shared or exclusive)
+        if not os.path.exists(self._keys_path):
+            return
+        self._load_meta()
+        with open(self._keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            chunk = f.read()
+
+        # Only complete lines are committed rows
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            self._index.setdefault(json.loads(line), len(self._index))
+        self._keys_offset += end
+
+        n = len(self._index)
+        if n and self.dim:
+            self._vectors = np.memmap(
+                self._vectors_path, dtype=self.dtype,
+                mode="r", shape=(n, self.dim)
+            )
+
+    def _drop_partial_keys(self):
+        # Caller must hold the exclusive file lock, after _read_new_rows.
+        # Appending after a crash's unterminated key line would merge it
+        # with the next key into a line that never parses.
+        if not os.path.exists(self._keys_path):
+            return
+        if os.path.getsize(self._keys_path) > self._keys_offset:
+            with open(self._keys_path, "r+b") as f:
+                f.truncate(self._keys_offset)
+
+    # ==================================================
+    # Public API
+    # ==================================================
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Stored rows for the keys that are present (float32 copies)."""
+        with self._lock:
+            self._refresh()
+            vectors = self._vectors
+            found = {}
+            for k in keys:
+                i = self._index.get(k)
+                if i is not None:
+                    found[k] = np.asarray(vectors[i], dtype=np.float32)
+            return found
+
+    def add_many(self, keys: List[str], vectors: np.ndarray):
+        """Appends rows for keys not stored yet."""
+        vectors = np.asarray(vectors)
+        if vectors.ndim != 2 or not len(keys):
+            return
+
+        with self._lock:
+            handle = self._flock(exclusive=True)
+            try:
+                self._read_new_rows()
+                self._drop_partial_keys()
+
+                if self.dim is None:
+                    self.dim = int(vectors.shape[1])
+                    with open(self._meta_path, "w") as f:
+                        json.dump({"dim": self.dim, "dtype": self.dtype.name}, f)
+
+                new_rows, new_keys, seen = [], [], set()
+                for k, v in zip(keys, vectors):
+                    if k not in self._index and k not in seen:
+                        seen.add(k)
+                        new_keys.append(k)
+                        new_rows.append(v)
+                if not new_keys:
+                    return
+
+                # Drop bytes of any uncommitted row before appending
+                row_bytes = self.dim * self.dtype.itemsize
+                with open(self._vectors_path, "ab") as f:
+                    f.truncate(len(self._index) * row_bytes)
+                    f.write(np.asarray(new_rows, dtype=self.dtype).tobytes())
+
+                with open(self._keys_path, "ab") as f:
+                    for k in new_keys:
+                        f.write(json.dumps(k).encode("utf-8") + b"\n")
+
+                self._read_new_rows()
+            finally:
+                self._unlock(handle)
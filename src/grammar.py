@@ -0,0 +1,243 @@
+"""
+Grammar Automaton
+=================
+The decoder grammar (src.utils.get_allowed_tokens) compiled into a
+finite-state automaton over token ids.
+
+get_allowed_tokens only looks at a few facts about the history (the
+history summary in src.utils):
+- the last token, and whether the one before it opened a JOIN
+- where the last ON is and what followed it
+- the most dominant clause keyword seen so far
+  (LIMIT/OFFSET > ORDER BY > HAVING > GROUP BY > WHERE > FROM > SELECT)
+- the WHERE / HAVING intent flags
+
+Those facts are the automaton state. Each state stores its boolean vocab
+mask for the four intent combinations, and its transitions are a list
+indexed by token id, so masking and advancing a decoding step are O(1).
+
+The grammar rules themselves live in src.utils only: each state maps
+its facts to a decoder state with summary_state, and its allowed sets
+and masks are rows of the precomputed decoder-state table
+(allowed_token_set / allowed_token_masks). All (V + 1) * 96 states are
+built up front (a few ms), off-grammar histories from teacher forcing
+on noisy data included.
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import torch
+import torch.nn.functional as F
+
+from src.utils import (
+    CLAUSE_RANK, N_CLAUSE_RANKS, N_ON, ON_NONE,
+    advance_on, allowed_token_masks, allowed_token_row, allowed_token_set,
+    summary_state,
+)
+from src.vocab import TOKEN2ID, ID2TOKEN, VOCAB_SIZE, UNK, START, JOIN, INNER_JOIN, LEFT_JOIN
+
+# ------------------------------
+# History summary
+# ------------------------------
+_JOIN_IDS = {TOKEN2ID[t] for t in (JOIN, INNER_JOIN, LEFT_JOIN)}
+_START_ID = TOKEN2ID[START]
+_UNK_ID = TOKEN2ID[UNK]
+
+# (last token id or -1, previous token opened a JOIN, ON summary, clause rank)
+Key = Tuple[int, bool, int, int]
+_EMPTY: Key = (-1, False, ON_NONE, 0)
+
+N_INTENTS = 4
+
+# Bump when the state key or _advance changes: state ids stored on disk
+# (src.token_corpus) are only valid for the encoding they were built with
+STATE_ENCODING = 1
+
+
+def intent_index(intent_signals: Optional[dict]) -> int:
+    """0 = none, 1 = WHERE, 2 = HAVING, 3 = both."""
+    if not intent_signals:
+        return 0
+    return int(bool(intent_signals.get("where"))) + 2 * int(bool(intent_signals.get("having")))
+
+
+def _intent_signals(index: int) -> dict:
+    return {"where": bool(index & 1), "having": bool(index & 2)}
+
+
+def _last_token(key: Key) -> Optional[str]:
+    last = key[0]
+    return ID2TOKEN.get(last, UNK) if last >= 0 else None
+
+
+def _advance(key: Key, token_id: int) -> Key:
+    last, _, on, rank = key
+    token = ID2TOKEN.get(token_id, UNK)
+    return (
+        token_id,
+        last in _JOIN_IDS,
+        advance_on(on, token),
+        max(rank, CLAUSE_RANK.get(token, 0))
+    )
+
+
+def decoder_state(key: Key) -> str:
+    """infer_decoder_state of any history with these facts."""
+    _, prev_join, on, rank = key
+    return summary_state(_last_token(key), prev_join, on, rank)
+
+
+class GrammarAutomaton:
+    """
+    State ids are a fixed encoding of the history facts, so they mean
+    the same thing in every process: ids computed by DataLoader workers
+    index the main process's mask table directly.
+    """
+
+    def __init__(self, vocab_size: int = VOCAB_SIZE):
+        self.vocab_size = vocab_size
+        self.n_states = (vocab_size + 1) * 2 * N_ON * N_CLAUSE_RANKS
+
+        # Every state's key, allowed sets and masks, built once from the
+        # decoder-state table in src.utils
+        self.keys: List[Key] = [self._decode(s) for s in range(self.n_states)]
+        self._allowed: List[Tuple[frozenset, ...]] = []
+        intents = [_intent_signals(i) for i in range(N_INTENTS)]
+        rows = []
+        for key in self.keys:
+            state, last_token = decoder_state(key), _last_token(key)
+            self._allowed.append(tuple(
+                allowed_token_set(state, last_token, it) for it in intents
+            ))
+            rows.extend(allowed_token_row(state, last_token, it) for it in intents)
+
+        masks = allowed_token_masks()[rows]
+        if vocab_size > VOCAB_SIZE:
+            masks = F.pad(masks, (0, vocab_size - VOCAB_SIZE), value=False)
+        self._masks = masks[:, :vocab_size].reshape(self.n_states, N_INTENTS, vocab_size)
+
+        self._next: List[List[int]] = [[-1] * vocab_size for _ in range(self.n_states)]
+        self._stacked: Dict[Tuple, torch.Tensor] = {}
+        self._lock = threading.Lock()
+
+        self.initial = self._encode(_EMPTY)
+        self.start = self.step(self.initial, _START_ID)
+
+    def __len__(self) -> int:
+        return self.n_states
+
+    # ==================================================
+    # State encoding
+    # ==================================================
+    def _encode(self, key: Key) -> int:
+        last, prev_join, on, rank = key
+        return (((last + 1) * 2 + int(prev_join)) * N_ON + on) * N_CLAUSE_RANKS + rank
+
+    def _decode(self, state: int) -> Key:
+        state, rank = divmod(state, N_CLAUSE_RANKS)
+        state, on = divmod(state, N_ON)
+        last, prev_join = divmod(state, 2)
+        return (last - 1, bool(prev_join), on, rank)
+
+    # ==================================================
+    # Decoding API
+    # ==================================================
+    def step(self, state: int, token_id: int) -> int:
+        """State after emitting token_id. O(1): a table lookup once seen."""
+        if not 0 <= token_id < self.vocab_size:
+            token_id = _UNK_ID
+        nxt = self._next[state][token_id]
+        if nxt < 0:
+            nxt = self._next[state][token_id] = self._encode(_advance(self.keys[state], token_id))
+        return nxt
+
+    def run(self, token_ids, state: Optional[int] = None) -> int:
+        state = self.initial if state is None else state
+        for t in token_ids:
+            state = self.step(state, int(t))
+        return state
+
+    def allowed(self, state: int, intent: int = 0) -> frozenset:
+        """Same set get_allowed_tokens returns for this history."""
+        return self._allowed[state][intent]
+
+    def mask(self, state: int, intent: int = 0, size: Optional[int] = None, device=None) -> torch.Tensor:
+        """(size,) bool mask; ids beyond the grammar vocab are disallowed."""
+        return self.mask_tensor(size, device)[state, intent]
+
+    def mask_tensor(self, size: Optional[int] = None, device=None) -> torch.Tensor:
+        """All masks as one (S, N_INTENTS, size) bool tensor, cached per size/device."""
+        size = size or self.vocab_size
+        cache_key = (size, str(device) if device is not None else "cpu")
+
+        stacked = self._stacked.get(cache_key)
+        if stacked is None:
+            with self._lock:
+                stacked = self._masks
+                if size > self.vocab_size:
+                    stacked = F.pad(stacked, (0, size - self.vocab_size), value=False)
+                else:
+                    stacked = stacked[..., :size]
+                stacked = stacked.to(device) if device is not None else stacked
+                self._stacked[cache_key] = stacked
+        return stacked
+
+    # ==================================================
+    # Teacher forcing
+    # ==================================================
+    def prefix_states(self, input_ids: torch.Tensor) -> torch.Tensor:
+        """
+        input_ids: (B, T). Returns (B, T) state ids, where [b, t] is the
+        state after input_ids[b, :t+1] — the history the allowed set
+        for predicting position t+1 is computed from.
+        """
+        rows = []
+        for seq in input_ids.tolist():
+            state = self.initial
+            row = []
+            for t in seq:
+                state = self.step(state, t)
+                row.append(state)
+            rows.append(row)
+        return torch.tensor(rows, dtype=torch.long, device=input_ids.device)
+
+
+# ============================================================
+# Grammar-masked training loss
+# ============================================================
+def grammar_masked_loss(logits, input_ids, labels, automaton=None, intent_signals=None, fill=-500.0, states=None):
+    """
+    Vectorized equivalent of the notebooks' phase4_5_loss: logits of
+    tokens the grammar forbids after input_ids[b, :t+1] get `fill`
+    added, positions with label -100 are left unmasked.
+
+    states: (B, T) prefix states precomputed by the dataset
+    (src.training_data); without them they are derived from input_ids.
+    """
+    automaton = automaton or get_grammar()
+    B, T, V = logits.size()
+
+    if states is None:
+        states = automaton.prefix_states(input_ids)
+    allowed = automaton.mask_tensor(V, logits.device)[states.to(logits.device), intent_index(intent_signals)]
+    allowed |= (labels == -100).unsqueeze(-1)
+
+    bias = torch.zeros_like(logits).masked_fill(~allowed, fill)
+    return F.cross_entropy((logits + bias).view(-1, V), labels.view(-1), ignore_index=-100)
+
+
+# ============================================================
+# Process-wide singleton
+# ============================================================
+_grammar: Optional[GrammarAutomaton] = None
+_grammar_lock = threading.Lock()
+
+
+def get_grammar() -> GrammarAutomaton:
+    global _grammar
+    if _grammar is None:
+        with _grammar_lock:
+            if _grammar is None:
+                _grammar = GrammarAutomaton()
+    return _grammar
@@ -300,7 +300,155 @@
 
 
 # after updating for right join
+# (compiled: one phrase pass per query; WHERE / HAVING chunks reuse its offsets)
 import re
+from bisect import bisect_left
+from functools import lru_cache
+
+from src.phrase_matcher import PhraseMatcher
+
+# ------------------------------
+# Precompiled patterns
+# ------------------------------
+_WORD_RE = re.compile(r"[a-zA-Z_]+")
+_NUMBER_RE = re.compile(r"\b\d+\b")
+_STRING_RE = re.compile(r"'(.*?)'|\"(.*?)\"")
+_LOGIC_RE = re.compile(r"\b(and|or)\b")
+
+# Symbol operators, in override priority
+_SYMBOL_OPS = (">=", "<=", ">", "<", "=")
+_SYMBOL_RANKS = {op: (rank,) for rank, op in enumerate(_SYMBOL_OPS)}
+
+# Clause keywords
+_WHERE = " where "
+_BY = " by "
+_HAVING = " having "
+_OR = " or "
+_AND = " and "
+
+# JOIN hints
+_OUTER_JOIN_HINTS = ("including", "without", "with no")
+_PRESERVE_SEPARATORS = (" without ", " with no ")
+_LEFT_JOIN_PHRASES = (
+    "with or without",
+    "even if",
+    "including",
+    "including those",
+    "all",
+    "their"
+)
+
+_KEYWORDS = (
+    (_WHERE, _BY, _HAVING, _OR, _AND)
+    + _OUTER_JOIN_HINTS + _PRESERVE_SEPARATORS + _LEFT_JOIN_PHRASES
+)
+
+
+def _phrase_ranks(items):
+    """phrase → positions of the groups listing it, e.g. "max" → (3,)"""
+    ranks = {}
+    for rank, (_, phrases) in enumerate(items):
+        for p in phrases:
+            ranks.setdefault(p, []).append(rank)
+    return {p: tuple(r) for p, r in ranks.items()}
+
+
+@lru_cache(maxsize=32)
+def _compile_matcher(agg_items, op_items):
+    phrases = [kw for _, kws in agg_items for kw in kws]
+    phrases += [p for _, ps in op_items for p in ps]
+    phrases += list(_SYMBOL_OPS) + list(_KEYWORDS)
+    return (
+        PhraseMatcher(phrases),
+        _phrase_ranks(agg_items),
+        _phrase_ranks(op_items)
+    )
+
+
+def _first_rank(ranks, phrases):
+    """Lowest group position among the phrases found, or None."""
+    best = None
+    for p in phrases:
+        r = ranks.get(p)
+        if r is not None and (best is None or r[0] < best):
+            best = r[0]
+    return best
+
+
+class _Scan:
+    """
+    Phrase offsets of one lowercased query, from a single matcher scan.
+    Substring checks on a WHERE chunk / HAVING part become offset range
+    checks instead of fresh `in` scans of a sliced string.
+    """
+
+    def __init__(self, query: str, matcher: PhraseMatcher):
+        self.query = query
+        self.hits = matcher.positions(query)
+
+        # (start, phrase) in start order, built on the first span lookup
+        self._found = None
+        self._starts = None
+
+    def first(self, phrase: str):
+        pos = self.hits.get(phrase)
+        return pos[0] if pos else None
+
+    def has(self, phrase: str, start: int = 0, end: int = None) -> bool:
+        """`phrase in query[start:end]`"""
+        pos = self.hits.get(phrase)
+        if not pos:
+            return False
+        if end is None:
+            return pos[-1] >= start
+        i = bisect_left(pos, start)
+        return i < len(pos) and pos[i] + len(phrase) <= end
+
+    def has_any(self, phrases) -> bool:
+        return any(p in self.hits for p in phrases)
+
+    def present(self, start: int = 0, end: int = None):
+        """Phrases occurring inside query[start:end]."""
+        if start == 0 and end is None:
+            return self.hits.keys()
+
+        if self._found is None:
+            self._found = sorted(
+                (s, phrase)
+                for phrase, starts in self.hits.items()
+                for s in starts
+            )
+            self._starts = [s for s, _ in self._found]
+
+        phrases = []
+        found = self._found
+        i = bisect_left(self._starts, start)
+        while i < len(found) and found[i][0] < end:
+            s, phrase = found[i]
+            if s + len(phrase) <= end:
+                phrases.append(phrase)
+            i += 1
+        return phrases
+
+    def split(self, sep: str, start: int):
+        """Spans of `query[start:].split(sep)`."""
+        spans = []
+        cursor = start
+        for s in self.hits.get(sep, ()):
+            if s >= cursor:
+                spans.append((cursor, s))
+                cursor = s + len(sep)
+        spans.append((cursor, len(self.query)))
+        return spans
+
+    def joined(self, left: str, sep: str, right: str) -> bool:
+        """`f"{left}{sep}{right}" in query`"""
+        q = self.query
+        return any(
+            q.endswith(left, 0, s) and q.startswith(right, s + len(sep))
+            for s in self.hits.get(sep, ())
+        )
+
 
 class NLParser:
     def __init__(self):
@@ -353,6 +501,14 @@ class NLParser:
         for kws in self.agg_map.values():
             self.agg_words.update(kws)
 
+        # 🔑 one matcher for every phrase above (shared across instances)
+        self.matcher, self._agg_ranks, self._op_ranks = _compile_matcher(
+            tuple((agg, tuple(kws)) for agg, kws in self.agg_map.items()),
+            tuple((op, tuple(ps)) for op, ps in self.text_ops.items())
+        )
+        self._agg_names = list(self.agg_map)
+        self._op_names = list(self.text_ops)
+
     # ==================================================
     # Normalize entities
     # ==================================================
@@ -363,11 +519,30 @@ class NLParser:
             normalized.append(self.synonyms.get(key, e))
         return normalized
 
+    # ==================================================
+    # Span helpers
+    # ==================================================
+    # First matching group, in agg_map / text_ops / symbol order,
+    # among the phrases found in some span of the query
+    def _agg_in(self, phrases):
+        rank = _first_rank(self._agg_ranks, phrases)
+        return self._agg_names[rank] if rank is not None else None
+
+    def _text_op_in(self, phrases):
+        rank = _first_rank(self._op_ranks, phrases)
+        return self._op_names[rank] if rank is not None else None
+
+    @staticmethod
+    def _symbol_op_in(phrases):
+        rank = _first_rank(_SYMBOL_RANKS, phrases)
+        return _SYMBOL_OPS[rank] if rank is not None else None
+
     # ==================================================
     # Main parse
     # ==================================================
     def parse(self, query: str):
         query = query.lower()
+        scan = _Scan(query, self.matcher)
 
         signals = {
             "aggregations": [],
@@ -397,9 +572,11 @@ class NLParser:
         # ------------------------------
         # Aggregations
         # ------------------------------
-        for agg, kws in self.agg_map.items():
-            if any(kw in query for kw in kws):
-                signals["aggregations"].append(agg)
+        found = {
+            rank for p in scan.hits if p in self._agg_ranks
+            for rank in self._agg_ranks[p]
+        }
+        signals["aggregations"] = [self._agg_names[r] for r in sorted(found)]
 
         if signals["aggregations"]:
             signals["intent"] = "aggregation"
@@ -407,16 +584,21 @@ class NLParser:
         # ------------------------------
         # Numbers & strings
         # ------------------------------
-        signals["numbers"] = re.findall(r"\b\d+\b", query)
-        quoted = re.findall(r"'(.*?)'|\"(.*?)\"", query)
-        signals["strings"] = [q[0] or q[1] for q in quoted]
+        signals["numbers"] = _NUMBER_RE.findall(query)
+        if "'" in query or '"' in query:
+            quoted = _STRING_RE.findall(query)
+            signals["strings"] = [q[0] or q[1] for q in quoted]
 
         # ------------------------------
         # Tokenize
         # ------------------------------
-        tokens = re.findall(r"[a-zA-Z_]+", query)
-        tokens = [t for t in tokens if t not in self.stopwords]
-        tokens = self.normalize_entities(tokens)
+        # Tokens are already stripped, lowercase ASCII: normalize_entities
+        # reduces to a synonym lookup
+        synonyms = self.synonyms
+        tokens = [
+            synonyms.get(t, t) for t in _WORD_RE.findall(query)
+            if t not in self.stopwords
+        ]
         signals["entities"] = tokens
 
         # ------------------------------
@@ -441,7 +623,7 @@ class NLParser:
 
             table_list = signals["tables"]
 
-            if "including" in query or "without" in query or "with no" in query:
+            if scan.has_any(_OUTER_JOIN_HINTS):
 
                 for t1 in table_list:
                     for t2 in table_list:
@@ -449,18 +631,18 @@ class NLParser:
                             continue
 
                         # Pattern: <t2> without <t1> → preserve t2 → RIGHT JOIN
-                        if (
-                            f"{t2} without {t1}" in query
-                            or f"{t2} with no {t1}" in query
+                        if any(
+                            scan.joined(t2, sep, t1)
+                            for sep in _PRESERVE_SEPARATORS
                         ):
                             signals["join_type"] = "RIGHT"
                             signals["join_confidence"] = "explicit"
                             signals["preserve_table"] = t2
 
                         # Pattern: <t1> without <t2> → preserve t1 → LEFT JOIN
-                        elif (
-                            f"{t1} without {t2}" in query
-                            or f"{t1} with no {t2}" in query
+                        elif any(
+                            scan.joined(t1, sep, t2)
+                            for sep in _PRESERVE_SEPARATORS
                         ):
                             signals["join_type"] = "LEFT"
                             signals["join_confidence"] = "explicit"
@@ -468,16 +650,7 @@ class NLParser:
 
             # Preserve backward compatibility
             if signals["preserve_table"] is None:
-                left_join_phrases = [
-                    "with or without",
-                    "even if",
-                    "including",
-                    "including those",
-                    "all",
-                    "their"
-                ]
-
-                if any(p in query for p in left_join_phrases):
+                if scan.has_any(_LEFT_JOIN_PHRASES):
                     signals["join_type"] = "LEFT"
                     signals["join_confidence"] = "explicit"
 
@@ -491,40 +664,49 @@ class NLParser:
         # ------------------------------
         # WHERE & Multi-Condition Detection
         # ------------------------------
-        if " where " in query:
+        where_at = scan.first(_WHERE)
+        if where_at is not None:
             signals["where"] = True
-            where_clause = query.split(" where ", 1)[1]
-            parts = re.split(r'\b(and|or)\b', where_clause)
-            
-            for part in parts:
-                part = part.strip()
+            clause_start = where_at + len(_WHERE)
+
+            # Spans of re.split(r'\b(and|or)\b', where_clause)
+            pieces = []
+            cursor = clause_start
+            for m in _LOGIC_RE.finditer(query, clause_start):
+                pieces.append((cursor, m.start()))
+                cursor = m.end()
+            pieces.append((cursor, len(query)))
+
+            for start, end in pieces:
+                raw = query[start:end]
+                part = raw.strip()
                 if part in ['and', 'or'] or not part:
                     continue
-                
-                chunk_entities = re.findall(r"[a-zA-Z_]+", part)
-                chunk_entities = [
-                    self.synonyms.get(e, e)
-                    for e in chunk_entities
-                    if e not in self.stopwords
-                ]
-                
-                chunk_nums = re.findall(r"\b\d+\b", part)
-                chunk_strs = re.findall(r"'(.*?)'|\"(.*?)\"", part)
+                start += len(raw) - len(raw.lstrip())
+                end = start + len(part)
+
+                chunk_entity = None
+                for e in _WORD_RE.findall(query, start, end):
+                    if e not in self.stopwords:
+                        chunk_entity = synonyms.get(e, e)
+                        break
+
+                chunk_strs = (
+                    _STRING_RE.findall(part)
+                    if "'" in part or '"' in part else []
+                )
+                chunk_num = _NUMBER_RE.search(query, start, end)
                 chunk_val = (
                     (chunk_strs[0][0] or chunk_strs[0][1])
                     if chunk_strs else
-                    (chunk_nums[0] if chunk_nums else None)
+                    (chunk_num.group() if chunk_num else None)
                 )
 
-                chunk_op = "="
-                for op, phrases in self.text_ops.items():
-                    if any(phrase in part for phrase in phrases):
-                        chunk_op = op
-                        break
-                
-                if chunk_entities and chunk_val:
+                chunk_op = self._text_op_in(scan.present(start, end)) or "="
+
+                if chunk_entity is not None and chunk_val:
                     signals["where_conditions"].append({
-                        "column": chunk_entities[0],
+                        "column": chunk_entity,
                         "operator": chunk_op,
                         "value": chunk_val
                     })
@@ -538,30 +720,23 @@ class NLParser:
         # ------------------------------
         # GROUP BY
         # ------------------------------
-        if " by " in query:
-            after = query.split(" by ", 1)[1]
-            gb = re.findall(r"[a-zA-Z_]+", after)
-            gb = [g for g in gb if g not in self.stopwords]
-            signals["group_by"] = self.normalize_entities(gb)
+        by_at = scan.first(_BY)
+        if by_at is not None:
+            signals["group_by"] = [
+                synonyms.get(g, g)
+                for g in _WORD_RE.findall(query, by_at + len(_BY))
+                if g not in self.stopwords
+            ]
 
         # ------------------------------
         # GLOBAL operator
         # ------------------------------
-        for op, phrases in self.text_ops.items():
-            if any(p in query for p in phrases):
-                signals["operator"] = op
-                break
-
-        if ">=" in query:
-            signals["operator"] = ">="
-        elif "<=" in query:
-            signals["operator"] = "<="
-        elif ">" in query:
-            signals["operator"] = ">"
-        elif "<" in query:
-            signals["operator"] = "<"
-        elif "=" in query:
-            signals["operator"] = "="
+        present = scan.present()
+        signals["operator"] = (
+            self._symbol_op_in(present)
+            or self._text_op_in(present)
+            or signals["operator"]
+        )
 
         # ------------------------------
         # Value
@@ -580,46 +755,30 @@ class NLParser:
         # ------------------------------
         # HAVING detection (UNCHANGED)
         # ------------------------------
-        if " having " in query:
+        having_at = scan.first(_HAVING)
+        if having_at is not None:
             signals["having"] = True
-            having_part = query.split(" having ", 1)[1]
+            having_start = having_at + len(_HAVING)
 
-            if " or " in having_part:
-                parts = having_part.split(" or ")
+            if scan.has(_OR, having_start):
+                parts = scan.split(_OR, having_start)
                 signals["having_logic"] = "OR"
             else:
-                parts = having_part.split(" and ")
+                parts = scan.split(_AND, having_start)
                 signals["having_logic"] = "AND"
 
-            for part in parts:
-                detected_agg = None
-                for agg, kws in self.agg_map.items():
-                    if any(k in part for k in kws):
-                        detected_agg = agg
-                        break
-
-                detected_op = "="
-                for op, phrases in self.text_ops.items():
-                    for phrase in phrases:
-                        if phrase in part:
-                            detected_op = op
-                            break
-                    if detected_op != "=":
-                        break
+            for start, end in parts:
+                present = scan.present(start, end)
+                detected_agg = self._agg_in(present)
 
-                if ">=" in part:
-                    detected_op = ">="
-                elif "<=" in part:
-                    detected_op = "<="
-                elif ">" in part:
-                    detected_op = ">"
-                elif "<" in part:
-                    detected_op = "<"
-                elif "=" in part:
-                    detected_op = "="
+                detected_op = (
+                    self._symbol_op_in(present)
+                    or self._text_op_in(present)
+                    or "="
+                )
 
-                nums = re.findall(r"\b\d+\b", part)
-                detected_val = int(nums[0]) if nums else None
+                num = _NUMBER_RE.search(query, start, end)
+                detected_val = int(num.group()) if num else None
 
                 if detected_agg and detected_val is not None:
                     signals["having_conditions"].append({
@@ -633,3 +792,28 @@ class NLParser:
                         signals["having_value"] = detected_val
 
         return signals
+
+    def parse_many(self, queries):
+        """
+        parse() over many questions. Repeated questions (common in
+        logged traffic) are parsed once; every result is its own copy.
+        """
+        parsed = {}
+        results = []
+        for q in queries:
+            key = q.lower()
+            signals = parsed.get(key)
+            if signals is None:
+                signals = parsed[key] = self.parse(key)
+                results.append(signals)
+            else:
+                results.append(_copy_signals(signals))
+        return results
+
+
+def _copy_signals(signals):
+    return {
+        k: [dict(x) if isinstance(x, dict) else x for x in v]
+        if isinstance(v, list) else v
+        for k, v in signals.items()
+    }
@@ -1,32 +1,26 @@
 # 🔹 Cell 4 — Phase-2 Inference Function (CORE LOGIC)
-import torch
 import sys
 sys.path.append("..")
 
-from models.sql_transformer import SQLTransformer
 from src.schema_parser import SchemaParser
-from src.nl_parser import NLParser
 from src.semantic_aligner import SemanticAligner
+from src.query_context import QueryContext
 from src.schema_binder import bind_schema_tokens
 from src.ast_renderer import SQLRenderer
 from src.where_parser import WhereParser
-from src.utils import (
-    tokens_to_ids,
-    ids_to_tokens,
-    create_attention_mask,
-    get_device
-)
-from src.vocab import PAD
-
-def infer_phase2_sql(schema_json, nl_query):
-    # 1️⃣ Schema parsing
-    schema_parser = SchemaParser(schema_json)
-    tables = schema_parser.get_tables()
-    columns = schema_parser.get_all_columns()
-
-    # 2️⃣ NL parsing
-    nl_parser = NLParser()
-    signals = nl_parser.parse(nl_query)
+
+def infer_phase2_sql(schema_json, nl_query, aligner=None, schema=None, ctx=None):
+    # 1️⃣ Schema + NL parsing (reuse the router's QueryContext when given)
+    ctx = ctx or QueryContext(
+        nl_query, schema_json=schema_json, schema=schema, aligner=aligner
+    )
+    schema = ctx.schema
+    tables = schema.tables
+    columns = schema.all_columns
+
+    # 2️⃣ NL parsing (done once, in the context)
+    nl_parser = ctx.nl_parser
+    signals = ctx.signals
 
     # 3️⃣ Resolve TABLE
     resolved_table = None
@@ -38,19 +32,13 @@ def infer_phase2_sql(schema_json, nl_query):
     if resolved_table is None:
         raise ValueError("❌ Could not resolve table")
 
-    table_meta = schema_json["tables"][resolved_table]
-
     # 🔑 backward + forward compatible
-    table_cols = (
-        table_meta["columns"]
-        if isinstance(table_meta, dict)
-        else table_meta
-    )
+    table_cols = schema.table_columns[resolved_table]
 
 
     # 4️⃣ Resolve SELECT columns (STRICT & CORRECT)
 
-    nl_lower = nl_query.lower()
+    nl_lower = ctx.nl_lower
     
     # Extract projection part (before WHERE)
     if "where" in nl_lower:
@@ -75,23 +63,24 @@ def infer_phase2_sql(schema_json, nl_query):
     if "where" in nl_lower:
         where_text = nl_lower.split("where", 1)[1]
 
-        aligner = SemanticAligner()
-        where_parser = WhereParser(nl_parser, aligner)
+        where_parser = WhereParser(nl_parser, ctx.aligner, schema=schema)
 
-        tokens = where_parser.tokenize(where_text)
-        where_ast = where_parser.build_tree(
-            tokens,
-            resolved_table,
-            table_cols,
-            columns
-        )
+        with ctx.stage("where"):
+            tokens = where_parser.tokenize(where_text)
+            where_ast = where_parser.build_tree(
+                tokens,
+                resolved_table,
+                table_cols,
+                columns
+            )
 
     # 6️⃣ Render SQL
     renderer = SQLRenderer()
-    sql = renderer.render({
-        "select": [{"column": c, "agg": None} for c in select_columns],
-        "from": [resolved_table],
-        "where": where_ast
-    })
+    with ctx.stage("render"):
+        sql = renderer.render({
+            "select": [{"column": c, "agg": None} for c in select_columns],
+            "from": [resolved_table],
+            "where": where_ast
+        })
 
     return sql
\ No newline at end of file
@@ -1,42 +1,35 @@
 # # 🔹 Cell 1 — imports
 
-import torch
 import sys
 sys.path.append("..")
 
 from src.schema_parser import SchemaParser
-from src.nl_parser import NLParser
 from src.semantic_aligner import SemanticAligner
+from src.query_context import QueryContext
 from src.schema_binder import bind_schema_tokens
 from src.ast_renderer import SQLRenderer
 from src.phase2_inference import infer_phase2_sql
-from src.utils import (
-    tokens_to_ids,
-    ids_to_tokens,
-    create_attention_mask,
-    get_device
-)
-
-from src.vocab import PAD
-from models.sql_transformer import SQLTransformer
 
 # # 🔹 Cell 4 — inference
-def infer_phase3_sql(schema_json, nl_query):
+def infer_phase3_sql(schema_json, nl_query, aligner=None, schema=None, ctx=None):
     # ==================================================
-    # 1️⃣ Schema parsing
+    # 1️⃣ Schema parsing (reuse the router's QueryContext when given)
     # ==================================================
-    schema_parser = SchemaParser(schema_json)
-    tables = schema_parser.get_tables()
-    all_columns = schema_parser.get_all_columns()
+    ctx = ctx or QueryContext(
+        nl_query, schema_json=schema_json, schema=schema, aligner=aligner
+    )
+    schema = ctx.schema
+    schema_parser = schema.parser
+    tables = schema.tables
+    all_columns = schema.all_columns
     #print(tables)
     #print(all_columns)
 
     # ==================================================
-    # 2️⃣ NL parsing
+    # 2️⃣ NL parsing (done once, in the context)
     # ==================================================
-    nl_parser = NLParser()
-    signals = nl_parser.parse(nl_query)
-    nl_lower = nl_query.lower()
+    signals = ctx.signals
+    nl_lower = ctx.nl_lower
     #print(signals)
     # ==================================================
     # 🔒 VALIDATION: HAVING requires aggregation
@@ -59,12 +52,14 @@ def infer_phase3_sql(schema_json, nl_query):
     # ==================================================
     # 4️⃣ Semantic alignment
     # ==================================================
-    aligner = SemanticAligner()
-    mapping = aligner.align(
-        user_terms=signals["entities"],
-        schema_terms=all_columns,
-        column_terms=all_columns
-    )
+    aligner = ctx.aligner
+    with ctx.stage("align"):
+        mapping = aligner.align(
+            user_terms=signals["entities"],
+            schema_terms=all_columns,
+            column_terms=all_columns,
+            index=schema.lazy_index(all_columns, aligner)
+        )
     #print(mapping)
     # ==================================================
     # 5️⃣ Resolve SELECT (BACKWARD COMPATIBLE)
@@ -176,12 +171,13 @@ def infer_phase3_sql(schema_json, nl_query):
     # 🔟 Render SQL
     # ==================================================
     renderer = SQLRenderer()
-    sql = renderer.render({
-        "select": select_items,
-        "from": [resolved_table],
-        "where": [],
-        "group_by": group_by_cols,
-        "having": having_clause,
-        "having_logic": signals.get("having_logic", "AND")
-    })
+    with ctx.stage("render"):
+        sql = renderer.render({
+            "select": select_items,
+            "from": [resolved_table],
+            "where": [],
+            "group_by": group_by_cols,
+            "having": having_clause,
+            "having_logic": signals.get("having_logic", "AND")
+        })
     return sql
\ No newline at end of file
@@ -1,5 +1,4 @@
 # 🔹 Cell 1 — Imports & Setup
-import torch
 import sys
 import os
 sys.path.append("..")
@@ -7,6 +6,9 @@ sys.path.append("..")
 from src.schema_parser import SchemaParser
 from src.nl_parser import NLParser
 from src.semantic_aligner import SemanticAligner
+from src.aligner_runtime import get_aligner
+from src.schema_registry import CompiledSchema
+from src.query_context import QueryContext
 from src.schema_binder import bind_schema_tokens
 from src.ast_adapter import adapt_token_ast
 from src.ast_renderer import SQLRenderer
@@ -14,29 +16,26 @@ from src.where_parser import WhereParser
 from src.phase2_inference import infer_phase2_sql
 from src.phase3_inference import infer_phase3_sql
 
-from src.utils import (
-    tokens_to_ids,
-    ids_to_tokens,
-    create_attention_mask,
-    get_device,
-    get_allowed_tokens
-)
-
-from src.vocab import START, PAD, TOKEN2ID, ID2TOKEN, tokens_to_ast,ast_to_tokens
-from models.sql_transformer import SQLTransformer
-
 
 # 🔹 Cell 5 - phase4 Inference updated for right join
-def infer_phase4_sql(schema_json, nl_query):
+def infer_phase4_sql(schema_json, nl_query, aligner=None, schema=None, ctx=None):
     # ============================================================
     # Phase-4.5 NL → SQL (UPDATED — LEFT + RIGHT JOIN SAFE)
     # ============================================================
 
-    nl_lower = nl_query.lower()
-    nl_parser = NLParser()
-    signals = nl_parser.parse(nl_query)
+    # Schema compiled + question parsed once, shared with Phase-2 / 3
+    ctx = ctx or QueryContext(
+        nl_query, schema_json=schema_json, schema=schema, aligner=aligner
+    )
+    schema = ctx.schema
+    schema_json = schema.schema_json
+    table_columns = schema.table_columns
 
-    schema_tables = list(schema_json["tables"].keys())
+    nl_lower = ctx.nl_lower
+    nl_parser = ctx.nl_parser
+    signals = ctx.signals
+
+    schema_tables = schema.tables
     resolved_tables = [t for t in signals["tables"] if t in schema_tables]
 
     # ----------------------------
@@ -44,8 +43,8 @@ def infer_phase4_sql(schema_json, nl_query):
     # ----------------------------
     if len(resolved_tables) < 2:
         if signals["aggregations"] or signals["group_by"] or signals["having"]:
-            return infer_phase3_sql(schema_json, nl_query)
-        return infer_phase2_sql(schema_json, nl_query)
+            return infer_phase3_sql(schema_json, nl_query, ctx=ctx)
+        return infer_phase2_sql(schema_json, nl_query, ctx=ctx)
 
     base_table, join_table = resolved_tables[:2]
 
@@ -59,11 +58,11 @@ def infer_phase4_sql(schema_json, nl_query):
     # ----------------------------
     # Discover JOIN (schema-agnostic)
     # ----------------------------
-    pk_fk = discover_pk_fk_relationships(schema_json)
-    rel = next(
-        r for r in pk_fk
-        if {r["left_table"], r["right_table"]} == {base_table, join_table}
-    )
+    rel = schema.find_relationship(base_table, join_table)
+    if rel is None:
+        raise ValueError(
+            f"❌ No PK/FK relationship between {base_table} and {join_table}"
+        )
 
     join_type = signals.get("join_type", "INNER")
     preserve_table = signals.get("preserve_table")
@@ -102,7 +101,7 @@ def infer_phase4_sql(schema_json, nl_query):
         projection_text = nl_lower.split(" where ")[0]
 
         for t in resolved_tables:
-            for c in schema_json["tables"][t]["columns"]:
+            for c in table_columns[t]:
                 if c in projection_text:
                     ast["select"].append({
                         "agg": None,
@@ -111,7 +110,7 @@ def infer_phase4_sql(schema_json, nl_query):
 
         if not ast["select"]:
             for t in resolved_tables:
-                cols = schema_json["tables"][t]["columns"]
+                cols = table_columns[t]
                 readable = next((c for c in cols if not c.endswith("_id")), cols[0])
                 ast["select"].append({
                     "agg": None,
@@ -119,17 +118,18 @@ def infer_phase4_sql(schema_json, nl_query):
                 })
 
         if " where " in nl_lower:
-            where_parser = WhereParser(nl_parser, SemanticAligner())
-            where_ast = where_parser.build_tree(
-                where_parser.tokenize(nl_lower.split("where", 1)[1]),
-                base_table,
-                schema_json["tables"][base_table]["columns"],
-                [
-                    f"{t}.{c}"
-                    for t in resolved_tables
-                    for c in schema_json["tables"][t]["columns"]
-                ]
-            )
+            where_parser = WhereParser(nl_parser, ctx.aligner, schema=schema)
+            with ctx.stage("where"):
+                where_ast = where_parser.build_tree(
+                    where_parser.tokenize(nl_lower.split("where", 1)[1]),
+                    base_table,
+                    table_columns[base_table],
+                    [
+                        f"{t}.{c}"
+                        for t in resolved_tables
+                        for c in table_columns[t]
+                    ]
+                )
 
             # ============================================================
             # GENERIC OUTER JOIN WHERE SAFETY
@@ -149,7 +149,8 @@ def infer_phase4_sql(schema_json, nl_query):
             else:
                 ast["where"] = where_ast
 
-        return SQLRenderer().render(ast)
+        with ctx.stage("render"):
+            return SQLRenderer().render(ast)
 
     # ============================================================
     # B. AGGREGATION (JOIN + GROUP BY + HAVING)
@@ -165,7 +166,7 @@ def infer_phase4_sql(schema_json, nl_query):
     if " by " in nl_lower:
         after_by = nl_lower.split(" by ", 1)[1]
         for t in resolved_tables:
-            for c in schema_json["tables"][t]["columns"]:
+            for c in table_columns[t]:
                 if c in after_by:
                     group_col = f"{t}.{c}"
                     break
@@ -175,7 +176,7 @@ def infer_phase4_sql(schema_json, nl_query):
     if not group_col:
         projection_text = nl_lower.split(" where ")[0]
         for t in resolved_tables:
-            for c in schema_json["tables"][t]["columns"]:
+            for c in table_columns[t]:
                 if (
                     c in projection_text
                     and not c.endswith("_id")
@@ -199,7 +200,7 @@ def infer_phase4_sql(schema_json, nl_query):
     else:
         agg_col = None
         for t in resolved_tables:
-            for c in schema_json["tables"][t]["columns"]:
+            for c in table_columns[t]:
                 if c in nl_lower and not c.endswith("_id"):
                     agg_col = f"{t}.{c}"
                     break
@@ -225,4 +226,46 @@ def infer_phase4_sql(schema_json, nl_query):
             "value": int(signals["numbers"][0])
         }
 
-    return SQLRenderer().render(ast)
\ No newline at end of file
+    with ctx.stage("render"):
+        return SQLRenderer().render(ast)
+
+# 🔹 Batch inference — many questions against one schema
+def infer_phase4_sql_batch(schema_json, nl_queries, aligner=None, schema=None):
+    """
+    Translates many questions against the same schema.
+
+    Every user term the lexical tiers cannot resolve, across all
+    questions, is encoded in a single encoder call; the column index is
+    built (once) only if there is such a term.
+    Returns one result per question, in input order:
+    {"success": True, "generated_sql": ...} or
+    {"success": False, "error": ...}
+    """
+    schema = schema or CompiledSchema(schema_json)
+    aligner = aligner or get_aligner()
+
+    nl_parser = NLParser()
+    parsed = nl_parser.parse_many(nl_queries)
+    terms = []
+    for signals in parsed:
+        terms.extend(signals["entities"])
+
+    # Terms the lexical tiers resolve never reach the encoder (see align)
+    primed = aligner.prime(aligner.unresolved_terms(terms, schema.all_columns))
+
+    results = []
+    for q, signals in zip(nl_queries, parsed):
+        try:
+            ctx = QueryContext(
+                q,
+                schema=schema,
+                aligner=primed,
+                nl_parser=nl_parser,
+                signals=signals
+            )
+            sql = infer_phase4_sql(schema.schema_json, q, ctx=ctx)
+            results.append({"success": True, "generated_sql": sql})
+        except Exception as e:
+            results.append({"success": False, "error": str(e)})
+
+    return results
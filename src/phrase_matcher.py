@@ -0,0 +1,52 @@
+"""
+Phrase Matcher
+==============
+Finds every occurrence of a fixed set of phrases in one pass over the
+phrase table.
+
+Presence is decided with `phrase in text` and offsets with str.find,
+both of which run in C; for a few dozen short phrases that beats a
+regex trie or a Python-level Aho-Corasick loop, which pay interpreter
+overhead per character or per hit. Only phrases that occur at all are
+walked for further offsets.
+
+The result is every (possibly overlapping) occurrence, the same set a
+plain `phrase in text` check would find, as offsets. Callers answer
+"is this phrase inside that chunk" with a range check instead of
+slicing and re-scanning the chunk.
+"""
+
+from typing import Dict, Iterable, List, Tuple
+
+
+class PhraseMatcher:
+    def __init__(self, phrases: Iterable[str]):
+        self.phrases: Tuple[str, ...] = tuple(
+            dict.fromkeys(p for p in phrases if p)
+        )
+
+    # ==================================================
+    # Scanning
+    # ==================================================
+    def positions(self, text: str) -> Dict[str, List[int]]:
+        """phrase → sorted start offsets, for phrases that occur."""
+        found: Dict[str, List[int]] = {}
+        find = text.find
+
+        for phrase in [p for p in self.phrases if p in text]:
+            starts = []
+            start = find(phrase)
+            while start >= 0:
+                starts.append(start)
+                start = find(phrase, start + 1)
+            found[phrase] = starts
+
+        return found
+
+    def find_all(self, text: str) -> List[Tuple[int, str]]:
+        """Every (start, phrase) occurrence, ordered by start."""
+        return sorted(
+            (start, phrase)
+            for phrase, starts in self.positions(text).items()
+            for start in starts
+        )
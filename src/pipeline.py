@@ -0,0 +1,53 @@
+"""
+Inference Pipeline
+==================
+Single entry point for NL → SQL on one question:
+
+    QueryContext (compile schema, parse once)
+        → phase routing in infer_phase4_sql
+        → Phase-2 / Phase-3 / Phase-4 resolver, same context
+        → SQL + per-stage timings
+"""
+
+import time
+
+from src.query_context import QueryContext
+from src.phase4_5_inference import infer_phase4_sql
+
+
+class InferencePipeline:
+    def __init__(self, aligner=None):
+        # None → process-wide aligner (src.aligner_runtime), loaded lazily
+        self.aligner = aligner
+
+    def context(self, nl_query, schema_json=None, schema=None) -> QueryContext:
+        return QueryContext(
+            nl_query,
+            schema_json=schema_json,
+            schema=schema,
+            aligner=self.aligner
+        )
+
+    def run(self, nl_query, schema_json=None, schema=None) -> dict:
+        """
+        Returns {"generated_sql": ..., "timings_ms": {stage: ms, "total": ms}}.
+        Errors propagate as ValueError like infer_phase4_sql.
+        """
+        start = time.perf_counter()
+        ctx = self.context(nl_query, schema_json=schema_json, schema=schema)
+
+        sql = infer_phase4_sql(ctx.schema.schema_json, nl_query, ctx=ctx)
+
+        timings = ctx.timings_ms()
+        timings["total"] = round((time.perf_counter() - start) * 1000, 3)
+        return {"generated_sql": sql, "timings_ms": timings}
+
+
+# ============================================================
+# Process-wide singleton
+# ============================================================
+_pipeline = InferencePipeline()
+
+
+def get_pipeline() -> InferencePipeline:
+    return _pipeline
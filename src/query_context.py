@@ -0,0 +1,73 @@
+"""
+Query Context
+=============
+Per-question state shared by every phase resolver.
+
+Built once per request: the compiled schema, the NLParser and its
+signals, and the aligner. infer_phase4_sql routes to the Phase-2 / 3
+resolvers by handing them the same context, so nothing is parsed or
+compiled twice. Each stage adds its wall time to `timings`.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from src.nl_parser import NLParser
+from src.schema_registry import CompiledSchema
+from src.aligner_runtime import get_aligner
+
+
+class QueryContext:
+    def __init__(
+        self,
+        nl_query: str,
+        schema_json: Optional[dict] = None,
+        schema: Optional[CompiledSchema] = None,
+        aligner=None,
+        nl_parser: Optional[NLParser] = None,
+        signals: Optional[dict] = None
+    ):
+        self.timings: Dict[str, float] = {}
+
+        if schema is None:
+            with self.stage("compile_schema"):
+                schema = CompiledSchema(schema_json)
+        self.schema = schema
+
+        self.nl_query = nl_query
+        self.nl_lower = nl_query.lower()
+        self.nl_parser = nl_parser or NLParser()
+
+        if signals is None:
+            with self.stage("parse"):
+                signals = self.nl_parser.parse(nl_query)
+        self.signals = signals
+
+        self._aligner = aligner
+
+    # ==================================================
+    # Shared resources
+    # ==================================================
+    @property
+    def aligner(self):
+        """Process-wide aligner unless one was injected; loaded on demand."""
+        if self._aligner is None:
+            with self.stage("load_aligner"):
+                self._aligner = get_aligner()
+        return self._aligner
+
+    # ==================================================
+    # Timings
+    # ==================================================
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+
+    def timings_ms(self) -> Dict[str, float]:
+        return {k: round(v, 3) for k, v in self.timings.items()}
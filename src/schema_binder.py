@@ -4,6 +4,9 @@ from src.vocab import (
     JOIN, ON
 )
 
+from src.trigram_index import TrigramIndex
+
+from typing import Optional
 import difflib
 import logging
 
@@ -13,7 +16,11 @@ logger = logging.getLogger(__name__)
 # ============================================================
 # Helper: fuzzy match
 # ============================================================
-def _fuzzy_match(term, candidates, cutoff=0.6):
+def _fuzzy_match(term, candidates, cutoff=0.6, index: Optional[TrigramIndex] = None):
+    # Trigram index over the candidates when one is available, e.g. the
+    # compiled schema's (CompiledSchema.trigrams), built once per schema
+    if index is not None:
+        return index.match(term, cutoff)
     if not candidates:
         return None
     matches = difflib.get_close_matches(term, candidates, n=1, cutoff=cutoff)
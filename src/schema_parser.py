@@ -153,4 +153,59 @@ class SchemaParser:
                 if cb == f"{table_a[:-1]}_id":
                     joins.append((f"{table_a}.id", f"{table_b}.{cb}"))
 
-        return joins
\ No newline at end of file
+        return joins
+
+
+# ==================================================
+# PK–FK relationship discovery (Phase-4 JOIN)
+# ==================================================
+def discover_pk_fk_relationships(schema_json):
+    """
+    Returns a list of join edges:
+    [
+      {"left_table": "employees", "left_col": "dept_id",
+       "right_table": "departments", "right_col": "dept_id"}
+    ]
+
+    Explicit "fk" definitions come first, followed by implicit
+    PK–FK pairs matched by column name. Tables without metadata
+    (plain column lists) contribute no edges.
+    """
+    relationships = []
+
+    tables = schema_json["tables"]
+
+    # 1️⃣ Explicit FK definitions (highest priority)
+    for table, meta in tables.items():
+        if not isinstance(meta, dict):
+            continue
+        for fk_col, ref in meta.get("fk", {}).items():
+            ref_table, ref_col = ref.split(".")
+            relationships.append({
+                "left_table": table,
+                "left_col": fk_col,
+                "right_table": ref_table,
+                "right_col": ref_col
+            })
+
+    # 2️⃣ Implicit PK–FK by column name
+    for t1, m1 in tables.items():
+        if not isinstance(m1, dict):
+            continue
+        for t2, m2 in tables.items():
+            if t1 == t2 or not isinstance(m2, dict):
+                continue
+
+            pk = m2.get("pk")
+            if not pk:
+                continue
+
+            if pk in m1.get("columns", []):
+                relationships.append({
+                    "left_table": t1,
+                    "left_col": pk,
+                    "right_table": t2,
+                    "right_col": pk
+                })
+
+    return relationships
@@ -0,0 +1,362 @@
+"""
+Schema Registry
+===============
+Compiles a user schema once and keeps the derived artifacts around.
+
+A CompiledSchema holds everything the inference path used to rebuild on
+every request:
+- table list and fully-qualified column list
+- per-table column lists and the column → type map
+- the PK/FK join graph
+- MiniLM embeddings of every "table.column" string, and a ColumnIndex
+  over them for nearest-column search
+- a TrigramIndex over the "table.column" strings for fuzzy matching
+
+Registered schemas are addressed by a content hash, so registering the
+same schema twice returns the same id.
+
+The registry keeps at most NL2SQL_SCHEMA_CACHE_SIZE compiled schemas in
+memory (LRU). When a store directory is configured, the schema JSON is
+also written there, keyed by its id, and at most
+NL2SQL_SCHEMA_STORE_SIZE files are kept (least recently used removed
+first). A worker that never saw the POST /schemas call, or has evicted
+the schema, recompiles it from there on first use.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from src.schema_parser import SchemaParser, discover_pk_fk_relationships
+from src.column_index import ColumnIndex
+from src.trigram_index import TrigramIndex
+
+
+class CompiledSchema:
+    def __init__(self, schema_json: dict):
+        self.schema_json = schema_json
+        self.parser = SchemaParser(schema_json)
+
+        self.tables: List[str] = self.parser.get_tables()
+        self.all_columns: List[str] = self.parser.get_all_columns()
+        self.column_types: Dict[str, str] = (
+            self.parser.get_all_columns_with_types()
+        )
+
+        # {"employees": ["id", "salary", ...]} — honours the
+        # {"columns": [...], "pk": ..., "fk": {...}} table format
+        self.table_columns: Dict[str, List[str]] = {}
+        for table, meta in schema_json["tables"].items():
+            if isinstance(meta, dict) and "columns" in meta:
+                self.table_columns[table] = meta["columns"]
+            else:
+                self.table_columns[table] = self.parser.get_columns(table)
+
+        self.relationships = discover_pk_fk_relationships(schema_json)
+
+        self._column_pos = {c: i for i, c in enumerate(self.all_columns)}
+        self._column_embeddings = None
+        self._index: Optional[ColumnIndex] = None
+        self._trigrams: Optional[TrigramIndex] = None
+        self._lock = threading.Lock()
+
+    # ==================================================
+    # Column embeddings (computed once, lazily)
+    # ==================================================
+    def compile_embeddings(self, aligner):
+        if self._column_embeddings is None:
+            with self._lock:
+                if self._column_embeddings is None:
+                    self._column_embeddings = aligner.encode_columns(
+                        self.all_columns
+                    )
+        return self._column_embeddings
+
+    def embeddings_for(self, columns: List[str], aligner):
+        """
+        Rows of the cached embedding matrix for `columns`, in order.
+        Returns None if any column is not part of this schema.
+        """
+        if not columns:
+            return None
+
+        positions = [self._column_pos.get(c) for c in columns]
+        if any(p is None for p in positions):
+            return None
+
+        emb = self.compile_embeddings(aligner)
+        if positions == list(range(len(self.all_columns))):
+            return emb
+        return emb[positions]
+
+    def compile_index(self, aligner) -> ColumnIndex:
+        if self._index is None:
+            emb = self.compile_embeddings(aligner)
+            with self._lock:
+                if self._index is None:
+                    self._index = ColumnIndex(
+                        self.all_columns, emb, trigrams=self._trigrams
+                    )
+        return self._index
+
+    @property
+    def trigrams(self) -> TrigramIndex:
+        """
+        Fuzzy-match index over all_columns, built once per schema and
+        shared with the column index. Needs no embeddings.
+        """
+        if self._index is not None:
+            return self._index.trigrams
+        if self._trigrams is None:
+            with self._lock:
+                if self._trigrams is None:
+                    self._trigrams = TrigramIndex(self.all_columns)
+        return self._trigrams
+
+    def index_for(self, columns: List[str], aligner) -> Optional[ColumnIndex]:
+        """
+        ColumnIndex over `columns`, in order: the cached full-schema index,
+        or a sub-index of its rows. None if any column is not in this
+        schema. Costs O(len(columns)), not O(schema size).
+        """
+        positions = [self._column_pos.get(c) for c in columns]
+        if not columns or None in positions:
+            return None
+
+        index = self.compile_index(aligner)
+        if columns == self.all_columns:
+            return index
+
+        # Every column of some tables (the Phase-4 case): slice the
+        # per-table row ranges
+        tables = list(dict.fromkeys(c.split(".")[0] for c in columns))
+        if positions == index.table_rows(tables):
+            return index.for_tables(tables)
+        return index.take(positions)
+
+    def lazy_index(self, columns: List[str], aligner):
+        """
+        index_for(columns, aligner) for SemanticAligner.align, deferred:
+        the built full-schema index as is, otherwise a callable that
+        builds the (sub-)index. align() only calls it when a term
+        reaches the embedding tier, so terms resolved lexically never
+        pay for encoding the schema or slicing a sub-index.
+        """
+        if self._index is not None and columns == self.all_columns:
+            return self._index
+        return lambda: self.index_for(columns, aligner)
+
+    # ==================================================
+    # JOIN graph
+    # ==================================================
+    def find_relationship(self, table_a: str, table_b: str) -> Optional[dict]:
+        return next(
+            (
+                r for r in self.relationships
+                if {r["left_table"], r["right_table"]} == {table_a, table_b}
+            ),
+            None
+        )
+
+
+def schema_id_for(schema_json: dict) -> str:
+    canonical = json.dumps(schema_json, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+# Directory of registered schema JSON shared by the workers; default:
+# <NL2SQL_EMBEDDING_STORE>/schemas, else no store (opt-in)
+SCHEMA_STORE_ENV = "NL2SQL_SCHEMA_STORE"
+
+# Schema files kept in the store; the least recently used are removed
+SCHEMA_STORE_SIZE_ENV = "NL2SQL_SCHEMA_STORE_SIZE"
+DEFAULT_MAX_STORED = 10000
+
+# Compiled schemas kept in memory per worker (LRU)
+SCHEMA_CACHE_SIZE_ENV = "NL2SQL_SCHEMA_CACHE_SIZE"
+DEFAULT_MAX_SCHEMAS = 256
+
+
+class SchemaRegistry:
+    """
+    Bounded LRU of compiled schemas keyed by content hash, backed by an
+    optional on-disk store of the schema JSON (store_dir), itself bounded
+    to max_stored files.
+    """
+
+    def __init__(
+        self,
+        max_schemas: int = DEFAULT_MAX_SCHEMAS,
+        store_dir: Optional[str] = None,
+        max_stored: int = DEFAULT_MAX_STORED
+    ):
+        self.max_schemas = max(1, max_schemas)
+        self.store_dir = store_dir
+        self.max_stored = max(1, max_stored)
+        self.evictions = 0
+        self.store_loads = 0
+        self.store_evictions = 0
+
+        self._schemas: "OrderedDict[str, CompiledSchema]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ==================================================
+    # Register / lookup
+    # ==================================================
+    def register(self, schema_json: dict, aligner=None) -> str:
+        schema_id = schema_id_for(schema_json)
+
+        compiled = self.lookup(schema_id)
+        if compiled is None:
+            compiled = CompiledSchema(schema_json)
+            compiled = self._insert(schema_id, compiled)
+        self._persist(schema_id, schema_json)
+
+        if aligner is not None:
+            compiled.compile_index(aligner)
+        return schema_id
+
+    def lookup(self, schema_id: str) -> Optional[CompiledSchema]:
+        """The compiled schema, from memory or the shared store; None if unknown."""
+        with self._lock:
+            compiled = self._schemas.get(schema_id)
+            if compiled is not None:
+                self._schemas.move_to_end(schema_id)
+                return compiled
+
+        schema_json = self._load(schema_id)
+        if schema_json is None:
+            return None
+        self.store_loads += 1
+        return self._insert(schema_id, CompiledSchema(schema_json))
+
+    def get(self, schema_id: str) -> CompiledSchema:
+        compiled = self.lookup(schema_id)
+        if compiled is None:
+            raise ValueError(f"❌ Unknown schema id: {schema_id}")
+        return compiled
+
+    def _insert(self, schema_id: str, compiled: CompiledSchema) -> CompiledSchema:
+        with self._lock:
+            # Another thread may have compiled it meanwhile: keep theirs
+            compiled = self._schemas.setdefault(schema_id, compiled)
+            self._schemas.move_to_end(schema_id)
+            while len(self._schemas) > self.max_schemas:
+                self._schemas.popitem(last=False)
+                self.evictions += 1
+        return compiled
+
+    # ==================================================
+    # Shared store
+    # ==================================================
+    def _path(self, schema_id: str) -> Optional[str]:
+        if not self.store_dir or not all(c in "0123456789abcdef" for c in schema_id):
+            return None
+        return os.path.join(self.store_dir, f"{schema_id}.json")
+
+    def _persist(self, schema_id: str, schema_json: dict):
+        path = self._path(schema_id)
+        if path is None:
+            return
+        if os.path.exists(path):
+            _touch(path)
+            return
+        os.makedirs(self.store_dir, exist_ok=True)
+        # Write-then-rename: readers never see a partial file
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(schema_json, f, sort_keys=True, separators=(",", ":"))
+        os.replace(tmp, path)
+        self._evict_stored()
+
+    def _evict_stored(self):
+        """Removes the least recently used files beyond max_stored."""
+        entries = []
+        with os.scandir(self.store_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    continue
+
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.max_stored)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Another worker evicted it first
+                continue
+            self.store_evictions += 1
+
+    def _load(self, schema_id: str) -> Optional[dict]:
+        path = self._path(schema_id)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                schema_json = json.load(f)
+        except FileNotFoundError:
+            # Evicted by another worker in between
+            return None
+        _touch(path)
+        # Content-addressed: a file that does not hash to its name is ignored
+        return schema_json if schema_id_for(schema_json) == schema_id else None
+
+    # ==================================================
+    # Reporting
+    # ==================================================
+    def __contains__(self, schema_id: str) -> bool:
+        with self._lock:
+            return schema_id in self._schemas
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._schemas)
+
+    def status(self) -> dict:
+        return {
+            "cached": len(self),
+            "max_schemas": self.max_schemas,
+            "evictions": self.evictions,
+            "store_dir": self.store_dir,
+            "max_stored": self.max_stored if self.store_dir else None,
+            "store_loads": self.store_loads,
+            "store_evictions": self.store_evictions
+        }
+
+
+def _touch(path: str):
+    # mtime = last use, the store's eviction order
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+# ============================================================
+# Process-wide singleton
+# ============================================================
+def _default_store_dir() -> Optional[str]:
+    store = os.environ.get(SCHEMA_STORE_ENV)
+    if store:
+        return store
+    embeddings = os.environ.get("NL2SQL_EMBEDDING_STORE")
+    if embeddings:
+        return os.path.join(embeddings, "schemas")
+    return None
+
+
+_registry = SchemaRegistry(
+    max_schemas=int(os.environ.get(SCHEMA_CACHE_SIZE_ENV, DEFAULT_MAX_SCHEMAS)),
+    store_dir=_default_store_dir(),
+    max_stored=int(os.environ.get(SCHEMA_STORE_SIZE_ENV, DEFAULT_MAX_STORED))
+)
+
+
+def get_registry() -> SchemaRegistry:
+    return _registry
@@ -1,10 +1,33 @@
-from sentence_transformers import SentenceTransformer, util
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Union
+import copy
 import difflib
 import logging
+import threading
+import numpy as np
+
+from src.column_index import ColumnIndex
+from src.nl_parser import NLParser
+from src.term_cache import TermEmbeddingCache, DEFAULT_TERM_CACHE_BYTES
+from src.trigram_index import TrigramIndex
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Alignment cascade tiers, cheapest first
+TIERS = ("exact", "synonym", "fuzzy", "embedding", "unresolved")
+
+# Lexical fuzzy tier: only near-identical spellings of a column name
+LEXICAL_FUZZY_CUTOFF = 0.85
+LEXICAL_FUZZY_MIN_LEN = 4
+
+
+def _name_map(columns: List[str]) -> Dict[str, List[str]]:
+    names: Dict[str, List[str]] = {}
+    for col in columns:
+        names.setdefault(col.split(".")[-1], []).append(col)
+    return names
+
 
 class SemanticAligner:
     """
@@ -17,8 +40,39 @@ class SemanticAligner:
     - Phase-4: JOIN (multi-table, implicit joins)
     """
 
-    def __init__(self):
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
+    def __init__(
+        self,
+        model=None,
+        model_name: str = DEFAULT_MODEL_NAME,
+        store=None,
+        term_cache_bytes: int = DEFAULT_TERM_CACHE_BYTES,
+        cascade: bool = True
+    ):
+        # A pre-loaded SentenceTransformer can be injected so that one copy
+        # of the weights is shared process-wide (see src.aligner_runtime).
+        self.model_name = model_name
+        if model is None:
+            # Imported here: sentence_transformers pulls in torch, which
+            # processes that never build an aligner should not pay for
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(model_name)
+        self.model = model
+
+        # Optional on-disk column embedding store (src.embedding_store)
+        self.store = store
+
+        # LRU of user-term embeddings shared by every request (0 = off)
+        self.term_cache = (
+            TermEmbeddingCache(term_cache_bytes) if term_cache_bytes > 0
+            else None
+        )
+
+        # The HF fast tokenizer behind encode() is not re-entrant, so calls
+        # coming from the FastAPI threadpool are serialized here.
+        self._encode_lock = threading.Lock()
+
+        # term → embedding row, filled by prime() on a per-batch view
+        self._primed: Optional[Dict[str, object]] = None
 
         # --------------------------------------------------
         # Synonym bias (non-breaking, deterministic override)
@@ -43,6 +97,143 @@ class SemanticAligner:
             "total": "amount"
         }
 
+        # --------------------------------------------------
+        # Lexical-first cascade: exact → synonym → fuzzy name match,
+        # MiniLM only for terms still unresolved
+        # --------------------------------------------------
+        self.cascade = cascade
+        self.lexical_synonyms = {**NLParser().synonyms, **self.synonym_bias}
+        self._tier_counts = {t: 0 for t in TIERS}
+        self._tier_lock = threading.Lock()
+
+    # ==================================================
+    # Thread-safe encoding
+    # ==================================================
+    def encode(self, texts: List[str]):
+        with self._encode_lock:
+            return self.model.encode(texts, convert_to_tensor=True)
+
+    def encode_columns(self, columns: List[str]):
+        """
+        Embeddings for schema columns. With a store attached, only
+        columns missing from disk go through the encoder and they are
+        appended for the next worker / restart.
+        """
+        if self.store is None:
+            return self.encode(columns)
+
+        found = self.store.get_many(columns)
+        missing = [c for c in dict.fromkeys(columns) if c not in found]
+        if missing:
+            fresh = self.encode(missing).cpu().numpy()
+            self.store.add_many(missing, fresh)
+            found.update(zip(missing, fresh))
+
+        import torch
+        return torch.as_tensor(
+            np.stack([found[c] for c in columns]).astype(np.float32),
+            device=self.model.device
+        )
+
+    def prime(self, terms: List[str]) -> "SemanticAligner":
+        """
+        Encodes `terms` in a single forward pass and returns a shallow
+        view of this aligner that reuses those embeddings in align().
+        The shared aligner itself is left untouched.
+        """
+        unique = list(dict.fromkeys(terms))
+        view = copy.copy(self)
+        view._primed = (
+            dict(zip(unique, self.encode_terms(unique))) if unique else {}
+        )
+        return view
+
+    def encode_terms(self, terms: List[str]):
+        """
+        Embeddings for user terms. Primed and cached terms are not
+        re-encoded; only unseen terms reach the encoder, in one call.
+        """
+        if not self._primed and self.term_cache is None:
+            return self.encode(terms)
+
+        unique = list(dict.fromkeys(terms))
+        primed = self._primed or {}
+        found = {t: primed[t] for t in unique if t in primed}
+
+        missing = [t for t in unique if t not in found]
+        if missing and self.term_cache is not None:
+            found.update(self.term_cache.get_many(missing))
+            missing = [t for t in missing if t not in found]
+
+        if missing:
+            fresh = dict(zip(missing, self.encode(missing)))
+            if self.term_cache is not None:
+                self.term_cache.put_many(fresh)
+            found.update(fresh)
+
+        import torch
+        return torch.stack([found[t] for t in terms])
+
+    # ==================================================
+    # Lexical tiers
+    # ==================================================
+    def _lexical_match(self, term: str, names, name_trigrams):
+        """
+        Returns (tier, column) when the term names exactly one column,
+        directly, through a synonym, or as a near-identical spelling.
+        """
+        cols = names.get(term)
+        if cols:
+            # Ambiguous names are left to the embedding + JOIN guard
+            return ("exact", cols[0]) if len(cols) == 1 else None
+
+        syn = self.lexical_synonyms.get(term)
+        if syn:
+            cols = names.get(syn)
+            if cols:
+                return ("synonym", cols[0]) if len(cols) == 1 else None
+
+        if len(term) >= LEXICAL_FUZZY_MIN_LEN:
+            hit = name_trigrams().match(term, LEXICAL_FUZZY_CUTOFF)
+            if hit and len(names[hit]) == 1:
+                return "fuzzy", names[hit][0]
+
+        return None
+
+    def unresolved_terms(self, terms: List[str], columns: List[str]) -> List[str]:
+        """
+        Distinct terms the lexical tiers leave unresolved against
+        `columns`, i.e. the ones align() would send to the encoder.
+        """
+        terms = list(dict.fromkeys(terms))
+        if not self.cascade:
+            return terms
+
+        names = _name_map(columns)
+        trigram_cache = []
+
+        def name_trigrams():
+            if not trigram_cache:
+                trigram_cache.append(TrigramIndex(list(names)))
+            return trigram_cache[0]
+
+        return [t for t in terms if self._lexical_match(t, names, name_trigrams) is None]
+
+    def _count_tier(self, tier: str):
+        with self._tier_lock:
+            self._tier_counts[tier] += 1
+
+    def tier_stats(self) -> dict:
+        with self._tier_lock:
+            counts = dict(self._tier_counts)
+        total = sum(counts.values())
+        return {
+            "counts": counts,
+            "hit_rates": {
+                t: (c / total if total else None) for t, c in counts.items()
+            }
+        }
+
     # ==================================================
     # Fuzzy fallback
     # ==================================================
@@ -50,8 +241,13 @@ class SemanticAligner:
         self,
         term: str,
         candidates: List[str],
-        cutoff: float = 0.6
+        cutoff: float = 0.6,
+        index: Optional[ColumnIndex] = None
     ) -> Optional[str]:
+        # Trigram index over the candidates when one is available
+        if index is not None:
+            return index.trigrams.match(term, cutoff)
+
         matches = difflib.get_close_matches(
             term, candidates, n=1, cutoff=cutoff
         )
@@ -64,7 +260,9 @@ class SemanticAligner:
         self,
         user_terms: List[str],
         schema_terms: List[str],
-        column_terms: Optional[List[str]] = None
+        column_terms: Optional[List[str]] = None,
+        column_embeddings=None,
+        index: Union[ColumnIndex, Callable[[], Optional[ColumnIndex]], None] = None
     ) -> Dict[str, str]:
         """
         Returns mapping:
@@ -72,6 +270,16 @@ class SemanticAligner:
           "first_name": "employees.first_name",
           "dept_name": "departments.dept_name"
         }
+
+        column_embeddings: optional precomputed embeddings of the schema
+        columns (e.g. from CompiledSchema.embeddings_for), row-aligned
+        with the column list. Skips re-encoding the schema.
+
+        index: optional ColumnIndex over exactly the schema columns (e.g.
+        from CompiledSchema.index_for), or a zero-argument callable that
+        builds one (CompiledSchema.lazy_index). A callable is only invoked
+        when a term reaches the embedding tier. Takes precedence over
+        column_embeddings.
         """
 
         if not user_terms or not schema_terms:
@@ -85,56 +293,115 @@ class SemanticAligner:
             else [s for s in schema_terms if "." in s]
         )
 
+        # Built on the first embedding-tier term only
+        index_provider = index if callable(index) else None
+        if index_provider is not None:
+            index = None
+
+        names = (
+            index.name_map if index is not None
+            else _name_map(schema_columns)
+        )
+
+        # Columns assigned to each term, in assignment order
+        assigned: List[List[str]] = [[] for _ in user_terms]
+
         # -----------------------------------------------
-        # Encode embeddings
+        # Tier 1/2: exact, synonym and fuzzy name match
         # -----------------------------------------------
-        user_emb = self.model.encode(user_terms, convert_to_tensor=True)
-        schema_emb = self.model.encode(schema_columns, convert_to_tensor=True)
-        scores = util.cos_sim(user_emb, schema_emb)
+        pending = list(range(len(user_terms)))
 
-        mapping: Dict[str, str] = {}
+        if self.cascade:
+            trigram_cache = []
+
+            def name_trigrams():
+                if index is not None:
+                    return index.name_trigrams
+                if not trigram_cache:
+                    trigram_cache.append(TrigramIndex(list(names)))
+                return trigram_cache[0]
+
+            pending = []
+            for i, term in enumerate(user_terms):
+                hit = self._lexical_match(term, names, name_trigrams)
+                if hit is None:
+                    pending.append(i)
+                    continue
+                tier, col = hit
+                self._count_tier(tier)
+                assigned[i].append(col)
 
         # -----------------------------------------------
-        # Alignment loop
+        # Tier 3: nearest-column embedding search
         # -----------------------------------------------
-        for i, term in enumerate(user_terms):
+        if pending and not schema_columns:
+            # No columns to embed against: remaining terms stay unresolved
+            for _ in pending:
+                self._count_tier("unresolved")
+            pending = []
+
+        if pending:
+            if index is None and index_provider is not None:
+                index = index_provider()
+            if index is None:
+                schema_emb = (
+                    column_embeddings if column_embeddings is not None
+                    else self.encode_columns(schema_columns)
+                )
+                index = ColumnIndex(schema_columns, schema_emb)
+
+            user_emb = self.encode_terms([user_terms[i] for i in pending])
+            top_scores, top_idx = index.search(user_emb, k=1)
+
+        for row, i in enumerate(pending):
+            term = user_terms[i]
 
             # -------- synonym override (hard) --------
             if term in self.synonym_bias:
                 syn = self.synonym_bias[term]
-                for col in schema_columns:
-                    if col.endswith("." + syn):
-                        mapping[term] = col
-                        continue
+                for col in index.same_name(syn):
+                    assigned[i].append(col)
 
             # -------- embedding best match --------
-            best_idx = scores[i].argmax().item()
-            best_score = scores[i][best_idx].item()
-            best_match = schema_columns[best_idx]
+            if top_scores.size(1) == 0:
+                self._count_tier("unresolved")
+                continue
+            best_score = top_scores[row, 0].item()
+            best_match = index.columns[top_idx[row, 0].item()]
 
             # -------- weak confidence guard --------
             if best_score < 0.30:
-                fallback = self._fuzzy_match(term, schema_columns)
+                fallback = self._fuzzy_match(
+                    term, schema_columns, index=index
+                )
                 if fallback:
                     logger.info(f"Fuzzy matched '{term}' → '{fallback}'")
                     best_match = fallback
                 else:
                     logger.warning(f"Low confidence for '{term}', skipped")
+                    self._count_tier("unresolved")
                     continue
 
             # -------- JOIN ambiguity guard --------
             col_name = best_match.split(".")[-1]
-            same_cols = [
-                s for s in schema_columns
-                if s.endswith("." + col_name)
-            ]
+            same_cols = index.same_name(col_name)
 
             if len(same_cols) > 1 and best_score < 0.45:
                 logger.warning(
                     f"Ambiguous JOIN column '{term}' → {same_cols}, skipped"
                 )
+                self._count_tier("unresolved")
                 continue
 
-            mapping[term] = best_match
+            self._count_tier("embedding")
+            assigned[i].append(best_match)
+
+        # -----------------------------------------------
+        # Build mapping in term order
+        # -----------------------------------------------
+        mapping: Dict[str, str] = {}
+        for term, cols in zip(user_terms, assigned):
+            for col in cols:
+                mapping[term] = col
 
-        return mapping
\ No newline at end of file
+        return mapping
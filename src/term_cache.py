@@ -0,0 +1,92 @@
+"""
+Term Embedding Cache
+====================
+Bounded LRU cache of user-term embeddings.
+
+The same handful of terms ("salary", "name", "employees") appear in most
+questions; caching their MiniLM embeddings means a request only sends
+terms it has never seen to the encoder.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+DEFAULT_TERM_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class TermEmbeddingCache:
+    """
+    Thread-safe LRU keyed by term, bounded by the bytes held in the
+    embedding tensors (plus the key strings).
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_TERM_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: "OrderedDict[str, object]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _entry_bytes(term: str, row) -> int:
+        return row.element_size() * row.nelement() + len(term)
+
+    # ==================================================
+    # Lookup / insert
+    # ==================================================
+    def get_many(self, terms: List[str]) -> Dict[str, object]:
+        found = {}
+        with self._lock:
+            for t in terms:
+                row = self._entries.get(t)
+                if row is None:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(t)
+                self.hits += 1
+                found[t] = row
+        return found
+
+    def put_many(self, items: Dict[str, object]):
+        with self._lock:
+            for term, row in items.items():
+                # Own the storage: rows of a batch encode are views
+                row = row.detach().clone()
+                size = self._entry_bytes(term, row)
+                if size > self.max_bytes:
+                    continue
+
+                old = self._entries.pop(term, None)
+                if old is not None:
+                    self._bytes -= self._entry_bytes(term, old)
+
+                self._entries[term] = row
+                self._bytes += size
+
+                while self._bytes > self.max_bytes:
+                    evicted, evicted_row = self._entries.popitem(last=False)
+                    self._bytes -= self._entry_bytes(evicted, evicted_row)
+                    self.evictions += 1
+
+    # ==================================================
+    # Reporting
+    # ==================================================
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else None
+            }
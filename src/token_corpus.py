@@ -0,0 +1,277 @@
+"""
+Token Corpus
+============
+Phase corpora (data/sql_ast/*.json) pre-tokenized into a compact binary
+form that is memory-mapped instead of json.load-ed every run:
+
+    <name>.tokens.bin     all token ids back to back (int16, or int32 for
+                          vocabularies past 32767)
+    <name>.offsets.bin    int64, n_samples + 1; sample i is
+                          tokens[offsets[i]:offsets[i + 1]]
+    <name>.states.bin     int16, aligned with tokens: grammar automaton
+                          state after each token (src.grammar), so the
+                          grammar-mask indices are precomputed as well
+    <name>.sidecar.jsonl  {"nl_query", "schema_bindings"} per sample
+    <name>.sidecar.idx    int64 byte offset of every sidecar line
+    <name>.meta.json      dtype, counts, vocab, source
+
+Reading a sample is a slice of the token and state maps; the sidecar is
+only touched when a sample's bindings are asked for. The vocabulary and
+the grammar state encoding are stored in the meta file and checked on
+load, so a cache built before either changes is refused instead of
+silently mis-decoded.
+
+Convert every phase corpus (writes to data/sql_ast/cache/):
+    python -m src.token_corpus
+    python -m src.token_corpus data/sql_ast/phase4.5_join.json --out-dir /tmp/corpora
+    python -m src.token_corpus data/sql_ast/generated.jsonl
+"""
+
+import argparse
+import glob
+import json
+import os
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+import torch
+
+from src.grammar import STATE_ENCODING, get_grammar
+from src.vocab import BASE_VOCAB, TOKEN2ID, UNK
+
+DEFAULT_SOURCE_DIR = "data/sql_ast"
+DEFAULT_CACHE_DIR = "data/sql_ast/cache"
+
+_UNK_ID = TOKEN2ID[UNK]
+TOKEN_DTYPE = np.int16 if len(BASE_VOCAB) <= np.iinfo(np.int16).max else np.int32
+
+
+def _state_dtype(grammar):
+    return np.int16 if len(grammar) <= np.iinfo(np.int16).max else np.int32
+
+
+def _paths(prefix: str) -> dict:
+    return {
+        "tokens": prefix + ".tokens.bin",
+        "offsets": prefix + ".offsets.bin",
+        "states": prefix + ".states.bin",
+        "sidecar": prefix + ".sidecar.jsonl",
+        "sidecar_idx": prefix + ".sidecar.idx",
+        "meta": prefix + ".meta.json",
+    }
+
+
+def corpus_prefix(json_path: str, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    name = os.path.splitext(os.path.basename(json_path))[0]
+    return os.path.join(cache_dir, name)
+
+
+# ============================================================
+# Writing
+# ============================================================
+def encode_sample(sample: dict, grammar=None):
+    """One corpus entry → (token ids, grammar states, sidecar line) as written to disk."""
+    grammar = grammar or get_grammar()
+    ids = np.fromiter(
+        (TOKEN2ID.get(t, _UNK_ID) for t in sample["input_tokens"]),
+        dtype=TOKEN_DTYPE
+    )
+    states = grammar.prefix_states(torch.from_numpy(ids.astype(np.int64)).unsqueeze(0))[0]
+    line = json.dumps({
+        "nl_query": sample.get("nl_query"),
+        "schema_bindings": sample.get("schema_bindings")
+    })
+    return ids, states.numpy().astype(_state_dtype(grammar)), line.encode("utf-8") + b"\n"
+
+
+class TokenCorpusWriter:
+    """
+    Streams samples to disk; memory use does not grow with corpus size.
+
+        with TokenCorpusWriter(prefix, source=...) as writer:
+            for sample in samples:
+                writer.add(sample)
+    """
+
+    def __init__(self, prefix: str, source: Optional[str] = None):
+        self.prefix = prefix
+        self.source = source
+        self.paths = _paths(prefix)
+        self.dtype = TOKEN_DTYPE
+        self.grammar = get_grammar()
+        self.state_dtype = _state_dtype(self.grammar)
+
+        os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+        self._tokens = open(self.paths["tokens"], "wb")
+        self._offsets = open(self.paths["offsets"], "wb")
+        self._states = open(self.paths["states"], "wb")
+        self._sidecar = open(self.paths["sidecar"], "wb")
+        self._sidecar_idx = open(self.paths["sidecar_idx"], "wb")
+
+        self.n_samples = 0
+        self.n_tokens = 0
+        self._offsets.write(np.int64(0).tobytes())
+
+    def add(self, sample: dict):
+        self.add_encoded(*encode_sample(sample, self.grammar))
+
+    def add_encoded(self, ids: np.ndarray, states: np.ndarray, sidecar_line: bytes):
+        """Append a sample already run through encode_sample (e.g. by a worker process)."""
+        self._tokens.write(ids.astype(self.dtype, copy=False).tobytes())
+        self._states.write(states.astype(self.state_dtype, copy=False).tobytes())
+        self.n_tokens += len(ids)
+        self._offsets.write(np.int64(self.n_tokens).tobytes())
+
+        self._sidecar_idx.write(np.int64(self._sidecar.tell()).tobytes())
+        self._sidecar.write(sidecar_line)
+        self.n_samples += 1
+
+    def add_many(self, samples: Iterable[dict]):
+        for sample in samples:
+            self.add(sample)
+
+    def close(self):
+        for f in (self._tokens, self._offsets, self._states, self._sidecar, self._sidecar_idx):
+            f.close()
+        with open(self.paths["meta"], "w") as f:
+            json.dump({
+                "dtype": np.dtype(self.dtype).name,
+                "state_dtype": np.dtype(self.state_dtype).name,
+                "state_encoding": STATE_ENCODING,
+                "n_samples": self.n_samples,
+                "n_tokens": self.n_tokens,
+                "vocab": BASE_VOCAB,
+                "source": self.source,
+            }, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def convert_phase(json_path: str, prefix: Optional[str] = None) -> str:
+    """
+    data/sql_ast/<name>.json (one array) or <name>.jsonl (one sample per
+    line, streamed) → binary corpus; returns its prefix.
+    """
+    prefix = prefix or corpus_prefix(json_path)
+    with TokenCorpusWriter(prefix, source=json_path) as writer:
+        writer.add_many(iter_samples(json_path))
+    return prefix
+
+
+def iter_samples(path: str) -> Iterator[dict]:
+    """Samples of a .json array or, without loading it whole, a .jsonl file."""
+    with open(path, "r", encoding="utf-8") as f:
+        if not path.endswith(".jsonl"):
+            yield from json.load(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def ensure_corpus(json_path: str, cache_dir: str = DEFAULT_CACHE_DIR) -> "TokenCorpus":
+    """Open the cached corpus for json_path, (re)building it if missing or stale."""
+    prefix = corpus_prefix(json_path, cache_dir)
+    meta = _paths(prefix)["meta"]
+
+    stale = (
+        not os.path.exists(meta)
+        or os.path.getmtime(meta) < os.path.getmtime(json_path)
+    )
+    if not stale:
+        with open(meta) as f:
+            stale = not _compatible(json.load(f))
+    if stale:
+        convert_phase(json_path, prefix)
+    return TokenCorpus(prefix)
+
+
+# ============================================================
+# Reading
+# ============================================================
+def _compatible(meta: dict) -> bool:
+    return meta["vocab"] == BASE_VOCAB and meta.get("state_encoding") == STATE_ENCODING
+
+
+class TokenCorpus:
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.paths = _paths(prefix)
+
+        with open(self.paths["meta"]) as f:
+            self.meta = json.load(f)
+        if not _compatible(self.meta):
+            raise ValueError(f"❌ {prefix} was built with a different vocabulary or grammar; re-run the converter")
+
+        self.n_samples = self.meta["n_samples"]
+        self.tokens = self._map(self.paths["tokens"], self.meta["dtype"], self.meta["n_tokens"])
+        self.offsets = self._map(self.paths["offsets"], "int64", self.n_samples + 1)
+        self.states = self._map(self.paths["states"], self.meta["state_dtype"], self.meta["n_tokens"])
+        self._sidecar_idx = None
+
+    @staticmethod
+    def _map(path: str, dtype: str, length: int):
+        # np.memmap refuses empty files
+        if length == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(length,))
+
+    def __len__(self):
+        return self.n_samples
+
+    def ids(self, idx: int) -> np.ndarray:
+        """Token ids of sample idx (a read-only view into the map)."""
+        return self.tokens[self.offsets[idx]:self.offsets[idx + 1]]
+
+    def mask_states(self, idx: int) -> np.ndarray:
+        """Grammar state after each token of sample idx (aligned with ids)."""
+        return self.states[self.offsets[idx]:self.offsets[idx + 1]]
+
+    def batch(self, indices, pad_id: int = TOKEN2ID["<PAD>"]):
+        """
+        Samples `indices` right-padded into (B, T) arrays with one fancy
+        index per map: (ids, states, lengths). Padding is pad_id / state 0.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.offsets[indices]
+        lengths = self.offsets[indices + 1] - starts
+        T = int(lengths.max()) if len(indices) else 0
+
+        cols = np.arange(T)
+        valid = cols[None, :] < lengths[:, None]
+        pos = np.where(valid, starts[:, None] + cols[None, :], 0)
+
+        ids = np.where(valid, self.tokens[pos], pad_id).astype(np.int64)
+        states = np.where(valid, self.states[pos], 0).astype(np.int64)
+        return ids, states, lengths
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def sidecar(self, idx: int) -> dict:
+        """{"nl_query", "schema_bindings"} of sample idx."""
+        if self._sidecar_idx is None:
+            self._sidecar_idx = self._map(self.paths["sidecar_idx"], "int64", self.n_samples)
+        with open(self.paths["sidecar"], "rb") as f:
+            f.seek(int(self._sidecar_idx[idx]))
+            return json.loads(f.readline())
+
+
+# ============================================================
+# CLI
+# ============================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-tokenize phase corpora")
+    parser.add_argument("paths", nargs="*", help=f"JSON corpora (default: {DEFAULT_SOURCE_DIR}/*.json)")
+    parser.add_argument("--out-dir", default=DEFAULT_CACHE_DIR)
+    args = parser.parse_args()
+
+    for path in args.paths or sorted(glob.glob(os.path.join(DEFAULT_SOURCE_DIR, "*.json"))):
+        prefix = convert_phase(path, corpus_prefix(path, args.out_dir))
+        corpus = TokenCorpus(prefix)
+        print(f"✅ {path} → {prefix}.* ({len(corpus)} samples, {corpus.meta['n_tokens']} tokens, {corpus.meta['dtype']})")
@@ -0,0 +1,336 @@
+"""
+Phase Training
+==============
+The notebooks' phase-by-phase SQLTransformer training as a module + CLI:
+
+    python -m src.train --phase 1
+    python -m src.train --phase 4.5 --workers 4 --max-tokens 2048
+    python -m src.train --phase 4.5 --nprocs 4 --accum-steps 2       # gloo DDP, 4 local processes
+    python -m src.train --phase 4.5 --data /data/synthetic/join_10m  # binary corpus prefix or .json
+
+Each phase starts from the previous phase's best checkpoint (vocab surgery
+when the vocabulary grew), trains the parameters the notebooks trained,
+and writes {out_dir}/phase{X}/phase{X}_epoch_NN.pt plus phase{X}_best.pt
+in the notebooks' {"epoch", "model_state_dict", "optimizer_state_dict",
+...} format. With the default --out-dir, phase 4.5's best checkpoint is
+the one the app serves (src.checkpoints).
+
+- data: memory-mapped binary corpus (src.token_corpus), DataLoader
+  worker processes, token-budget batches (src.training_data)
+- loss: plain cross-entropy (phases 1-3) or the grammar-masked loss
+  with precomputed mask states (phases 4 / 4.5)
+- CPU data parallel: --nprocs local processes over gloo, each with
+  its own shard of batches and cpu_count / nprocs threads
+- --causal: causal attention (SQLTransformer.forward(causal=True)),
+  so the checkpoint can decode with the KV cache (use_cache=True);
+  recorded as "causal" in the checkpoint
+- gradient accumulation, clipping, throughput (samples/s, tokens/s)
+  and padding-efficiency logging
+"""
+
+import argparse
+import os
+import socket
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import torch.nn.functional as F
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader
+
+from models.sql_transformer import SQLTransformer
+from src.checkpoints import CHECKPOINT_DIR, best_checkpoint_path, phase_tag
+from src.grammar import grammar_masked_loss
+from src.token_corpus import TokenCorpus, ensure_corpus
+from src.training_data import CorpusDataset, IGNORE_INDEX, TokenBudgetBatchSampler, collate_fn
+from src.utils import set_seed
+
+
+# ============================================================
+# Phase configs (as in notebooks/0*_phase*.ipynb)
+# ============================================================
+@dataclass
+class PhaseConfig:
+    data: str
+    init_from: Optional[str]                  # previous phase
+    epochs: int
+    lr: float
+    optimizer: str = "adam"
+    grammar_loss: bool = False
+    trainable: Optional[Tuple[str, ...]] = None   # name fragments; None = all
+    clip_grad: Optional[float] = None
+    batch_size: int = 16
+
+
+PHASES = {
+    "1": PhaseConfig("data/sql_ast/phase1_simple_select.json", None, epochs=20, lr=1e-3),
+    "2": PhaseConfig("data/sql_ast/phase2_select_where.json", "1", epochs=20, lr=5e-4),
+    "3": PhaseConfig("data/sql_ast/phase3_groupby_having.json", "2", epochs=25, lr=3e-4),
+    "4": PhaseConfig(
+        "data/sql_ast/phase4_join.json", "3", epochs=10, lr=3e-4, optimizer="adamw",
+        grammar_loss=True, trainable=("layers.1", "fc_out"), clip_grad=1.0
+    ),
+    "4.5": PhaseConfig(
+        "data/sql_ast/phase4.5_join.json", "3", epochs=30, lr=3e-4, optimizer="adamw",
+        grammar_loss=True, trainable=("layers.1", "layers.2", "fc_out"), clip_grad=1.0
+    ),
+}
+
+
+# ============================================================
+# Checkpoints
+# ============================================================
+def load_state_dict(path: str) -> dict:
+    """Raw state_dict or the {"model_state_dict": ...} checkpoint format."""
+    state = torch.load(path, map_location="cpu")
+    return state.get("model_state_dict", state)
+
+
+def load_with_vocab_surgery(model: SQLTransformer, state: dict):
+    """
+    Load weights whose vocab-sized rows (embedding, fc_out) may be
+    shorter than the model's: old rows are copied, new ones keep their
+    fresh initialization.
+    """
+    target = model.state_dict()
+    for name, param in state.items():
+        current = target[name]
+        if param.shape != current.shape:
+            if param.shape[1:] != current.shape[1:] or param.size(0) > current.size(0):
+                raise ValueError(f"❌ {name}: cannot adapt {tuple(param.shape)} to {tuple(current.shape)}")
+            current = current.clone()
+            current[:param.size(0)] = param
+            print(f"🔧 Vocab surgery on {name}: {param.size(0)} → {current.size(0)}")
+            param = current
+        target[name] = param
+    model.load_state_dict(target)
+
+
+def prepare_corpus(path: str) -> str:
+    """
+    Binary corpus prefix for `path`. .json / .jsonl corpora are converted
+    into the cache first (if missing or stale); anything else is a prefix.
+    Call once before spawning ranks: the converter truncates the cache
+    files, which other ranks may already be memory-mapping.
+    """
+    if path.endswith((".json", ".jsonl")):
+        return ensure_corpus(path).prefix
+    return path
+
+
+def open_corpus(path: str) -> TokenCorpus:
+    return TokenCorpus(prepare_corpus(path))
+
+
+# ============================================================
+# Training
+# ============================================================
+def _is_main(rank: int) -> bool:
+    return rank == 0
+
+
+def _reduce_sum(values, world_size: int):
+    if world_size == 1:
+        return values
+    t = torch.tensor(values, dtype=torch.float64)
+    dist.all_reduce(t)
+    return t.tolist()
+
+
+def train_phase(args, rank: int = 0, world_size: int = 1):
+    cfg = PHASES[args.phase]
+    set_seed(args.seed)
+    if world_size > 1:
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // world_size))
+
+    # ---------- data ----------
+    # main() builds the cache before spawning; every rank only maps it (read-only)
+    prefix = getattr(args, "corpus_prefix", None)
+    corpus = TokenCorpus(prefix) if prefix else open_corpus(args.data or cfg.data)
+    dataset = CorpusDataset(corpus)
+    if args.max_tokens:
+        sampler = TokenBudgetBatchSampler(
+            dataset.lengths, max_tokens=args.max_tokens, bucket_width=args.bucket_width,
+            seed=args.seed, num_replicas=world_size, rank=rank
+        )
+    else:
+        sampler = TokenBudgetBatchSampler(
+            dataset.lengths, max_tokens=None, bucket_width=0,
+            max_batch_size=args.batch_size or cfg.batch_size,
+            seed=args.seed, num_replicas=world_size, rank=rank
+        )
+    loader = DataLoader(
+        dataset,
+        batch_sampler=sampler,
+        collate_fn=collate_fn,
+        num_workers=args.workers,
+        persistent_workers=args.workers > 0,
+    )
+
+    # ---------- model ----------
+    model = SQLTransformer()
+    init = args.init or (best_checkpoint_path(args.out_dir, cfg.init_from) if cfg.init_from else None)
+    if init:
+        if not os.path.exists(init):
+            raise FileNotFoundError(f"❌ Phase-{args.phase} starts from {init}; train phase {cfg.init_from} first or pass --init")
+        load_with_vocab_surgery(model, load_state_dict(init))
+        if _is_main(rank):
+            print(f"✅ Initialized from {init}")
+
+    trainable = None if args.train_all else cfg.trainable
+    for name, param in model.named_parameters():
+        param.requires_grad = trainable is None or any(t in name for t in trainable)
+    params = [p for p in model.parameters() if p.requires_grad]
+
+    lr = args.lr or cfg.lr
+    optimizer = (torch.optim.AdamW if cfg.optimizer == "adamw" else torch.optim.Adam)(params, lr=lr)
+
+    net = DistributedDataParallel(model) if world_size > 1 else model
+    accum = max(1, args.accum_steps)
+    epochs = args.epochs or cfg.epochs
+
+    tag = phase_tag(args.phase)
+    out_dir = os.path.join(args.out_dir, tag)
+    if _is_main(rank):
+        os.makedirs(out_dir, exist_ok=True)
+        print(
+            f"🚀 Phase-{args.phase}: {len(corpus)} samples, {epochs} epochs, lr={lr}, "
+            f"{world_size} process(es) × {args.workers} loader worker(s), accum={accum}"
+            + (", causal" if args.causal else "")
+        )
+
+    best_loss = float("inf")
+    for epoch in range(1, epochs + 1):
+        net.train()
+        sampler.set_epoch(epoch)
+        total_loss, n_batches, n_samples, n_tokens = 0.0, 0, 0, 0
+        window_samples, window_tokens, window_start = 0, 0, time.perf_counter()
+        epoch_start = time.perf_counter()
+
+        optimizer.zero_grad()
+        for step, batch in enumerate(loader, start=1):
+            input_ids = batch["input_ids"]
+            labels = batch["labels"]
+
+            sync = step % accum == 0 or step == len(sampler)
+            ctx = net.no_sync() if world_size > 1 and not sync else nullcontext()
+            with ctx:
+                logits = net(input_ids, batch["attention_mask"], causal=args.causal)
+                if cfg.grammar_loss:
+                    loss = grammar_masked_loss(logits, input_ids, labels, states=batch["mask_states"])
+                else:
+                    loss = F.cross_entropy(logits.view(-1, logits.size(-1)), labels.view(-1), ignore_index=IGNORE_INDEX)
+                (loss / accum).backward()
+
+            if sync:
+                if cfg.clip_grad:
+                    torch.nn.utils.clip_grad_norm_(params, cfg.clip_grad)
+                optimizer.step()
+                optimizer.zero_grad()
+
+            tokens = int(batch["attention_mask"].sum())
+            total_loss += loss.item()
+            n_batches += 1
+            n_samples += input_ids.size(0)
+            n_tokens += tokens
+            window_samples += input_ids.size(0)
+            window_tokens += tokens
+
+            if args.log_every and step % args.log_every == 0 and _is_main(rank):
+                elapsed = time.perf_counter() - window_start
+                print(
+                    f"  step {step:5d} | loss {loss.item():.4f} | "
+                    f"{window_samples * world_size / elapsed:,.0f} samples/s | "
+                    f"{window_tokens * world_size / elapsed:,.0f} tokens/s"
+                )
+                window_samples, window_tokens, window_start = 0, 0, time.perf_counter()
+
+        # ---------- epoch summary (all ranks) ----------
+        elapsed = time.perf_counter() - epoch_start
+        total_loss, n_batches, n_samples, n_tokens = _reduce_sum(
+            [total_loss, n_batches, n_samples, n_tokens], world_size
+        )
+        avg_loss = total_loss / max(n_batches, 1)
+        padding = sampler.epoch_stats.get("padding_efficiency", 1.0)
+
+        if not _is_main(rank):
+            continue
+
+        print(
+            f"Epoch {epoch:02d} | Loss: {avg_loss:.4f} | "
+            f"{n_samples / elapsed:,.0f} samples/s | {n_tokens / elapsed:,.0f} tokens/s | "
+            f"padding efficiency {padding:.1%}"
+        )
+
+        checkpoint = {
+            "epoch": epoch,
+            "phase": args.phase,
+            "model_state_dict": model.state_dict(),
+            "optimizer_state_dict": optimizer.state_dict(),
+            "avg_loss": avg_loss,
+            "causal": args.causal,
+        }
+        torch.save(checkpoint, os.path.join(out_dir, f"{tag}_epoch_{epoch:02d}.pt"))
+
+        if avg_loss < best_loss:
+            best_loss = avg_loss
+            checkpoint["best_loss"] = best_loss
+            torch.save(checkpoint, best_checkpoint_path(args.out_dir, args.phase))
+            print(f"🏆 New best model saved (loss={best_loss:.4f})")
+
+    return best_loss
+
+
+# ============================================================
+# Multi-process (gloo) launch
+# ============================================================
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _worker(rank: int, world_size: int, port: int, args):
+    dist.init_process_group(
+        "gloo", init_method=f"tcp://127.0.0.1:{port}", rank=rank, world_size=world_size
+    )
+    try:
+        train_phase(args, rank, world_size)
+    finally:
+        dist.destroy_process_group()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train SQLTransformer phase by phase")
+    parser.add_argument("--phase", required=True, choices=sorted(PHASES))
+    parser.add_argument("--data", default=None, help="corpus .json / .jsonl or binary prefix (default: the phase's corpus)")
+    parser.add_argument("--init", default=None, help="checkpoint to start from (default: previous phase's best)")
+    parser.add_argument("--out-dir", default=CHECKPOINT_DIR)
+    parser.add_argument("--epochs", type=int, default=None)
+    parser.add_argument("--lr", type=float, default=None)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--max-tokens", type=int, default=None, help="token-budget batches instead of --batch-size")
+    parser.add_argument("--bucket-width", type=int, default=2)
+    parser.add_argument("--accum-steps", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=2, help="DataLoader worker processes")
+    parser.add_argument("--nprocs", type=int, default=1, help="local data-parallel processes (gloo)")
+    parser.add_argument("--train-all", action="store_true", help="ignore the phase's freeze strategy")
+    parser.add_argument("--causal", action="store_true", help="train with causal attention, for generate(use_cache=True)")
+    parser.add_argument("--log-every", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    args.corpus_prefix = prepare_corpus(args.data or PHASES[args.phase].data)
+
+    if args.nprocs > 1:
+        mp.spawn(_worker, args=(args.nprocs, _free_port(), args), nprocs=args.nprocs, join=True)
+    else:
+        train_phase(args)
+
+
+if __name__ == "__main__":
+    main()
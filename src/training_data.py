@@ -0,0 +1,260 @@
+"""
+Training Data
+=============
+Phase corpora (data/sql_ast/*.json) as decoder training samples.
+
+Same samples as the notebooks' prepare_phase4_5_sample / collate_fn
+(input = tokens[:-1], labels = tokens[1:], PAD → -100), plus the grammar
+automaton state behind every position. Those states index the
+precompiled mask table, so the grammar-masked loss is one gather and a
+masked_fill instead of a get_allowed_tokens call per (b, t):
+
+    dataset = PhaseDataset(load_phase("data/sql_ast/phase4.5_join.json"))
+    # or, memory-mapped from the binary cache (src.token_corpus):
+    dataset = CorpusDataset(ensure_corpus("data/sql_ast/phase4.5_join.json"))
+    loader = DataLoader(dataset, batch_size=16, shuffle=True, collate_fn=collate_fn)
+
+    for batch in loader:
+        logits = model(batch["input_ids"])
+        loss = grammar_masked_loss(
+            logits, batch["input_ids"], batch["labels"], states=batch["mask_states"]
+        )
+"""
+
+import json
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset, Sampler
+
+from src.grammar import GrammarAutomaton, get_grammar
+from src.token_corpus import TokenCorpus
+from src.vocab import PAD, UNK, TOKEN2ID
+
+PAD_ID = TOKEN2ID[PAD]
+UNK_ID = TOKEN2ID[UNK]
+IGNORE_INDEX = -100
+
+
+def load_phase(path: str) -> List[dict]:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def prepare_sample(sample: dict, grammar: Optional[GrammarAutomaton] = None) -> Dict[str, torch.Tensor]:
+    """
+    One corpus entry → {"input_ids", "labels", "mask_states"}.
+    mask_states[t] is the grammar state after input_ids[:t+1], i.e. the
+    allowed set for predicting labels[t].
+    """
+    token_ids = [TOKEN2ID.get(t, UNK_ID) for t in sample["input_tokens"]]
+    return _sample_from_ids(torch.tensor(token_ids, dtype=torch.long), grammar)
+
+
+def _sample_from_ids(token_ids: torch.Tensor, grammar: Optional[GrammarAutomaton] = None, states: Optional[torch.Tensor] = None) -> Dict[str, torch.Tensor]:
+    input_ids = token_ids[:-1]
+    labels = token_ids[1:].clone()
+    labels[labels == PAD_ID] = IGNORE_INDEX
+
+    if states is None:
+        states = (grammar or get_grammar()).prefix_states(input_ids.unsqueeze(0))[0]
+    else:
+        states = states[:-1]
+
+    return {
+        "input_ids": input_ids,
+        "labels": labels,
+        "mask_states": states
+    }
+
+
+class PhaseDataset(Dataset):
+    """Samples are prepared (tokens → ids → mask states) once, up front."""
+
+    def __init__(self, data: List[dict], grammar: Optional[GrammarAutomaton] = None):
+        grammar = grammar or get_grammar()
+        self.samples = [prepare_sample(s, grammar) for s in data]
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, idx):
+        return self.samples[idx]
+
+    @property
+    def lengths(self) -> List[int]:
+        """Input length (tokens the encoder sees) of every sample."""
+        return [s["input_ids"].size(0) for s in self.samples]
+
+
+class CorpusDataset(Dataset):
+    """
+    Samples read from a memory-mapped TokenCorpus (src.token_corpus).
+    Nothing is materialized up front: an item is a slice of the token
+    map and of the precomputed state map, so corpus size is bounded by
+    disk, not RAM.
+    """
+
+    def __init__(self, corpus: TokenCorpus):
+        self.corpus = corpus
+
+    def __len__(self):
+        return len(self.corpus)
+
+    @property
+    def lengths(self) -> List[int]:
+        return (self.corpus.lengths - 1).tolist()
+
+    def __getitem__(self, idx):
+        return _sample_from_ids(
+            torch.from_numpy(self.corpus.ids(idx).astype(np.int64)),
+            states=torch.from_numpy(self.corpus.mask_states(idx).astype(np.int64))
+        )
+
+    def __getitems__(self, indices):
+        # DataLoader batched fetch: the whole batch is a few array slices,
+        # already in collate_fn's output form (collate_fn passes it on)
+        ids, states, lengths = self.corpus.batch(indices, pad_id=PAD_ID)
+        ids = torch.from_numpy(ids)
+        real = torch.arange(ids.size(1)) < torch.from_numpy(lengths).unsqueeze(1)
+
+        input_ids = ids[:, :-1]
+        labels = ids[:, 1:].masked_fill(~real[:, 1:] | (ids[:, 1:] == PAD_ID), IGNORE_INDEX)
+        attention_mask = real[:, 1:].long()
+
+        return {
+            "input_ids": input_ids.masked_fill(attention_mask == 0, PAD_ID),
+            "labels": labels,
+            "mask_states": torch.from_numpy(states[:, :-1]).masked_fill(attention_mask == 0, 0),
+            "attention_mask": attention_mask
+        }
+
+
+def collate_fn(batch: List[Dict[str, torch.Tensor]]) -> Dict[str, torch.Tensor]:
+    """Right-pad to the longest sample: PAD inputs, -100 labels, state 0."""
+    if isinstance(batch, dict):
+        return batch  # already collated by CorpusDataset.__getitems__
+    B = len(batch)
+    T = max(item["input_ids"].size(0) for item in batch)
+
+    input_ids = torch.full((B, T), PAD_ID, dtype=torch.long)
+    labels = torch.full((B, T), IGNORE_INDEX, dtype=torch.long)
+    mask_states = torch.zeros((B, T), dtype=torch.long)
+    attention_mask = torch.zeros((B, T), dtype=torch.long)
+
+    for i, item in enumerate(batch):
+        n = item["input_ids"].size(0)
+        input_ids[i, :n] = item["input_ids"]
+        labels[i, :n] = item["labels"]
+        mask_states[i, :n] = item["mask_states"]
+        attention_mask[i, :n] = 1
+
+    return {
+        "input_ids": input_ids,
+        "labels": labels,
+        "mask_states": mask_states,
+        "attention_mask": attention_mask
+    }
+
+
+# ============================================================
+# Length-bucketed, token-budget batching
+# ============================================================
+class TokenBudgetBatchSampler(Sampler):
+    """
+    Batches of similar-length samples, sized by a padded-token budget
+    instead of a fixed batch size:
+
+    - samples are grouped into buckets of bucket_width lengths and
+      shuffled within each bucket
+    - batches are cut from the bucket-ordered list while
+      len(batch) * longest_in_batch <= max_tokens (and max_batch_size)
+    - batch order is shuffled, so each step still sees a random length
+
+    Use as DataLoader(dataset, batch_sampler=sampler, collate_fn=collate_fn).
+    Every epoch's padding is recorded in `epoch_stats`; call
+    set_epoch(epoch) for a new shuffle each epoch.
+
+    bucket_width=0, max_tokens=None skips bucketing and the budget: plain
+    shuffled batches of max_batch_size, like the notebooks' BATCH_SIZE. With num_replicas > 1
+    every rank builds the same batch list from the shared seed and takes
+    every num_replicas-th batch; the list is cut to a multiple of
+    num_replicas so all ranks run the same number of steps.
+    """
+
+    def __init__(self, lengths, max_tokens: Optional[int] = 4096, bucket_width: int = 2, max_batch_size: Optional[int] = None, shuffle: bool = True, seed: int = 0, num_replicas: int = 1, rank: int = 0):
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        if max_tokens is not None and len(self.lengths) and self.lengths.max() > max_tokens:
+            raise ValueError(f"❌ max_tokens={max_tokens} is below the longest sample ({self.lengths.max()} tokens)")
+
+        self.max_tokens = max_tokens
+        self.bucket_width = bucket_width
+        self.max_batch_size = max_batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.epoch = 0
+        self.epoch_stats = {}
+        self._cached = None
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def _batches(self) -> List[List[int]]:
+        if self._cached is not None and self._cached[0] == self.epoch:
+            return self._cached[1]
+
+        rng = np.random.default_rng(self.seed + self.epoch)
+        order = rng.permutation(len(self.lengths)) if self.shuffle else np.arange(len(self.lengths))
+        if self.bucket_width:
+            # Stable sort by bucket keeps the shuffle inside each bucket
+            order = order[np.argsort(self.lengths[order] // self.bucket_width, kind="stable")]
+
+        batches, batch, longest = [], [], 0
+        for idx in order.tolist():
+            L = int(self.lengths[idx])
+            full = (
+                (self.max_tokens is not None and (len(batch) + 1) * max(longest, L) > self.max_tokens)
+                or (self.max_batch_size is not None and len(batch) == self.max_batch_size)
+            )
+            if batch and full:
+                batches.append(batch)
+                batch, longest = [], 0
+            batch.append(idx)
+            longest = max(longest, L)
+        if batch:
+            batches.append(batch)
+
+        if self.shuffle:
+            batches = [batches[i] for i in rng.permutation(len(batches))]
+        if self.num_replicas > 1:
+            usable = len(batches) - len(batches) % self.num_replicas
+            batches = batches[self.rank:usable:self.num_replicas]
+        self._cached = (self.epoch, batches)
+        return batches
+
+    def __iter__(self):
+        batches = self._batches()
+        self.epoch_stats = padding_stats(batches, self.lengths)
+        return iter(batches)
+
+    def __len__(self):
+        return len(self._batches())
+
+
+def padding_stats(batches, lengths) -> dict:
+    """Real vs padded tokens over a list of index batches."""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    real = padded = 0
+    for batch in batches:
+        L = lengths[batch]
+        real += int(L.sum())
+        padded += int(L.max()) * len(batch)
+    return {
+        "batches": len(batches),
+        "real_tokens": real,
+        "padded_tokens": padded,
+        "padding_efficiency": real / padded if padded else 1.0,
+    }
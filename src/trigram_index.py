@@ -0,0 +1,107 @@
+"""
+Trigram Index
+=============
+Sub-linear replacement for difflib.get_close_matches(term, candidates, n=1).
+
+Built once per candidate list (e.g. per compiled schema):
+- every candidate is broken into padded character trigrams
+- an inverted index maps trigram → candidate ids
+
+A lookup only touches candidates that share trigrams with the term,
+keeps those whose length can still reach the cutoff, shortlists the
+best by trigram overlap, and scores the shortlist with the same
+SequenceMatcher.ratio() difflib uses. The winner and its score therefore
+match difflib whenever difflib's winner shares enough trigrams with the
+term to make the shortlist, which holds for typos and partial names.
+"""
+
+import heapq
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from itertools import chain
+from typing import Dict, List, Optional, Set, Tuple
+
+DEFAULT_SHORTLIST = 32
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    def __init__(self, candidates: List[str], shortlist: int = DEFAULT_SHORTLIST):
+        self.candidates = list(dict.fromkeys(candidates))
+        self.shortlist = shortlist
+
+        self._lengths = [len(c) for c in self.candidates]
+        self._gram_counts = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+
+        for i, cand in enumerate(self.candidates):
+            grams = trigrams(cand)
+            self._gram_counts.append(len(grams))
+            for g in grams:
+                self._postings[g].append(i)
+
+        self._postings = dict(self._postings)
+
+    def __len__(self) -> int:
+        return len(self.candidates)
+
+    # ==================================================
+    # Lookup
+    # ==================================================
+    def best(self, term: str, cutoff: float = 0.6) -> Optional[Tuple[str, float]]:
+        """
+        Returns (candidate, ratio) for the closest candidate with
+        ratio >= cutoff, or None. Ties resolve like difflib (higher
+        ratio, then lexicographically larger candidate).
+        """
+        if not self.candidates or not term:
+            return None
+
+        # ratio = 2*M / (la + lb) <= 2*min(la, lb) / (la + lb)
+        la = len(term)
+        min_len = la * cutoff / (2 - cutoff)
+        max_len = la * (2 - cutoff) / cutoff if cutoff > 0 else float("inf")
+
+        term_grams = trigrams(term)
+        overlap = Counter(chain.from_iterable(
+            self._postings.get(g, ()) for g in term_grams
+        ))
+
+        # Dice coefficient over trigram sets, within the length band
+        n_grams = len(term_grams)
+        lengths = self._lengths
+        gram_counts = self._gram_counts
+        scored = [
+            (2 * shared / (n_grams + gram_counts[i]), i)
+            for i, shared in overlap.items()
+            if min_len <= lengths[i] <= max_len
+        ]
+        if not scored:
+            return None
+
+        best = None
+        matcher = SequenceMatcher()
+        matcher.set_seq2(term)
+        for _, i in heapq.nlargest(self.shortlist, scored):
+            cand = self.candidates[i]
+            matcher.set_seq1(cand)
+            if (
+                matcher.real_quick_ratio() >= cutoff
+                and matcher.quick_ratio() >= cutoff
+            ):
+                ratio = matcher.ratio()
+                if ratio >= cutoff and (best is None or (ratio, cand) > best):
+                    best = (ratio, cand)
+
+        if best is None:
+            return None
+        return best[1], best[0]
+
+    def match(self, term: str, cutoff: float = 0.6) -> Optional[str]:
+        """Drop-in for difflib.get_close_matches(term, candidates, n=1)."""
+        hit = self.best(term, cutoff)
+        return hit[0] if hit else None
@@ -167,7 +167,7 @@ def get_allowed_tokens(tokens_so_far, schema_tables, schema_columns):
 import torch
 import random
 import numpy as np
-from typing import List, Set
+from typing import FrozenSet, List, Set
 
 from src.vocab import *
 
@@ -243,14 +243,12 @@ def infer_decoder_state(tokens: List[str]) -> str:
 
     return "END"
 
-def get_allowed_tokens(tokens_so_far, schema_tables=None, schema_columns=None, intent_signals=None):
-    state = infer_decoder_state(tokens_so_far)
+def _allowed_for_state(state: str, last_token, intent_signals=None) -> Set[int]:
+    """get_allowed_tokens' rules: they only see the state, the last token and the intent."""
     allowed = set()
     def add_safe(t):
         if t in TOKEN2ID: allowed.add(TOKEN2ID[t])
 
-    last_token = tokens_so_far[-1] if tokens_so_far else None
-
     # Logic for START, SELECT, and FROM remains standard [cite: 163, 164]
     if state == "START":
         add_safe(SELECT)
@@ -307,4 +305,312 @@ def get_allowed_tokens(tokens_so_far, schema_tables=None, schema_columns=None, i
         add_safe(SCHEMA_COLUMN) 
 
     if not allowed: add_safe(END)
-    return allowed
\ No newline at end of file
+    return allowed
+
+
+# ----------------------------
+# Precomputed allowed sets / masks
+# ----------------------------
+# Every state infer_decoder_state can return
+DECODER_STATES = (
+    "START", "SELECT", "FROM",
+    "JOIN_EXPECT_TABLE", "JOIN_EXPECT_ON", "JOIN_CONDITION_1", "JOIN_CONDITION_2", "JOIN_FINISHED",
+    "WHERE", "GROUP_BY", "HAVING", "ORDER_BY", "LIMIT_OFFSET", "END",
+)
+
+
+def _build_allowed_table():
+    # The rules only compare the last token against vocab tokens, so any
+    # out-of-vocab last token (e.g. <JOIN_TYPE>) behaves like None
+    table, rows = {}, []
+    for state in DECODER_STATES:
+        for last_token in (None,) + tuple(TOKEN2ID):
+            for where in (False, True):
+                for having in (False, True):
+                    ids = frozenset(_allowed_for_state(state, last_token, {"where": where, "having": having}))
+                    table[(state, last_token, where, having)] = (ids, len(rows))
+                    rows.append(sorted(ids))
+
+    masks = torch.zeros(len(rows), VOCAB_SIZE, dtype=torch.bool)
+    for i, ids in enumerate(rows):
+        masks[i, ids] = True
+    return table, masks
+
+
+# (state, last token, where, having) → (frozenset of ids, row of _ALLOWED_MASKS)
+_ALLOWED_TABLE, _ALLOWED_MASKS = _build_allowed_table()
+_MASKS_BY_DEVICE = {"cpu": _ALLOWED_MASKS}
+
+
+def _allowed_key(state: str, last_token, intent_signals=None) -> tuple:
+    return (
+        state,
+        last_token if last_token in TOKEN2ID else None,
+        bool(intent_signals and intent_signals.get("where")),
+        bool(intent_signals and intent_signals.get("having")),
+    )
+
+
+def allowed_token_set(state: str, last_token, intent_signals=None) -> FrozenSet[int]:
+    """Allowed ids for a decoder state; one shared frozenset per key."""
+    return _ALLOWED_TABLE[_allowed_key(state, last_token, intent_signals)][0]
+
+
+def allowed_token_row(state: str, last_token, intent_signals=None) -> int:
+    """Row of allowed_token_masks() holding allowed_token_set's mask."""
+    return _ALLOWED_TABLE[_allowed_key(state, last_token, intent_signals)][1]
+
+
+def allowed_token_masks(device=None) -> torch.Tensor:
+    """
+    Every mask of the table as one (rows, VOCAB_SIZE) bool tensor (one
+    shared copy per device): treat it as read-only.
+    """
+    device = str(device) if device is not None else "cpu"
+    masks = _MASKS_BY_DEVICE.get(device)
+    if masks is None:
+        masks = _MASKS_BY_DEVICE[device] = _ALLOWED_MASKS.to(device)
+    return masks
+
+
+def allowed_token_mask(state: str, last_token, intent_signals=None, device=None) -> torch.Tensor:
+    """
+    (VOCAB_SIZE,) bool mask of allowed_token_set. A view into a shared
+    table (one copy per device): treat it as read-only.
+    """
+    return allowed_token_masks(device)[allowed_token_row(state, last_token, intent_signals)]
+
+
+# ----------------------------
+# History summary
+# ----------------------------
+# The only facts about a history infer_decoder_state looks at. Shared by
+# DecoderStateTracker and src.grammar.GrammarAutomaton (whose state ids
+# encode them), so the grammar rules live in this module only.
+_JOIN_TOKENS = (JOIN, INNER_JOIN, LEFT_JOIN)
+
+# Clause dominance in infer_decoder_state's order: the highest rank seen wins
+CLAUSE_RANK = {
+    SELECT: 1, FROM: 2, WHERE: 3, GROUP_BY: 4, HAVING: 5,
+    ORDER_BY: 6, LIMIT: 7, OFFSET: 7,
+}
+N_CLAUSE_RANKS = 8
+_RANK_STATE = {
+    1: "SELECT", 2: "FROM", 3: "WHERE", 4: "GROUP_BY", 5: "HAVING",
+    6: "ORDER_BY", 7: "LIMIT_OFFSET",
+}
+_FIRST_CLAUSE_RANK = CLAUSE_RANK[WHERE]
+
+# Tokens after the last ON
+ON_NONE, ON_0, ON_1_COLUMN, ON_1_OTHER, ON_2, ON_MORE = range(6)
+N_ON = 6
+
+
+def advance_on(on: int, token: str) -> int:
+    """ON summary after appending token."""
+    if token == ON:
+        return ON_0
+    if on == ON_0:
+        return ON_1_COLUMN if token == SCHEMA_COLUMN else ON_1_OTHER
+    if on in (ON_1_COLUMN, ON_1_OTHER):
+        return ON_2
+    if on == ON_2:
+        return ON_MORE
+    return on
+
+
+def summary_state(last_token, prev_opens_join: bool, on: int, rank: int) -> str:
+    """
+    infer_decoder_state from the summary: the last token (None for an
+    empty history), whether the token before it opened a JOIN, the ON
+    summary and the highest CLAUSE_RANK seen.
+    """
+    if last_token is None or last_token == START:
+        return "START"
+
+    if last_token in _JOIN_TOKENS: return "JOIN_EXPECT_TABLE"
+    if last_token == ON: return "JOIN_CONDITION_1"
+
+    if on == ON_1_COLUMN: return "JOIN_CONDITION_2"
+    if on == ON_2: return "JOIN_FINISHED"
+
+    if rank >= _FIRST_CLAUSE_RANK: return _RANK_STATE[rank]
+
+    if prev_opens_join: return "JOIN_EXPECT_ON"
+
+    if rank: return _RANK_STATE[rank]
+
+    return "END"
+
+
+# ----------------------------
+# Incremental decoder state
+# ----------------------------
+
+
+class DecoderStateTracker(list):
+    """
+    A token history that keeps infer_decoder_state's answer up to date
+    as tokens are appended, instead of rescanning the list on every call.
+
+    It only tracks the history summary above (the last two tokens, the
+    ON summary and the most dominant clause keyword). append() and
+    .state are O(1); .allowed() and .mask() are lookups in the
+    precomputed table.
+    It is still a list, so allowed_token_fns that index or scan their
+    history keep working; get_allowed_tokens recognizes it and skips
+    the rescan:
+
+        history = DecoderStateTracker([START])
+        for _ in range(max_len):
+            allowed = get_allowed_tokens(history, intent_signals=signals)
+            ...
+            history.append(next_token)
+    """
+
+    def __init__(self, tokens=()):
+        super().__init__()
+        self._reset()
+        self.extend(tokens)
+
+    def _reset(self):
+        self._on = ON_NONE
+        self._clause_rank = 0
+
+    def append(self, token: str):
+        super().append(token)
+        self._on = advance_on(self._on, token)
+        self._clause_rank = max(self._clause_rank, CLAUSE_RANK.get(token, 0))
+
+    def extend(self, tokens):
+        for token in tokens:
+            self.append(token)
+
+    def __iadd__(self, tokens):
+        self.extend(tokens)
+        return self
+
+    def _rebuild(self):
+        tokens = list(self)
+        self.clear()
+        self.extend(tokens)
+
+    # Any other mutation rebuilds the summary from scratch (rare)
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._rebuild()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._rebuild()
+
+    def __imul__(self, n):
+        super().__imul__(n)
+        self._rebuild()
+        return self
+
+    def insert(self, index, token):
+        super().insert(index, token)
+        self._rebuild()
+
+    def pop(self, index=-1):
+        token = super().pop(index)
+        self._rebuild()
+        return token
+
+    def remove(self, token):
+        super().remove(token)
+        self._rebuild()
+
+    def clear(self):
+        super().clear()
+        self._reset()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._rebuild()
+
+    def reverse(self):
+        super().reverse()
+        self._rebuild()
+
+    def copy(self) -> "DecoderStateTracker":
+        """O(1) state copy (plus the list copy) for branching, e.g. beams."""
+        clone = DecoderStateTracker.__new__(DecoderStateTracker)
+        list.extend(clone, self)
+        clone.__dict__.update(self.__dict__)
+        return clone
+
+    @property
+    def last_token(self):
+        return self[-1] if self else None
+
+    @property
+    def state(self) -> str:
+        """Same string infer_decoder_state(list(self)) returns."""
+        return summary_state(
+            self.last_token,
+            len(self) > 1 and self[-2] in _JOIN_TOKENS,
+            self._on,
+            self._clause_rank
+        )
+
+    def allowed(self, intent_signals=None) -> FrozenSet[int]:
+        """get_allowed_tokens(self, intent_signals=...): a shared frozenset."""
+        return allowed_token_set(self.state, self.last_token, intent_signals)
+
+    def mask(self, intent_signals=None, device=None) -> torch.Tensor:
+        """Shared (VOCAB_SIZE,) bool mask of allowed(); read-only."""
+        return allowed_token_mask(self.state, self.last_token, intent_signals, device)
+
+
+def get_allowed_tokens(tokens_so_far, schema_tables=None, schema_columns=None, intent_signals=None):
+    """
+    Token ids the grammar allows after tokens_so_far, as a new set the
+    caller may modify. Pass a DecoderStateTracker to make the lookup
+    O(1); a plain list is summarized in one pass. Internal callers that
+    only read the result use DecoderStateTracker.allowed() (a shared
+    frozenset, no copy).
+    """
+    if not isinstance(tokens_so_far, DecoderStateTracker):
+        tokens_so_far = DecoderStateTracker(tokens_so_far)
+    return set(tokens_so_far.allowed(intent_signals))
+
+
+def verify_decoder_state_tracker(paths=None, verbose: bool = True) -> bool:
+    """
+    Check DecoderStateTracker against infer_decoder_state and the rules
+    it feeds, on every prefix of every sequence in data/sql_ast (and
+    every intent combination). Returns True if all agree.
+    """
+    import glob
+    import json
+
+    paths = paths or sorted(glob.glob("data/sql_ast/*.json"))
+    intents = [{"where": w, "having": h} for w in (False, True) for h in (False, True)]
+    checked = mismatches = 0
+
+    for path in paths:
+        with open(path) as f:
+            data = json.load(f)
+        for sample in data:
+            tokens = sample["input_tokens"]
+            tracker = DecoderStateTracker()
+            for t in range(len(tokens) + 1):
+                prefix = tokens[:t]
+                expected_state = infer_decoder_state(prefix)
+                ok = tracker.state == expected_state
+                for intent in intents:
+                    expected = _allowed_for_state(expected_state, prefix[-1] if prefix else None, intent)
+                    ok = ok and tracker.allowed(intent) == expected
+                if not ok:
+                    mismatches += 1
+                    if verbose and mismatches <= 5:
+                        print(f"❌ {path}: {prefix} → {tracker.state} (expected {expected_state})")
+                checked += 1
+                if t < len(tokens):
+                    tracker.append(tokens[t])
+
+    if verbose:
+        print(f"{'✅' if not mismatches else '❌'} {checked - mismatches}/{checked} prefixes agree")
+    return mismatches == 0
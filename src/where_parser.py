@@ -1,9 +1,11 @@
 import re
 
 class WhereParser:
-    def __init__(self, nl_parser, semantic_aligner):
+    def __init__(self, nl_parser, semantic_aligner, schema=None):
         self.nl_parser = nl_parser
         self.aligner = semantic_aligner
+        # Optional CompiledSchema: reuses its cached column index
+        self.schema = schema
 
     # -----------------------------
     # Tokenize WHERE clause
@@ -97,7 +99,11 @@ class WhereParser:
         # This allows it to find 'departments.manager_id' even if 'employees' is the base table.
         mapping = self.aligner.align(
             user_terms=signals["entities"],
-            schema_terms=all_columns
+            schema_terms=all_columns,
+            index=(
+                self.schema.lazy_index(all_columns, self.aligner)
+                if self.schema is not None else None
+            )
         )
         
         if mapping:
@@ -0,0 +1,84 @@
+"""
+ColumnIndex.search (whole index and per-table partitions) vs a
+brute-force cos_sim argmax, and "no match" handling in
+SemanticAligner.align.
+"""
+
+import torch
+import torch.nn.functional as F
+
+from src.column_index import ColumnIndex
+from test_semantic_aligner import make_aligner
+
+
+def brute_force_top1(queries, embeddings):
+    scores = F.normalize(queries, dim=1) @ F.normalize(embeddings, dim=1).T
+    return scores.max(dim=1)
+
+
+def test_blocked_search_matches_brute_force():
+    torch.manual_seed(0)
+    columns = [f"t{i % 7}.c{i}" for i in range(50)]
+    embeddings = torch.randn(50, 16)
+    embeddings[31] = embeddings[4]  # tie: the lower index wins
+    queries = torch.cat([torch.randn(9, 16), embeddings[4:5]])
+
+    scores, idx = ColumnIndex(columns, embeddings, block_size=8).search(queries, k=1)
+    expected_scores, expected_idx = brute_force_top1(queries, embeddings)
+
+    torch.testing.assert_close(scores[:, 0], expected_scores)
+    assert idx[:, 0].tolist() == expected_idx.tolist()
+    assert idx[-1, 0].item() == 4
+
+
+def test_top_k_is_capped_by_the_index_size():
+    index = ColumnIndex(["a.x", "a.y"], torch.eye(2), block_size=1)
+    scores, idx = index.search(torch.tensor([[1.0, 0.5]]), k=5)
+
+    assert scores.shape == idx.shape == (1, 2)
+    assert idx[0].tolist() == [0, 1]
+
+
+def test_table_partition_matches_brute_force_over_those_tables():
+    torch.manual_seed(1)
+    # Interleaved tables: t0 / t3 rows are split across several ranges
+    columns = [f"t{i % 5}.c{i}" for i in range(60)] + [f"t3.extra{i}" for i in range(10)]
+    embeddings = torch.randn(len(columns), 16)
+    queries = torch.randn(12, 16)
+    index = ColumnIndex(columns, embeddings, block_size=4)
+
+    for tables in (["t0"], ["t3", "t1"], ["t3", "t3"], ["t2", "missing"]):
+        rows = [i for i, c in enumerate(columns) if c.split(".")[0] in tables]
+        scores, idx = index.search(queries, k=3, tables=tables)
+
+        expected = F.normalize(queries, dim=1) @ F.normalize(embeddings[rows], dim=1).T
+        expected_scores, expected_pos = expected.topk(3, dim=1)
+
+        torch.testing.assert_close(scores, expected_scores)
+        assert idx.tolist() == [[rows[p] for p in r] for r in expected_pos.tolist()]
+
+
+def test_empty_partition_returns_no_match():
+    index = ColumnIndex(["a.x", "a.y"], torch.eye(2))
+    scores, idx = index.search(torch.randn(3, 2), k=1, tables=["b"])
+
+    assert scores.shape == idx.shape == (3, 0)
+
+
+def test_empty_index_returns_no_match():
+    index = ColumnIndex([], torch.empty(0, 16))
+    scores, idx = index.search(torch.randn(3, 16), k=1)
+
+    assert scores.shape == idx.shape == (3, 0)
+
+
+def test_align_treats_no_match_as_unresolved():
+    aligner, encoder = make_aligner()
+
+    # Only table names: nothing to embed against
+    assert aligner.align(["whereabouts"], ["employees", "departments"]) == {}
+    assert encoder.calls == []
+
+    # An (explicitly passed) empty index
+    empty = ColumnIndex([], torch.empty(0, 64))
+    assert aligner.align(["whereabouts"], ["employees.salary"], index=empty) == {}
@@ -0,0 +1,142 @@
+"""
+DecoderStateTracker (O(1) per token) and GrammarAutomaton (the default
+mask for decoding and grammar_masked_loss) vs the history-rescanning
+infer_decoder_state + get_allowed_tokens they replaced, on every prefix
+of every sample in data/sql_ast and every WHERE / HAVING intent.
+"""
+
+import glob
+import json
+import os
+
+import pytest
+
+from src.grammar import get_grammar, intent_index
+from src.utils import (
+    DecoderStateTracker,
+    get_allowed_tokens,
+    infer_decoder_state,
+)
+from src.vocab import (
+    AGG, AND, END, FROM, GROUP_BY, HAVING, JOIN, ON, OPS, OR, ORDER_BY,
+    SCHEMA_COLUMN, SCHEMA_TABLE, SELECT, TOKEN2ID, UNK, VALUE, WHERE,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPORA = sorted(glob.glob(os.path.join(ROOT, "data", "sql_ast", "*.json")))
+INTENTS = [{"where": w, "having": h} for w in (False, True) for h in (False, True)]
+
+
+def legacy_allowed_tokens(tokens_so_far, intent_signals=None):
+    """Frozen copy of get_allowed_tokens before the tracker: rescans the history."""
+    state = infer_decoder_state(tokens_so_far)
+    allowed = set()
+    def add_safe(t):
+        if t in TOKEN2ID: allowed.add(TOKEN2ID[t])
+
+    last_token = tokens_so_far[-1] if tokens_so_far else None
+
+    if state == "START":
+        add_safe(SELECT)
+    elif state == "SELECT":
+        add_safe(AGG)
+        add_safe(SCHEMA_COLUMN)
+        add_safe(FROM)
+    elif state == "FROM":
+        add_safe(SCHEMA_TABLE)
+        if last_token == SCHEMA_TABLE:
+            for t in [JOIN, WHERE, GROUP_BY, ORDER_BY, END]: add_safe(t)
+    elif state == "JOIN_FINISHED":
+        options = [JOIN, WHERE, GROUP_BY, ORDER_BY, END]
+        if intent_signals and intent_signals.get("where") and END in options:
+            options.remove(END)
+        for t in options: add_safe(t)
+    elif state == "JOIN_EXPECT_TABLE":
+        add_safe(SCHEMA_TABLE)
+    elif state == "JOIN_EXPECT_ON":
+        add_safe(ON)
+    elif state in ["JOIN_CONDITION_1", "JOIN_CONDITION_2"]:
+        add_safe(SCHEMA_COLUMN)
+    elif state == "WHERE":
+        add_safe(SCHEMA_COLUMN)
+        if last_token == VALUE:
+            for t in [AND, OR, GROUP_BY, ORDER_BY, END]: add_safe(t)
+    elif state == "GROUP_BY":
+        add_safe(SCHEMA_COLUMN)
+        if last_token == SCHEMA_COLUMN:
+            opts = [HAVING, ORDER_BY, END]
+            if intent_signals and intent_signals.get("having") and END in opts:
+                opts.remove(END)
+            for t in opts: add_safe(t)
+
+    if last_token == SCHEMA_COLUMN:
+        if state in ["WHERE", "HAVING", "JOIN_CONDITION_1", "JOIN_CONDITION_2"]:
+            for o in OPS: add_safe(o)
+    if last_token in OPS:
+        add_safe(VALUE)
+        add_safe(SCHEMA_COLUMN)
+
+    if not allowed: add_safe(END)
+    return allowed
+
+
+def test_corpora_present():
+    assert CORPORA, "❌ no data/sql_ast/*.json corpora found"
+
+
+@pytest.mark.parametrize("path", CORPORA, ids=os.path.basename)
+def test_tracker_and_automaton_match_legacy_scan(path):
+    with open(path) as f:
+        samples = json.load(f)
+
+    grammar = get_grammar()
+    checked = 0
+    for sample in samples:
+        tokens = sample["input_tokens"]
+        tracker = DecoderStateTracker()
+        state = grammar.initial
+        for t in range(len(tokens) + 1):
+            prefix = tokens[:t]
+            assert tracker.state == infer_decoder_state(prefix), prefix
+            for intent in INTENTS:
+                expected = legacy_allowed_tokens(prefix, intent)
+                assert set(tracker.allowed(intent)) == expected, (prefix, intent)
+                assert set(get_allowed_tokens(prefix, intent_signals=intent)) == expected, (prefix, intent)
+
+                row = tracker.mask(intent).nonzero().flatten().tolist()
+                assert set(row) == expected, (prefix, intent)
+
+                i = intent_index(intent)
+                assert set(grammar.allowed(state, i)) == expected, (prefix, intent)
+                row = grammar.mask(state, i).nonzero().flatten().tolist()
+                assert set(row) == expected, (prefix, intent)
+            checked += 1
+            if t < len(tokens):
+                tracker.append(tokens[t])
+                state = grammar.step(state, TOKEN2ID.get(tokens[t], TOKEN2ID[UNK]))
+
+    assert checked > 0
+
+
+def test_tracker_rebuilds_after_non_append_mutation():
+    tokens = ["<START>", SELECT, SCHEMA_COLUMN, FROM, SCHEMA_TABLE, WHERE, SCHEMA_COLUMN]
+    tracker = DecoderStateTracker(tokens)
+    tracker.pop()
+    tracker[-1] = SCHEMA_TABLE
+    del tracker[-1:]
+
+    prefix = list(tracker)
+    assert tracker.state == infer_decoder_state(prefix)
+    for intent in INTENTS:
+        assert set(tracker.allowed(intent)) == legacy_allowed_tokens(prefix, intent)
+
+
+def test_get_allowed_tokens_returns_a_private_mutable_set():
+    prefix = ["<START>", SELECT]
+    allowed = get_allowed_tokens(prefix)
+    assert type(allowed) is set
+
+    allowed.add(TOKEN2ID[END])
+    allowed.discard(TOKEN2ID[FROM])
+    assert get_allowed_tokens(prefix) == legacy_allowed_tokens(prefix)
+    assert DecoderStateTracker(prefix).allowed() == legacy_allowed_tokens(prefix)
@@ -0,0 +1,53 @@
+"""
+EmbeddingStore recovery from a crash mid-append: an unterminated last
+line in keys.jsonl is never read and never merged with the next key.
+"""
+
+import numpy as np
+
+from src.embedding_store import EmbeddingStore
+
+MODEL = "test/model"
+
+
+def rows(n: int, start: int = 0) -> np.ndarray:
+    return np.arange(start, start + n * 4, dtype=np.float32).reshape(n, 4)
+
+
+def crash_mid_append(store: EmbeddingStore):
+    # Vector bytes and half a key line written, newline never reached
+    with open(store._vectors_path, "ab") as f:
+        f.write(rows(1, 100).tobytes())
+    with open(store._keys_path, "ab") as f:
+        f.write(b'"employees.hal')
+
+
+def test_reopen_drops_the_partial_key_line(tmp_path):
+    store = EmbeddingStore(str(tmp_path), MODEL)
+    store.add_many(["a.x", "a.y"], rows(2))
+    crash_mid_append(store)
+
+    reopened = EmbeddingStore(str(tmp_path), MODEL)
+    assert len(reopened) == 2
+    with open(reopened._keys_path, "rb") as f:
+        assert f.read().endswith(b"\n")
+
+    reopened.add_many(["a.z"], rows(1, 8))
+    fresh = EmbeddingStore(str(tmp_path), MODEL)
+    found = fresh.get_many(["a.x", "a.y", "a.z"])
+    assert list(found) == ["a.x", "a.y", "a.z"]
+    np.testing.assert_array_equal(found["a.z"], rows(1, 8)[0])
+
+
+def test_open_store_drops_the_partial_key_line_before_appending(tmp_path):
+    # Another process crashed while this one had the store open
+    store = EmbeddingStore(str(tmp_path), MODEL)
+    store.add_many(["a.x"], rows(1))
+    crash_mid_append(store)
+
+    assert store.get_many(["a.x"]).keys() == {"a.x"}
+    store.add_many(["a.y"], rows(1, 4))
+
+    fresh = EmbeddingStore(str(tmp_path), MODEL)
+    assert len(fresh) == 2
+    np.testing.assert_array_equal(fresh.get_many(["a.y"])["a.y"], rows(1, 4)[0])
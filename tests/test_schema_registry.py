@@ -0,0 +1,105 @@
+"""
+SchemaRegistry: LRU bounds (memory and store) and ids resolvable across
+registries (workers) sharing a store directory. CompiledSchema's
+per-schema trigram index.
+"""
+
+import os
+
+import pytest
+
+from src.schema_binder import _fuzzy_match
+from src.schema_registry import CompiledSchema, SchemaRegistry, schema_id_for
+from test_semantic_aligner import SCHEMA, make_aligner
+
+
+def make_schema(i: int) -> dict:
+    return {"tables": {f"table_{i}": ["id", "name", "salary"]}}
+
+
+def test_lru_keeps_at_most_max_schemas(tmp_path):
+    registry = SchemaRegistry(max_schemas=2)
+    ids = [registry.register(make_schema(i)) for i in range(3)]
+
+    assert len(registry) == 2
+    assert registry.evictions == 1
+    assert ids[0] not in registry
+    with pytest.raises(ValueError):
+        registry.get(ids[0])
+
+
+def test_lookup_refreshes_recency():
+    registry = SchemaRegistry(max_schemas=2)
+    a, b = registry.register(make_schema(0)), registry.register(make_schema(1))
+    registry.get(a)
+    registry.register(make_schema(2))
+
+    assert a in registry and b not in registry
+
+
+def test_id_resolves_on_another_worker(tmp_path):
+    worker_1 = SchemaRegistry(store_dir=str(tmp_path))
+    worker_2 = SchemaRegistry(store_dir=str(tmp_path))
+    schema_id = worker_1.register(make_schema(0))
+
+    compiled = worker_2.get(schema_id)
+    assert compiled.tables == ["table_0"]
+    assert worker_2.store_loads == 1
+
+
+def test_evicted_schema_reloads_from_store(tmp_path):
+    registry = SchemaRegistry(max_schemas=1, store_dir=str(tmp_path))
+    first = registry.register(make_schema(0))
+    registry.register(make_schema(1))
+
+    assert first not in registry
+    assert registry.get(first).tables == ["table_0"]
+
+
+def test_store_ignores_files_that_do_not_match_their_id(tmp_path):
+    schema_id = schema_id_for(make_schema(0))
+    (tmp_path / f"{schema_id}.json").write_text('{"tables": {"other": ["id"]}}')
+
+    registry = SchemaRegistry(store_dir=str(tmp_path))
+    assert registry.lookup(schema_id) is None
+    assert registry.lookup("../etc/passwd") is None
+
+
+def test_store_keeps_at_most_max_stored_files(tmp_path):
+    registry = SchemaRegistry(max_schemas=1, store_dir=str(tmp_path), max_stored=2)
+    ids = [registry.register(make_schema(i)) for i in range(2)]
+    # Distinct mtimes: file systems may store coarse timestamps
+    for i, schema_id in enumerate(ids):
+        os.utime(tmp_path / f"{schema_id}.json", (i, i))
+
+    # Reloading the oldest from the store makes it the most recent one
+    registry.get(ids[0])
+    newest = registry.register(make_schema(2))
+
+    assert sorted(p.stem for p in tmp_path.glob("*.json")) == sorted([ids[0], newest])
+    assert registry.store_evictions == 1
+    assert registry.lookup(ids[1]) is None
+
+
+def test_store_is_opt_in(monkeypatch):
+    from src import schema_registry
+
+    monkeypatch.delenv(schema_registry.SCHEMA_STORE_ENV, raising=False)
+    monkeypatch.delenv("NL2SQL_EMBEDDING_STORE", raising=False)
+    assert schema_registry._default_store_dir() is None
+
+    monkeypatch.setenv("NL2SQL_EMBEDDING_STORE", "/data/embeddings")
+    assert schema_registry._default_store_dir() == os.path.join("/data/embeddings", "schemas")
+
+
+def test_compiled_schema_builds_one_trigram_index():
+    schema = CompiledSchema(SCHEMA)
+    trigrams = schema.trigrams
+    assert schema.trigrams is trigrams
+
+    # The column index reuses it instead of building its own
+    aligner, _ = make_aligner()
+    assert schema.compile_index(aligner).trigrams is trigrams
+
+    assert _fuzzy_match("employees.salery", schema.all_columns, index=trigrams) == "employees.salary"
+    assert _fuzzy_match("employees.salery", schema.all_columns) == "employees.salary"
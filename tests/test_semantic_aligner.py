@@ -0,0 +1,155 @@
+"""
+SemanticAligner cascade: the schema is only encoded when a term reaches
+the embedding tier. A counting encoder stands in for MiniLM.
+"""
+
+import torch
+
+from src.column_index import ColumnIndex
+from src.schema_registry import CompiledSchema
+from src.semantic_aligner import SemanticAligner
+
+SCHEMA = {
+    "tables": {
+        "employees": ["emp_id", "first_name", "salary", "dept_id"],
+        "departments": ["dept_id", "dept_name", "location"],
+    }
+}
+
+
+class CountingEncoder:
+    """Deterministic bag-of-characters embeddings; records every encode() call."""
+
+    device = torch.device("cpu")
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, convert_to_tensor=True):
+        self.calls.append(list(texts))
+        emb = torch.zeros(len(texts), 64)
+        for row, text in enumerate(texts):
+            for ch in text.split(".")[-1]:
+                emb[row, ord(ch) % 64] += 1.0
+        return emb
+
+
+def make_aligner():
+    encoder = CountingEncoder()
+    return SemanticAligner(model=encoder, term_cache_bytes=0), encoder
+
+
+def test_lexical_terms_never_build_the_index():
+    aligner, encoder = make_aligner()
+    schema = CompiledSchema(SCHEMA)
+
+    mapping = aligner.align(
+        user_terms=["salary", "first_name"],
+        schema_terms=schema.all_columns,
+        column_terms=schema.all_columns,
+        index=schema.lazy_index(schema.all_columns, aligner)
+    )
+
+    assert mapping == {"salary": "employees.salary", "first_name": "employees.first_name"}
+    assert encoder.calls == []
+    assert schema._index is None
+
+
+def test_embedding_tier_builds_the_index_once():
+    aligner, encoder = make_aligner()
+    schema = CompiledSchema(SCHEMA)
+
+    for _ in range(2):
+        aligner.align(
+            user_terms=["salary", "whereabouts"],
+            schema_terms=schema.all_columns,
+            column_terms=schema.all_columns,
+            index=schema.lazy_index(schema.all_columns, aligner)
+        )
+
+    schema_encodes = [c for c in encoder.calls if c == schema.all_columns]
+    assert len(schema_encodes) == 1
+    assert schema._index is not None
+    # Only the unresolved term reaches the encoder
+    assert all(c == ["whereabouts"] for c in encoder.calls if c != schema.all_columns)
+
+
+def test_unresolved_terms_are_what_align_encodes():
+    aligner, encoder = make_aligner()
+    schema = CompiledSchema(SCHEMA)
+    terms = ["salary", "salaries", "dept_id", "whereabouts", "name", "salary"]
+
+    unresolved = aligner.unresolved_terms(terms, schema.all_columns)
+    aligner.align(
+        user_terms=terms,
+        schema_terms=schema.all_columns,
+        column_terms=schema.all_columns,
+        index=schema.lazy_index(schema.all_columns, aligner)
+    )
+
+    encoded_terms = [t for c in encoder.calls if c != schema.all_columns for t in c]
+    assert unresolved == list(dict.fromkeys(encoded_terms))
+    assert "salary" not in unresolved and "dept_id" in unresolved
+
+
+def test_batch_primes_only_unresolved_terms():
+    from src.phase4_5_inference import infer_phase4_sql_batch
+
+    aligner, encoder = make_aligner()
+    results = infer_phase4_sql_batch(
+        SCHEMA,
+        ["show salary of employees", "show first_name of employees"],
+        aligner=aligner
+    )
+
+    assert all(r["success"] for r in results), results
+    encoded = [t for c in encoder.calls for t in c]
+    assert "salary" not in encoded and "first_name" not in encoded
+
+
+def test_table_sub_index_slices_the_schema_index():
+    aligner, _ = make_aligner()
+    schema = CompiledSchema(SCHEMA)
+    full = schema.compile_index(aligner)
+
+    departments = [c for c in schema.all_columns if c.startswith("departments.")]
+    sub = schema.index_for(departments, aligner)
+    assert sub.columns == departments
+    # One contiguous table: a view of the schema rows, not a copy
+    assert sub.embeddings.data_ptr() == full.embeddings[full.columns.index(departments[0])].data_ptr()
+
+    # Columns that are not whole tables fall back to picking rows
+    picked = ["departments.location", "employees.salary"]
+    assert schema.index_for(picked, aligner).columns == picked
+
+    queries = torch.randn(4, 64)
+    for columns in (departments, picked):
+        fresh = aligner.encode_columns(columns)
+        expected = ColumnIndex(columns, fresh).search(queries, k=2)
+        actual = schema.index_for(columns, aligner).search(queries, k=2)
+        torch.testing.assert_close(actual[0], expected[0])
+        assert actual[1].tolist() == expected[1].tolist()
+
+
+def test_lexical_align_on_a_table_subset_builds_no_sub_index():
+    aligner, _ = make_aligner()
+    schema = CompiledSchema(SCHEMA)
+    schema.compile_index(aligner)
+    employees = [c for c in schema.all_columns if c.startswith("employees.")]
+
+    built = []
+    provider = schema.lazy_index(employees, aligner)
+    assert callable(provider)
+
+    def counting_provider():
+        built.append(1)
+        return provider()
+
+    mapping = aligner.align(
+        user_terms=["salary", "first_name"],
+        schema_terms=employees,
+        column_terms=employees,
+        index=counting_provider
+    )
+    assert mapping == {"salary": "employees.salary", "first_name": "employees.first_name"}
+    assert built == []